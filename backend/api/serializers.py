@@ -19,7 +19,7 @@ class QuizSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'category', 'questions']
+        fields = ['id', 'title', 'quiz_type', 'questions']
 
 class ResultSerializer(serializers.ModelSerializer):
     class Meta:
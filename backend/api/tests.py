@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.test import override_settings
 
-# Create your tests here.
+from quizzes.models import Quiz
+from quizzes.testing import BankTestCase
+
+
+@override_settings(ROOT_URLCONF="api.urls")
+class ApiRouteTests(BankTestCase):
+    # api/quizzes/ is shadowed by quizzes.urls in the project urlconf,
+    # so the api app's routes are exercised through its own urlconf.
+
+    def test_quiz_list(self):
+        response = self.call("GET /quizzes/ [api.urls]", "/quizzes/")
+        self.assertEqual(response.json()["count"], Quiz.objects.count())
+
+    def test_quiz_detail(self):
+        quiz = Quiz.objects.get(title="History")
+        response = self.call("GET /quizzes/<pk>/ [api.urls]", f"/quizzes/{quiz.id}/")
+        self.assertEqual(len(response.json()["questions"]), quiz.questions.count())
+
+    def test_results(self):
+        self.call("POST /results/ [api.urls]", "/results/", {"score": 50, "total_questions": 4}, status=201)
+        response = self.call("GET /results/ [api.urls]", "/results/")
+        self.assertEqual(response.json()["count"], 1)
+
+
+class ApiMountedRouteTests(BankTestCase):
+
+    def test_results(self):
+        self.call("GET /api/results/")
@@ -1,14 +1,15 @@
 from rest_framework import generics
 from quizzes.models import Quiz, Question
+from quizzes.query_plans import plan_quiz_queryset
 from results.models import Result
 from .serializers import QuizSerializer, QuestionSerializer, ResultSerializer
 
 class QuizListView(generics.ListAPIView):
-    queryset = Quiz.objects.all()
+    queryset = plan_quiz_queryset(Quiz.objects.order_by('id'))
     serializer_class = QuizSerializer
 
 class QuizDetailView(generics.RetrieveAPIView):
-    queryset = Quiz.objects.all()
+    queryset = plan_quiz_queryset(Quiz.objects.all())
     serializer_class = QuizSerializer
 
 class ResultListCreateView(generics.ListCreateAPIView):
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Serve the exam endpoints with the async views (QUIZ_ASYNC_VIEWS=0: the sync ones)
+os.environ.setdefault('QUIZ_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,102 @@
+"""
+Cache settings from the environment.
+
+    CACHE_URL   the default cache, shared by every worker process and by
+                ``manage.py`` (default: file://cache, next to manage.py)
+
+URL schemes:
+
+* ``redis://cache:6379/0`` (``rediss://`` for TLS): shared by every host,
+  needs the ``redis`` package. The production choice;
+* ``memcached://cache:11211``: shared by every host, needs ``pymemcache``;
+* ``file://cache`` (relative to ``BASE_DIR``) / ``file:///var/cache/review``:
+  one directory, shared by the processes of one host. For development and
+  single-host installs: each write lists the directory, so it suits a
+  cache of a few thousand entries, not a busy site;
+* ``locmem://``: private to each process. Only for a single process:
+  bumps of the bank versions made anywhere else are never seen.
+
+A second cache, ``versions``, holds the version counters of the quiz bank
+and the user cache. It uses the same server for redis / memcached (whose
+``incr`` is atomic); for ``file://`` it is a ``versions`` subdirectory
+served by ``CounterFileCache`` (``backend/counter_cache.py``), which locks
+around ``incr`` and never culls.
+
+Query parameters become ``OPTIONS`` (``?MAX_ENTRIES=50000``); numeric
+values are converted. The answer keys, catalog snapshots, exam pools and
+version counters of the quiz bank, and the read-your-writes pins of the
+replica router, all live in this cache: a per-process cache would leave
+the other workers serving the bank as it was.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+
+BACKENDS = {
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "rediss": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+}
+
+# Answer keys, snapshots and exam pools are a few entries per quiz, but the
+# replica pins are one per recently writing user: more than the default 300
+FILE_CACHE_OPTIONS = {"MAX_ENTRIES": 10000, "CULL_FREQUENCY": 4}
+
+COUNTER_FILE_BACKEND = "backend.counter_cache.CounterFileCache"
+
+
+def coerce_option(value):
+    """"20" -> 20, "0.5" -> 0.5; anything else stays a string."""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_cache_url(url, base_dir=""):
+    """One ``CACHES`` entry from a URL."""
+    parts = urlsplit(url)
+    try:
+        backend = BACKENDS[parts.scheme]
+    except KeyError:
+        raise ValueError(f"Unsupported cache URL scheme {parts.scheme!r} in {url!r}")
+
+    config = {"BACKEND": backend}
+    options = {}
+    if parts.scheme == "file":
+        # file://cache -> <base_dir>/cache; file:///var/cache/review is absolute
+        path = unquote(parts.netloc + parts.path)
+        config["LOCATION"] = path if os.path.isabs(path) else os.path.join(base_dir, path)
+        options = dict(FILE_CACHE_OPTIONS)
+    elif parts.scheme == "locmem":
+        config["LOCATION"] = parts.netloc or "default"
+    elif parts.scheme == "memcached":
+        config["LOCATION"] = parts.netloc
+    else:
+        # redis-py takes the URL itself (database number, password, TLS)
+        config["LOCATION"] = f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+    for name, value in parse_qsl(parts.query):
+        options[name] = coerce_option(value)
+    if options:
+        config["OPTIONS"] = options
+    return config
+
+
+def versions_cache(default):
+    """The ``versions`` entry that goes with a ``default`` one."""
+    if default["BACKEND"] == BACKENDS["file"]:
+        return {"BACKEND": COUNTER_FILE_BACKEND, "LOCATION": os.path.join(default["LOCATION"], "versions")}
+    if default["BACKEND"] == BACKENDS["locmem"]:
+        return {**default, "LOCATION": f"{default['LOCATION']}-versions"}
+    return dict(default)
+
+
+def caches_from_env(environ, base_dir, default_url="file://cache"):
+    """CACHES for the given environment."""
+    default = parse_cache_url(environ.get("CACHE_URL") or default_url, base_dir)
+    return {"default": default, "versions": versions_cache(default)}
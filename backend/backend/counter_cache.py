@@ -0,0 +1,39 @@
+"""
+File cache backend for the version counters (``quizzes/cache_versions.py``).
+
+Django's ``FileBasedCache`` is a poor home for counters: ``incr`` and
+``add`` are a read followed by a write, so two processes bumping at once
+can lose a bump, and every write may cull, i.e. delete, random entries,
+the counters included. ``CounterFileCache`` keeps them in a directory of
+their own, takes an exclusive file lock around ``incr`` and ``add``, and
+never culls (it only ever holds one small file per counter).
+"""
+import os
+from contextlib import contextmanager
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class CounterFileCache(FileBasedCache):
+
+    def _cull(self):
+        pass
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, "counters.lock"), "a") as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def add(self, key, value, timeout=None, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            return super().incr(key, delta, version)
@@ -0,0 +1,120 @@
+"""
+Database settings from the environment.
+
+    DATABASE_URL            primary, e.g. postgres://app:secret@db:5432/review
+                            (default: sqlite:///<BASE_DIR>/db.sqlite3)
+    DATABASE_REPLICA_URLS   comma-separated read replicas, aliased
+                            replica1, replica2, ... (default: none)
+    DB_CONN_MAX_AGE         seconds a connection is kept open between
+                            requests (default 60; 0 closes it every request)
+    DB_CONN_HEALTH_CHECKS   "0" to skip the liveness check of a reused
+                            connection (default on)
+    DB_SQLITE_TUNED         "0" to open SQLite files without SQLITE_PRAGMAS
+                            (default on)
+    DB_SQLITE_BUSY_TIMEOUT  milliseconds a SQLite connection waits for the
+                            write lock before "database is locked" (5000)
+
+URL schemes: ``sqlite``, ``postgres`` / ``postgresql``, ``mysql``. Query
+parameters become ``OPTIONS`` (``?sslmode=require``), numbers converted
+(``?timeout=20``, which the drivers reject as a string). For SQLite,
+``sqlite:///db.sqlite3`` is relative to ``BASE_DIR`` and
+``sqlite:////srv/db.sqlite3`` is absolute.
+
+Every new SQLite connection runs ``SQLITE_PRAGMAS`` (Django's
+``init_command``): write-ahead logging, so readers no longer wait behind a
+writer; ``synchronous=NORMAL``, safe with WAL (a power cut can lose the
+last commits, never corrupt the file); the busy timeout; and a larger
+page cache and memory map. Writes take the lock up front and retry while
+it is held elsewhere, see ``backend/transactions.py``.
+
+Replicas are mirrors of ``default`` in tests; locally they can be SQLite
+files kept in step with ``manage.py sync_replicas``.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from .caches import coerce_option
+
+
+ENGINES = {
+    "sqlite": "django.db.backends.sqlite3",
+    "postgres": "django.db.backends.postgresql",
+    "postgresql": "django.db.backends.postgresql",
+    "pgsql": "django.db.backends.postgresql",
+    "mysql": "django.db.backends.mysql",
+}
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,           # ms
+    "cache_size": -20000,           # KiB (about 20 MB per connection)
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+def sqlite_init_command(busy_timeout=None):
+    pragmas = dict(SQLITE_PRAGMAS)
+    if busy_timeout is not None:
+        pragmas["busy_timeout"] = busy_timeout
+    return ";".join(f"PRAGMA {name}={value}" for name, value in pragmas.items())
+
+
+def parse_database_url(url, base_dir=""):
+    """One ``DATABASES`` entry from a URL."""
+    parts = urlsplit(url)
+    try:
+        engine = ENGINES[parts.scheme]
+    except KeyError:
+        raise ValueError(f"Unsupported database URL scheme {parts.scheme!r} in {url!r}")
+
+    config = {"ENGINE": engine}
+    if parts.scheme == "sqlite":
+        # sqlite:///relative.sqlite3 -> "relative.sqlite3"; sqlite:////abs -> "/abs"
+        path = unquote(parts.path[1:]) if parts.path.startswith("/") else unquote(parts.path)
+        config["NAME"] = path if os.path.isabs(path) else os.path.join(base_dir, path)
+    else:
+        config.update({
+            "NAME": unquote(parts.path.lstrip("/")),
+            "USER": unquote(parts.username or ""),
+            "PASSWORD": unquote(parts.password or ""),
+            "HOST": parts.hostname or "",
+            "PORT": str(parts.port or ""),
+        })
+
+    options = {name: coerce_option(value) for name, value in parse_qsl(parts.query)}
+    if options:
+        config["OPTIONS"] = options
+    return config
+
+
+def databases_from_env(environ, base_dir):
+    """(DATABASES, replica aliases) for the given environment."""
+    common = {
+        "CONN_MAX_AGE": int(environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": environ.get("DB_CONN_HEALTH_CHECKS", "1") != "0",
+    }
+
+    primary_url = environ.get("DATABASE_URL") or f"sqlite:///{os.path.join(base_dir, 'db.sqlite3')}"
+    databases = {"default": {**parse_database_url(primary_url, base_dir), **common}}
+
+    replicas = []
+    urls = [url.strip() for url in environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    for number, url in enumerate(urls, start=1):
+        alias = f"replica{number}"
+        databases[alias] = {
+            **parse_database_url(url, base_dir),
+            **common,
+            # The test runner points replicas at the test primary instead of creating them
+            "TEST": {"MIRROR": "default"},
+        }
+        replicas.append(alias)
+
+    if environ.get("DB_SQLITE_TUNED", "1") != "0":
+        init_command = sqlite_init_command(int(environ.get("DB_SQLITE_BUSY_TIMEOUT", 5000)))
+        for config in databases.values():
+            if config["ENGINE"] == ENGINES["sqlite"]:
+                # Options from the URL win
+                config["OPTIONS"] = {"init_command": init_command, **config.get("OPTIONS", {})}
+    return databases, replicas
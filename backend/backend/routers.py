@@ -0,0 +1,144 @@
+"""
+Primary / read-replica routing.
+
+Writes always go to ``default``. Reads of the read-mostly models (the quiz
+catalog, results history, statistics and leaderboards; see
+``REPLICA_MODELS``) go to a random alias of ``DATABASE_REPLICAS``, but
+only while ``ReplicaRoutingMiddleware`` says the current request may use
+a replica:
+
+* only GET / HEAD / OPTIONS requests (a POST reads what it is about to
+  write, e.g. the best score it replaces);
+* never inside a transaction on the primary;
+* never for a user who wrote in the last ``REPLICA_STICKY_SECONDS``
+  (read-your-writes): a write by an authenticated request pins its
+  user to the primary for that long, through a key in the shared Django
+  cache that ``note_user()`` checks once the user is known, whichever
+  worker serves the next request.
+
+Users, profiles, sessions, tokens and everything else stay on the
+primary. Management commands and other code outside a request never
+touch a replica.
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+REPLICA_MODELS = {
+    "quizzes": {"quiz", "passage", "dataset", "question", "choice",
+                "quizresult", "usertypestats", "bestscore", "scorebucket"},
+    "results": {"result"},
+}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Per request (and per thread / task): may reads use a replica, and who is the user
+_use_replicas = contextvars.ContextVar("use_replicas", default=False)
+_user_id = contextvars.ContextVar("routing_user_id", default=None)
+_pinned = contextvars.ContextVar("pinned_to_primary", default=False)
+
+
+def _sticky_key(user_id):
+    return f"db:sticky:user:{user_id}"
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def replica_reads_allowed():
+    return _use_replicas.get()
+
+
+def primary_in_transaction():
+    return connections["default"].in_atomic_block
+
+
+def note_user(user_id):
+    """The request's user is known: pin it to the primary if it wrote recently."""
+    _user_id.set(user_id)
+    if _use_replicas.get() and cache.get(_sticky_key(user_id)):
+        _use_replicas.set(False)
+
+
+def pin_to_primary():
+    """Send the rest of this request, and the user's next requests, to the primary."""
+    if _pinned.get():
+        return
+    _pinned.set(True)
+    _use_replicas.set(False)
+    user_id = _user_id.get()
+    if user_id is not None:
+        cache.set(_sticky_key(user_id), 1, timeout=getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not _use_replicas.get():
+            return "default"
+        if model._meta.model_name not in REPLICA_MODELS.get(model._meta.app_label, ()):
+            return "default"
+        if primary_in_transaction():
+            return "default"
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        if _user_id.get() is not None or _use_replicas.get():
+            pin_to_primary()
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary (replication / sync_replicas)
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """Allows replica reads for the safe methods; resets the routing state per request."""
+
+    sync_capable = True
+    async_capable = True  # no thread hop in front of the async views (ASGI)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self._begin(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self._end(tokens)
+
+    async def __acall__(self, request):
+        tokens = self._begin(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._end(tokens)
+
+    def _begin(self, request):
+        return (
+            _use_replicas.set(bool(replicas()) and request.method in SAFE_METHODS),
+            _user_id.set(None),
+            _pinned.set(False),
+        )
+
+    def _end(self, tokens):
+        use, user, pinned = tokens
+        _use_replicas.reset(use)
+        _user_id.reset(user)
+        _pinned.reset(pinned)
@@ -13,7 +13,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 
+from .caches import caches_from_env
+from .database import databases_from_env
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -21,6 +24,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID", "635060906660-2vnkcrum87ealqjjgpg7bqlspaiggnnk.apps.googleusercontent.com")
 
+# Google ID token signing keys (users/google_keys.py): a callable returning
+# the key source; the keys are cached for the max-age Google sends
+GOOGLE_KEY_SOURCE = "users.google_keys.HTTPKeySource"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -67,6 +75,8 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    "quizzes.profiling.SQLProfilerMiddleware",  # first, so it sees every query; off unless enabled
+    "backend.routers.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,7 +96,14 @@ CORS_ALLOW_HEADERS = list(default_headers) + ["content-type", "authorization"]
 CORS_ALLOWED_ORIGINS = ["http://localhost:3000"]
 CORS_ALLOW_CREDENTIALS = True
 
-ROOT_URLCONF = 'backend.urls'
+# backend/asgi.py turns QUIZ_ASYNC_VIEWS on: the exam endpoints are then the
+# async views of quizzes/async_views.py
+QUIZ_ASYNC_VIEWS = os.environ.get("QUIZ_ASYNC_VIEWS", "") == "1"
+ROOT_URLCONF = 'backend.urls_async' if QUIZ_ASYNC_VIEWS else 'backend.urls'
+# Independent queries of one async request run at once, one connection each,
+# on a pool of this many threads (at most as many connections per process)
+QUIZ_ASYNC_CONCURRENT_QUERIES = True
+QUIZ_ASYNC_DB_THREADS = int(os.environ.get("QUIZ_ASYNC_DB_THREADS", 20))
 
 TEMPLATES = [
     {
@@ -110,12 +127,31 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# From DATABASE_URL / DATABASE_REPLICA_URLS / DB_CONN_MAX_AGE (backend/database.py);
+# sqlite:///db.sqlite3 next to manage.py when unset
+DATABASES, DATABASE_REPLICAS = databases_from_env(os.environ, BASE_DIR)
+
+# Catalog / history reads of safe requests go to the replicas (backend/routers.py);
+# a user who just wrote reads from the primary for this long
+DATABASE_ROUTERS = ["backend.routers.PrimaryReplicaRouter"]
+REPLICA_STICKY_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# From CACHE_URL (backend/caches.py): one cache for every worker and
+# manage.py, so a bank change made anywhere reaches all of them, plus a
+# "versions" cache for the bank's version counters. The default is a
+# directory next to manage.py, for development and single-host installs;
+# production should set CACHE_URL=redis://... Test runs get a private
+# in-memory cache.
+TESTING = sys.argv[1:2] == ["test"]
+CACHES = caches_from_env(os.environ, BASE_DIR, default_url="locmem://" if TESTING else "file://cache")
+
+# QuizResult / Profile writes that find SQLite locked (backend/transactions.py):
+# retries, and the first backoff in seconds (doubled per retry, with jitter)
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_BACKOFF = 0.05
 
 
 # Password validation
@@ -172,7 +208,7 @@ REST_FRAMEWORK = {
 
     # Authentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
 
 }
@@ -192,6 +228,95 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Resolved JWT users, per process (users/authentication.py). The TTL stays
+# within ACCESS_TOKEN_LIFETIME; saves of User / Profile invalidate at once.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = int(SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds())
+
+# Exam session tokens (quizzes/exam_tokens.py)
+# Timed quizzes expire after time_limit + grace; untimed ones after the max age.
+EXAM_TOKEN_GRACE_SECONDS = 120
+EXAM_TOKEN_UNTIMED_MAX_AGE = 60 * 60 * 6
+
+# Pre-generated exam pools (quizzes/exam_pools.py): variants per quiz and per
+# quiz type, rebuilt after a bank change or once older than the max age by a
+# thread in each process that serves an exam (interval 0: only by
+# manage.py refill_exam_pools). Off unless QUIZ_EXAM_POOL_SIZE is set.
+QUIZ_EXAM_POOL_SIZE = int(os.environ.get("QUIZ_EXAM_POOL_SIZE", 0))
+QUIZ_EXAM_POOL_MAX_AGE = 15 * 60
+QUIZ_EXAM_POOL_REFILL_INTERVAL = float(os.environ.get("QUIZ_EXAM_POOL_REFILL_INTERVAL", 30))
+
+# Random exams prefer questions the user has not answered yet
+# (quizzes/seen_questions.py); a user's seen set of a type starts over once
+# it covers this fraction of the type's questions
+QUIZ_SEEN_RESET_COVERAGE = 0.9
+# ... and the pooled exam repeating the fewest of their questions, unless even
+# that one repeats more than this fraction: then a live exam that avoids them
+QUIZ_SEEN_POOL_MAX_OVERLAP = 0.5
+
+# QuizResult write path (quizzes/result_buffer.py)
+#   "sync"     - insert inside the request (default)
+#   "buffered" - queue in memory, bulk insert by size/time; lost on a crash
+#   "journal"  - buffered + fsync'd append-only journal replayed after a crash
+QUIZ_RESULT_WRITE_MODE = os.environ.get("QUIZ_RESULT_WRITE_MODE", "sync")
+QUIZ_RESULT_BUFFER_CAPACITY = 5000      # queued results before submitters flush inline (or write their own)
+QUIZ_RESULT_FLUSH_BATCH = 200           # flush as soon as this many are queued
+QUIZ_RESULT_FLUSH_INTERVAL = 1.0        # ... or after this many seconds
+QUIZ_RESULT_JOURNAL_DIR = os.path.join(BASE_DIR, 'journal')
+
+# SQL profiler (quizzes/profiling.py)
+# One JSON line per request: query count, SQL time, duplicate statements and
+# EXPLAIN of slow SELECTs. Budgets are the ones the API tests enforce;
+# "warn" logs a request over budget, "raise" fails it (the test suite).
+SQL_PROFILER_ENABLED = os.environ.get("SQL_PROFILER", "") == "1"
+SQL_PROFILER_SLOW_MS = float(os.environ.get("SQL_PROFILER_SLOW_MS", 50))
+SQL_PROFILER_BUDGET_MODE = os.environ.get("SQL_PROFILER_BUDGET_MODE", "warn")
+SQL_PROFILER_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'sql_profile.jsonl')
+QUERY_BUDGETS_FILE = os.path.join(BASE_DIR, 'query_budgets.json')
+
+# Stage latency histograms served at /metrics (quizzes/metrics.py)
+QUIZ_METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")   # empty: /metrics is open
+
+# Debug logs of the quiz views: JSON lines on stderr when QUIZ_DEBUG_LOG=1,
+# for this fraction of the requests
+QUIZ_DEBUG_LOG_LEVEL = "DEBUG" if os.environ.get("QUIZ_DEBUG_LOG", "") == "1" else "INFO"
+QUIZ_DEBUG_LOG_SAMPLE_RATE = float(os.environ.get("QUIZ_DEBUG_LOG_SAMPLE_RATE", 0.1))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "quizzes.profiling.JsonFormatter"},
+    },
+    "handlers": {
+        "sql_profile": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SQL_PROFILER_LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,  # the file (and logs/) only appear once something is logged
+            "formatter": "json",
+        },
+        "console_json": {
+            "class": "logging.StreamHandler",
+            "formatter": "json",
+        },
+    },
+    "loggers": {
+        "quizzes.profiling": {
+            "handlers": ["sql_profile"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "quizzes.views": {
+            "handlers": ["console_json"],
+            "level": QUIZ_DEBUG_LOG_LEVEL,
+            "propagate": False,
+        },
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -0,0 +1,103 @@
+"""
+Write transactions that survive SQLite's single writer.
+
+A plain ``atomic()`` on SQLite starts with ``BEGIN`` (deferred): the write
+lock is only taken at the first write, and a transaction that read first
+cannot wait for it, it fails at once with "database is locked". Writes of
+QuizResult and Profile go through ``retry_on_lock`` instead:
+
+* ``immediate_atomic()`` opens the transaction with ``BEGIN IMMEDIATE``,
+  so the lock is taken up front, where the connection's ``busy_timeout``
+  (see ``backend/database.py``) makes it wait for the current writer.
+  Threads of one process take turns on a lock of their own first, so
+  only writers of other processes meet in SQLite's busy handler;
+* if the lock still cannot be had, the whole block is run again after an
+  exponential backoff with jitter (``SQLITE_WRITE_RETRIES`` times,
+  starting at ``SQLITE_WRITE_BACKOFF`` seconds).
+
+A block nested in an outer transaction is not retried (the outer one is
+already broken; it is the outer caller's to retry). Other databases get a
+plain ``atomic()``.
+"""
+import collections
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+
+logger = logging.getLogger(__name__)
+
+stats = {"retries": 0, "failures": 0}
+
+# Writers of this process queue here rather than in SQLite's busy handler,
+# which polls with growing sleeps and lets late arrivals overtake
+_write_locks = collections.defaultdict(threading.Lock)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """``atomic()`` that starts with ``BEGIN IMMEDIATE`` on SQLite."""
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        # Part of the caller's transaction, no savepoint: it is not retried here
+        with transaction.atomic(using=using, savepoint=False):
+            yield
+        return
+    if connection.vendor != "sqlite":
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    with _write_locks[connection.alias]:
+        connection.transaction_mode = "IMMEDIATE"
+        try:
+            with transaction.atomic(using=using):
+                connection.transaction_mode = previous  # BEGIN IMMEDIATE has been sent
+                yield
+        finally:
+            connection.transaction_mode = previous
+
+
+def retry_on_lock(func=None, *, using=None):
+    """
+    Run ``func`` in ``immediate_atomic()``, again after a backoff while the
+    database is locked. Usable as ``@retry_on_lock`` or ``retry_on_lock(f)(...)``.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, "SQLITE_WRITE_RETRIES", 5)
+        backoff = getattr(settings, "SQLITE_WRITE_BACKOFF", 0.05)
+        attempt = 0
+        while True:
+            try:
+                with immediate_atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                nested = transaction.get_connection(using).in_atomic_block
+                if not is_lock_error(e) or nested or attempt >= retries:
+                    if is_lock_error(e):
+                        stats["failures"] += 1
+                    raise
+                delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                attempt += 1
+                stats["retries"] += 1
+                logger.warning("%s: database is locked, retry %d in %.3f s", func.__qualname__, attempt, delay)
+                time.sleep(delay)
+
+    return wrapper
@@ -5,6 +5,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from quizzes.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -15,6 +17,8 @@ urlpatterns = [
 
     path('accounts/', include('allauth.urls')),
 
+    path('metrics', metrics, name='metrics'),
+
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,11 @@
+# backend/urls_async.py
+# ROOT_URLCONF under ASGI (QUIZ_ASYNC_VIEWS): the async exam endpoints
+# shadow their sync versions, every other route is backend/urls.py
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/quizzes/', include('quizzes.async_urls')),
+    *sync_urlpatterns,
+]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Quiz, Passage, Question, Choice, QuizResult, DataSet
+from .models import Quiz, Passage, Question, Choice, QuizResult, DataSet, UserTypeStats
 
 
 
@@ -54,3 +54,8 @@ class QuizResultAdmin(admin.ModelAdmin):
 class DataSetAdmin(admin.ModelAdmin):
     list_display = ('title', 'quiz')
 
+
+@admin.register(UserTypeStats)
+class UserTypeStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'quiz_type', 'attempts', 'best_score', 'last_attempt_at')
+    list_filter = ('quiz_type',)
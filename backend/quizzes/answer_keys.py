@@ -0,0 +1,188 @@
+"""
+Versioned answer-key cache used by the grading views.
+
+An answer key entry describes one question::
+
+    {
+        "text": "...",
+        "explanation": "...",
+        "correct": <correct choice id or None>,
+        "choices": {choice_id: choice_text, ...},
+    }
+
+Keys are stored in the Django cache, one per quiz (question_id -> entry,
+its passages and datasets included). Random mode, where a submission
+spans several quizzes, reads the keys of the quizzes its questions belong
+to (found in the sampling index) with one ``get_many``. One entry per quiz
+rather than per question keeps the cache small, which matters on the file
+backend, where every write lists the cache directory. All cache keys
+embed a version number that ``quizzes/signals.py`` bumps when a Question
+or Choice changes, so stale keys are simply never read again.
+The keys and the version live in the shared cache: ``manage.py
+warm_answer_keys`` warms them for every worker, and a change made in
+another process is graded against from the next submission on.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cache_versions import get_version, bump_version
+from .models import Quiz, Question, Choice
+from .sampling import get_sampling_index
+
+
+VERSION_NAME = "answer_keys"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _timeout():
+    return getattr(settings, "ANSWER_KEY_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+def _count(hits=0, misses=0):
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += misses
+
+
+def cache_stats():
+    """Hit/miss counters for this process (one per quiz key read)."""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def invalidate_answer_keys(**kwargs):
+    bump_version(VERSION_NAME)
+
+
+def _quiz_key(version, quiz_id):
+    return f"quizzes:answer_keys:{version}:quiz:{quiz_id}"
+
+
+def _build_keys(question_filter, owners_of):
+    """
+    Two queries: the questions, then all of their choices. ``owners_of``
+    maps a question's (quiz, passage quiz, dataset quiz) IDs to the keys
+    it goes into. Returns {key: {question_id: entry}}.
+    """
+    keys, entries = {}, {}
+    questions = Question.objects.filter(question_filter).values_list(
+        'id', 'text', 'explanation', 'quiz_id', 'passage__quiz_id', 'dataset__quiz_id'
+    )
+    for question_id, text, explanation, *quiz_ids in questions:
+        entry = entries[question_id] = {
+            "text": text,
+            "explanation": explanation,
+            "correct": None,
+            "choices": {},
+        }
+        for owner in owners_of(quiz_ids):
+            keys.setdefault(owner, {})[question_id] = entry
+
+    if not entries:
+        return keys
+
+    choices = (
+        Choice.objects.filter(question__in=Question.objects.filter(question_filter).values('id'))
+        .order_by('question_id', 'id')
+        .values_list('question_id', 'id', 'text', 'is_correct')
+    )
+    for question_id, choice_id, text, is_correct in choices:
+        entry = entries[question_id]
+        entry["choices"][choice_id] = text
+        if is_correct and entry["correct"] is None:
+            entry["correct"] = choice_id
+    return keys
+
+
+def _build_quiz_keys(quiz_ids):
+    """quiz_id -> answer key for each of ``quiz_ids``, in two queries for all of them."""
+    quiz_ids = set(quiz_ids)
+    question_filter = Q(quiz_id__in=quiz_ids) | Q(passage__quiz_id__in=quiz_ids) | Q(dataset__quiz_id__in=quiz_ids)
+    keys = _build_keys(question_filter, lambda owners: set(owners) & quiz_ids)
+    return {quiz_id: keys.get(quiz_id, {}) for quiz_id in quiz_ids}
+
+
+def get_quiz_answer_keys(quiz_ids):
+    """quiz_id -> answer key for several quizzes: one ``get_many``, one build for the misses."""
+    quiz_ids = list(dict.fromkeys(quiz_ids))
+    if not quiz_ids:
+        return {}
+
+    version = get_version(VERSION_NAME)
+    names = {_quiz_key(version, quiz_id): quiz_id for quiz_id in quiz_ids}
+    keys = {names[name]: key for name, key in cache.get_many(list(names)).items()}
+
+    missing = [quiz_id for quiz_id in quiz_ids if quiz_id not in keys]
+    _count(hits=len(keys), misses=len(missing))
+    if missing:
+        built = _build_quiz_keys(missing)
+        cache.set_many({_quiz_key(version, quiz_id): key for quiz_id, key in built.items()}, _timeout())
+        keys.update(built)
+    return keys
+
+
+def get_quiz_answer_key(quiz_id):
+    """question_id -> entry for every question of a quiz (passages/datasets included)."""
+    return get_quiz_answer_keys([quiz_id])[quiz_id]
+
+
+def get_question_answer_keys(question_ids):
+    """question_id -> entry for arbitrary questions (random mode)."""
+    question_ids = list(dict.fromkeys(question_ids))
+    if not question_ids:
+        return {}
+
+    owners = get_sampling_index().question_quizzes
+    keys = get_quiz_answer_keys(owners[qid] for qid in question_ids if qid in owners)
+
+    entries = {}
+    for qid in question_ids:
+        key = keys.get(owners.get(qid), {})
+        if qid in key:
+            entries[qid] = key[qid]
+
+    # Questions outside every quiz, or moved since the index was built
+    outside = [qid for qid in question_ids if qid not in entries]
+    if outside:
+        entries.update(_build_keys(Q(id__in=outside), lambda owners: [None]).get(None, {}))
+    return entries
+
+
+def get_answer_keys_for(quiz_id, question_ids):
+    """
+    Entries for ``question_ids`` taken from the quiz's key, falling back to
+    the keys of their own quizzes for IDs that do not belong to the quiz.
+    """
+    quiz_key = get_quiz_answer_key(quiz_id)
+    entries = {qid: quiz_key[qid] for qid in question_ids if qid in quiz_key}
+    outside = [qid for qid in question_ids if qid not in quiz_key]
+    if outside:
+        entries.update(get_question_answer_keys(outside))
+    return entries
+
+
+def warm_answer_keys(quiz_ids=None):
+    """Pre-build the per-quiz keys. Returns (quizzes_warmed, questions_warmed)."""
+    version = get_version(VERSION_NAME)
+    quizzes = Quiz.objects.order_by('id').values_list('id', flat=True)
+    if quiz_ids:
+        quizzes = quizzes.filter(id__in=quiz_ids)
+
+    quiz_count = question_count = 0
+    for quiz_id in quizzes:
+        key = _build_quiz_keys([quiz_id])[quiz_id]
+        cache.set(_quiz_key(version, quiz_id), key, _timeout())
+        quiz_count += 1
+        question_count += len(key)
+    return quiz_count, question_count
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class QuizzesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quizzes'
+
+    def ready(self):
+        # Import signals so they are registered
+        import quizzes.signals  # noqa: F401
+
+        # Export the exam pool counters and refill lag at /metrics
+        from quizzes.metrics import REGISTRY
+        from quizzes.exam_pools import ExamPoolMetrics
+        REGISTRY.append(ExamPoolMetrics())
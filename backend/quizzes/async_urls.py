@@ -0,0 +1,16 @@
+#quizzes/async_urls.py
+# The exam endpoints of quizzes/urls.py, served by the async views (ASGI)
+from django.urls import path
+from .async_views import (
+    AsyncQuizDetailAPIView,
+    AsyncQuizSubmissionAPIView,
+    AsyncRandomizedByTypeAPIView,
+    AsyncRandomizedQuizSubmitAPIView,
+)
+
+urlpatterns = [
+    path('<int:pk>/', AsyncQuizDetailAPIView.as_view(), name='quiz-detail'),
+    path('<int:pk>/submit/', AsyncQuizSubmissionAPIView.as_view(), name='quiz-submit'),
+    path("random/", AsyncRandomizedByTypeAPIView.as_view(), name="random-quiz-by-type"),
+    path("random/submit/", AsyncRandomizedQuizSubmitAPIView.as_view(), name="random-quiz-submit"),
+]
@@ -0,0 +1,349 @@
+"""
+Async versions of the exam endpoints, for the ASGI server.
+
+Under WSGI every in-flight request holds a worker thread while it waits
+on the database. These views are coroutines: the event loop serves other
+requests while a query runs, and the queries of one request that do not
+depend on each other run at the same time:
+
+* quiz detail: the passages / datasets and the sampled questions;
+* random exam: the passage or dataset and the standalone questions;
+* random submission: the answer keys and the "Random Quiz" row.
+
+DRF's ``APIView`` only dispatches sync handlers, so ``AsyncAPIView``
+awaits them itself and runs DRF's sync steps (authentication,
+permissions, throttles) on a worker thread like any other ORM call (see
+``run_query``). Sampling, grading and serialization are the helpers of
+``views.py``, shared with the sync views, and so are the pre-generated
+exam pools (``exam_pools.py``).
+
+``backend/asgi.py`` serves these views (``QUIZ_ASYNC_VIEWS``, through
+``backend/urls_async.py``); WSGI keeps the sync ones. Compare the two with
+``manage.py bench_asgi``.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .answer_keys import get_answer_keys_for, get_question_answer_keys
+from .exam_pools import pooled_exam, mark_wanted
+from .exam_tokens import issue_exam_token, verify_exam_token, collect_question_ids, ExamTokenError
+from .metrics import StageTimer
+from .models import Quiz
+from .sampling import aget_sampling_index, fetch_questions, fetch_passages, fetch_datasets
+from .serializers import QuizSerializer
+from .seen_questions import load_seen, record_seen
+from .user_stats import record_result
+from .views import (
+    QuizDetailAPIView,
+    sample_quiz, log_quiz_sampled,
+    parse_answers, grade_quiz, incomplete_submission, quiz_debug_info, log_quiz_graded, score_of,
+    sample_random_quiz, random_quiz_payload, log_random_sampled, grade_random, random_quiz_for,
+)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def query_executor():
+    """The ``QUIZ_ASYNC_DB_THREADS`` threads (and connections) of ``run_query``."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "QUIZ_ASYNC_DB_THREADS", 20), thread_name_prefix="async-db"
+            )
+        return _executor
+
+
+def _on_own_connection(func, *args, **kwargs):
+    # Worker threads keep their connection between requests like a WSGI
+    # thread does, subject to CONN_MAX_AGE / CONN_HEALTH_CHECKS
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    ``func(*args, **kwargs)`` (sync ORM code) on one of the
+    ``query_executor()`` threads, each with its own connection. Django's
+    async ORM methods (``aget()``, ...) and plain ``sync_to_async`` run on
+    a single thread per process, which would queue every request's queries
+    behind each other.
+
+    With ``QUIZ_ASYNC_CONCURRENT_QUERIES`` off it does just that: the
+    call runs on that thread, on the request's connection (needed inside a
+    transaction, e.g. in ``TestCase``: other connections cannot see its
+    rows).
+    """
+    if getattr(settings, "QUIZ_ASYNC_CONCURRENT_QUERIES", True):
+        run = sync_to_async(_on_own_connection, thread_sensitive=False, executor=query_executor())
+        return await run(func, *args, **kwargs)
+    return await sync_to_async(func)(*args, **kwargs)
+
+
+async def gather_queries(*calls):
+    """
+    Results of ``(func, *args)`` calls that do not depend on each other,
+    run concurrently through ``run_query``. Calls with nothing to load
+    (empty ``args[0]``) are answered without a thread.
+    """
+    async def run(func, *args):
+        if args and not args[0]:
+            return func(*args)
+        return await run_query(func, *args)
+
+    if not getattr(settings, "QUIZ_ASYNC_CONCURRENT_QUERIES", True):
+        return [await run(*call) for call in calls]
+    return await asyncio.gather(*(run(*call) for call in calls))
+
+
+class AsyncAPIView(APIView):
+    """``APIView`` with ``async def`` handlers."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication (a cache / DB lookup), permissions and throttles are sync
+            await run_query(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        # Django refuses a view mixing sync and async handlers
+        return super().options(request, *args, **kwargs)
+
+
+class AsyncQuizDetailAPIView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request, pk):
+        stages = StageTimer("quiz_detail")
+        pooled = await run_query(pooled_exam, "quiz", pk, request)
+        if pooled is not None:
+            stages.lap("pool")
+            return Response(pooled)
+
+        quiz = await run_query(get_object_or_404, Quiz, pk=pk)
+        self.check_object_permissions(request, quiz)
+
+        limit = QuizDetailAPIView.QUESTION_LIMITS.get(quiz.quiz_type, 20)
+        question_ids, passage_ids, dataset_ids = sample_quiz(quiz, await aget_sampling_index(), limit)
+        quiz.randomized_passages, quiz.randomized_datasets, quiz.sampled_questions = await gather_queries(
+            (fetch_passages, passage_ids),
+            (fetch_datasets, dataset_ids),
+            (fetch_questions, question_ids),
+        )
+        log_quiz_sampled(quiz)
+        stages.lap("sample")
+
+        context = {
+            "request": request,
+            "format": self.format_kwarg,
+            "view": self,
+            "sampled_questions": quiz.sampled_questions,
+            "randomized_passages": quiz.randomized_passages,
+            "randomized_datasets": quiz.randomized_datasets,
+        }
+        data = await run_query(lambda: QuizSerializer(quiz, context=context).data)
+        stages.lap("serialize")
+
+        # Sign exactly what was delivered; submission grades this set only
+        data["exam_token"] = issue_exam_token(collect_question_ids(data), quiz=quiz)
+        stages.lap("sign")
+        await run_query(mark_wanted, "quiz", quiz.id)
+        return Response(data)
+
+
+class AsyncQuizSubmissionAPIView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def post(self, request, pk):
+        """Async ``QuizSubmissionAPIView.post``."""
+        stages = StageTimer("quiz_submit")
+
+        try:
+            quiz = await run_query(Quiz.objects.get, pk=pk)
+        except Quiz.DoesNotExist:
+            return Response({"error": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        user_answers = parse_answers(request.data.get("answers", []))
+        stages.lap("parse")
+
+        try:
+            session = verify_exam_token(request.data.get("exam_token"), quiz=quiz)
+        except ExamTokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        session_question_ids = session["questions"]
+        answer_key = await run_query(get_answer_keys_for, quiz.id, session_question_ids)
+        question_ids = [qid for qid in session_question_ids if qid in answer_key]
+        stages.lap("resolve")
+
+        total_questions = len(question_ids)
+        correct_answers, details, answered_count = grade_quiz(question_ids, answer_key, user_answers)
+        stages.lap("grade")
+
+        if answered_count < total_questions:
+            return incomplete_submission(quiz, question_ids, user_answers, answered_count)
+
+        score = score_of(correct_answers, total_questions)
+        if request.user.is_authenticated:
+            await run_query(
+                record_result,
+                quiz=quiz,
+                user=request.user,
+                quiz_type=quiz.quiz_type,
+                score=score,
+                correct=correct_answers,
+                total=total_questions,
+                time_spent=request.data.get("time_spent", 0),
+            )
+            await run_query(record_seen, request.user, quiz.quiz_type, question_ids)
+        stages.lap("persist")
+
+        debug_info = quiz_debug_info(quiz, session_question_ids, question_ids, user_answers)
+        log_quiz_graded(debug_info, answered_count, score, correct_answers, total_questions)
+
+        response = Response({
+            "quiz": quiz.title,
+            "quiz_type": quiz.quiz_type,
+            "score": score,
+            "correct": correct_answers,
+            "total": total_questions,
+            "details": details,
+            "debug": debug_info,
+        }, status=status.HTTP_200_OK)
+        stages.lap("serialize")
+        return response
+
+
+class AsyncRandomizedByTypeAPIView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request):
+        stages = StageTimer("random_quiz")
+        quiz_type = request.query_params.get("type")
+        if not quiz_type:
+            return Response({"error": "Missing ?type= parameter."}, status=400)
+
+        seen = await run_query(load_seen, request.user, quiz_type) if request.user.is_authenticated else None
+        pooled = await run_query(pooled_exam, "type", quiz_type, request, seen=seen)
+        if pooled is not None:
+            stages.lap("pool")
+            return Response(pooled)
+
+        index = await aget_sampling_index()
+        if not index.type_quizzes.get(quiz_type):
+            return Response({"error": f"No quizzes found for type '{quiz_type}'."}, status=404)
+
+        sample = sample_random_quiz(quiz_type, index, seen=seen)
+        stages.lap("sample")
+
+        passages, datasets, questions = await gather_queries(
+            (fetch_passages, [sample["passage_id"]] if sample["passage_id"] else []),
+            (fetch_datasets, [sample["dataset_id"]] if sample["dataset_id"] else []),
+            (fetch_questions, sample["standalone_ids"] + sample["group_question_ids"]),
+        )
+        stages.lap("resolve")
+
+        payload = await run_query(
+            random_quiz_payload, request, quiz_type, sample, questions,
+            passages[0] if passages else None, datasets[0] if datasets else None,
+        )
+        stages.lap("serialize")
+
+        payload["exam_token"] = issue_exam_token(collect_question_ids(payload), quiz_type=quiz_type)
+        stages.lap("sign")
+
+        log_random_sampled(payload, sample["per_quiz"])
+        await run_query(mark_wanted, "type", quiz_type)
+        return Response(payload)
+
+
+class AsyncRandomizedQuizSubmitAPIView(AsyncAPIView):
+
+    async def post(self, request):
+        """Async ``RandomizedQuizSubmitAPIView.post``."""
+        stages = StageTimer("random_submit")
+        answers = request.data.get("answers", [])
+        if not answers:
+            return Response({"error": "Missing required data."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = verify_exam_token(
+                request.data.get("exam_token"), quiz_type=request.data.get("quiz_type")
+            )
+        except ExamTokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        quiz_type = session["quiz_type"]
+        question_ids = session["questions"]
+        total = len(question_ids)
+        answer_map = parse_answers(answers)
+        stages.lap("parse")
+
+        # The answer keys and (to link the result) the type's "Random Quiz" row
+        authenticated = request.user.is_authenticated
+        calls = [(get_question_answer_keys, question_ids)]
+        if authenticated:
+            calls.append((random_quiz_for, quiz_type))
+        answer_key, *random_quiz = await gather_queries(*calls)
+        stages.lap("resolve")
+
+        correct, details = grade_random(question_ids, answer_key, answer_map)
+        score = score_of(correct, total)
+        stages.lap("grade")
+
+        if authenticated:
+            await run_query(
+                record_result,
+                quiz=random_quiz[0],
+                user=request.user,
+                quiz_type=quiz_type,
+                score=score,
+                correct=correct,
+                total=total,
+                time_spent=request.data.get("time_spent", 0),
+            )
+            await run_query(record_seen, request.user, quiz_type, question_ids)
+        stages.lap("persist")
+
+        response = Response({
+            "quiz_type": quiz_type,
+            "score": score,
+            "correct": correct,
+            "total": total,
+            "details": details
+        }, status=status.HTTP_200_OK)
+        stages.lap("serialize")
+        return response
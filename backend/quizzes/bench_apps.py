@@ -0,0 +1,36 @@
+"""
+uvicorn entry point for ``manage.py bench_asgi``: the project's WSGI or
+ASGI application (``QUIZ_ASYNC_VIEWS``), optionally with
+``BENCH_DB_LATENCY_MS`` of blocking delay added to every query, like the
+network round trip to a database server that the local SQLite file does
+not have.
+"""
+import os
+import time
+
+from django.db.backends.signals import connection_created
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+LATENCY = float(os.environ.get("BENCH_DB_LATENCY_MS", 0)) / 1000
+
+
+def _delay(execute, sql, params, many, context):
+    time.sleep(LATENCY)
+    return execute(sql, params, many, context)
+
+
+def _add_latency(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_delay)
+
+
+if LATENCY:
+    connection_created.connect(_add_latency)
+
+if os.environ.get("QUIZ_ASYNC_VIEWS") == "1":
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+else:
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
@@ -0,0 +1,181 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks build a synthetic question bank inside a transaction that is
+rolled back afterwards, so they can be pointed at a development database
+without leaving anything behind.
+"""
+import math
+import time
+
+from .models import Quiz, Passage, DataSet, Question, Choice
+
+
+BENCH_PREFIX = "Bench"
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a list of numbers (p in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def time_calls(fn, runs):
+    """Call ``fn`` ``runs`` times and return the latencies in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        "p50": round(percentile(samples, 50), 3),
+        "p99": round(percentile(samples, 99), 3),
+        "mean": round(sum(samples) / len(samples), 3) if samples else 0.0,
+    }
+
+
+def build_synthetic_bank(questions, quizzes_per_type=3, group_size=5,
+                         group_share=0.1, choices_per_question=4, batch_size=5000):
+    """
+    Bulk-create a bank of roughly ``questions`` questions spread over every
+    quiz type. VER quizzes get passages and NUM quizzes get datasets, holding
+    ``group_share`` of their questions in groups of ``group_size``.
+
+    Returns the created quizzes. Signals are not sent (bulk_create), so
+    callers must invalidate any in-memory caches themselves.
+    """
+    quizzes = Quiz.objects.bulk_create([
+        Quiz(
+            title=f"{BENCH_PREFIX} {code} {n}",
+            quiz_type=code,
+            description="Synthetic benchmark quiz.",
+            time_limit=20,
+        )
+        for code, _ in Quiz.QUIZ_TYPES
+        for n in range(quizzes_per_type)
+    ])
+
+    per_quiz = max(1, questions // len(quizzes))
+    grouped = max(0, int(per_quiz * group_share) // group_size)
+
+    passages, datasets = [], []
+    for quiz in quizzes:
+        if quiz.quiz_type == 'VER':
+            passages += [Passage(quiz=quiz, title=f"P{i}", text="Lorem ipsum " * 40) for i in range(grouped)]
+        elif quiz.quiz_type == 'NUM':
+            datasets += [DataSet(quiz=quiz, title=f"D{i}", description="Table") for i in range(grouped)]
+    passages = Passage.objects.bulk_create(passages, batch_size=batch_size)
+    datasets = DataSet.objects.bulk_create(datasets, batch_size=batch_size)
+
+    groups_by_quiz = {}
+    for group in passages + datasets:
+        groups_by_quiz.setdefault(group.quiz_id, []).append(group)
+
+    pending = []
+
+    def flush():
+        created = Question.objects.bulk_create(pending, batch_size=batch_size)
+        Choice.objects.bulk_create(
+            [
+                Choice(question=q, text=f"Choice {c}", is_correct=(c == 0))
+                for q in created
+                for c in range(choices_per_question)
+            ],
+            batch_size=batch_size,
+        )
+        pending.clear()
+
+    for quiz in quizzes:
+        for group in groups_by_quiz.get(quiz.id, []):
+            for n in range(group_size):
+                pending.append(Question(
+                    quiz=quiz,
+                    passage=group if isinstance(group, Passage) else None,
+                    dataset=group if isinstance(group, DataSet) else None,
+                    text=f"{quiz.title} group {group.id} question {n}",
+                ))
+        standalone = per_quiz - len(groups_by_quiz.get(quiz.id, [])) * group_size
+        for n in range(standalone):
+            pending.append(Question(quiz=quiz, text=f"{quiz.title} question {n}"))
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+
+    return quizzes
+
+
+def synthetic_question(n, choices=4, seed=""):
+    """One question dict in the json_quizzes/ file format."""
+    return {
+        "text": f"{BENCH_PREFIX} question {n}{seed}",
+        "explanation": f"Explanation for question {n}.",
+        "choices": [
+            {"text": f"Choice {c} of {n}", "is_correct": c == n % choices}
+            for c in range(choices)
+        ],
+    }
+
+
+def write_synthetic_json_files(directory, questions, files=20, choices=4):
+    """
+    Write ``questions`` synthetic questions split over ``files`` JSON files
+    named ``bench_<i>.json``. Returns [(path, quiz_title)].
+    """
+    import json
+    import os
+
+    per_file = math.ceil(questions / files)
+    written = []
+    for i in range(files):
+        start = i * per_file
+        stop = min(questions, start + per_file)
+        if start >= stop:
+            break
+        path = os.path.join(directory, f"bench_{i}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([synthetic_question(n, choices) for n in range(start, stop)], f)
+        written.append((path, f"{BENCH_PREFIX} {i}"))
+    return written
+
+
+def build_synthetic_history(user, results, quizzes, start=None, batch_size=5000):
+    """
+    Insert ``results`` QuizResults for ``user``, one minute apart going
+    back from ``start``, cycling over ``quizzes``. Raw executemany: model
+    saves would stamp every row with the same auto_now_add time.
+    """
+    from datetime import timedelta
+
+    from django.db import connection
+    from django.utils import timezone
+
+    from .models import QuizResult
+
+    start = start or timezone.now()
+    meta = QuizResult._meta
+    quote = connection.ops.quote_name
+    names = ("quiz", "user", "quiz_type", "score", "correct", "total", "time_spent", "submitted_at")
+    columns = [meta.get_field(name).column for name in names]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(meta.db_table), ", ".join(quote(c) for c in columns), ", ".join(["%s"] * len(columns))
+    )
+
+    rows = []
+    with connection.cursor() as cursor:
+        for n in range(results):
+            quiz = quizzes[n % len(quizzes)]
+            submitted_at = connection.ops.adapt_datetimefield_value(start - timedelta(minutes=n))
+            rows.append((quiz.id, user.id, quiz.quiz_type, n % 101, n % 21, 20, 60, submitted_at))
+            if len(rows) >= batch_size:
+                cursor.executemany(sql, rows)
+                rows.clear()
+        if rows:
+            cursor.executemany(sql, rows)
@@ -0,0 +1,154 @@
+"""
+Compact sets of question IDs (roaring-style bitmaps).
+
+An ID's high bits pick a container of up to 65,536 values. A container
+of at most 4,096 IDs is a sorted ``array('H')`` of their low 16 bits (2
+bytes per ID). A fuller one becomes a fixed 8 KiB bitmap. ``to_bytes()``
+writes the containers one after the other and ``from_bytes()`` slices
+them back out with no per-ID work. Loading a set and testing membership
+(``in``: a dict lookup, then a bisect or a bit test) therefore cost about
+the same for 50 IDs as for 500,000.
+"""
+import bisect
+import struct
+import sys
+from array import array
+
+
+ARRAY_MAX = 4096          # above this a container is stored as a bitmap
+BITMAP_BYTES = 1 << 13    # 65,536 bits
+FORMAT = 1
+
+_HEADER = struct.Struct("<B")
+_CONTAINER = struct.Struct("<IBI")  # high bits, kind, cardinality
+_ARRAY, _BITMAP = 0, 1
+
+
+def _low_array(data=b""):
+    values = array("H")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()  # stored little-endian
+    return values
+
+
+def _array_bytes(values):
+    if sys.byteorder == "big":
+        values = array("H", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _bitmap_of(lows):
+    bits = bytearray(BITMAP_BYTES)
+    for low in lows:
+        bits[low >> 3] |= 1 << (low & 7)
+    return bits
+
+
+class IdBitmap:
+    """A set of non-negative integer IDs stored in roaring-style containers."""
+
+    __slots__ = ("_containers", "_count")
+
+    def __init__(self, ids=()):
+        self._containers = {}  # high bits -> [cardinality, array('H') | bytearray]
+        self._count = 0
+        if ids:
+            self.add_many(ids)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bitmap = cls()
+        if not data:
+            return bitmap
+        data = memoryview(data)
+        (version,) = _HEADER.unpack_from(data)
+        if version != FORMAT:
+            raise ValueError(f"Unknown bitmap format {version}")
+        offset = _HEADER.size
+        while offset < len(data):
+            high, kind, cardinality = _CONTAINER.unpack_from(data, offset)
+            offset += _CONTAINER.size
+            if kind == _ARRAY:
+                end = offset + cardinality * 2
+                container = _low_array(data[offset:end])
+            else:
+                end = offset + BITMAP_BYTES
+                container = bytearray(data[offset:end])
+            bitmap._containers[high] = [cardinality, container]
+            bitmap._count += cardinality
+            offset = end
+        return bitmap
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(FORMAT)]
+        for high in sorted(self._containers):
+            cardinality, container = self._containers[high]
+            if isinstance(container, array):
+                parts += [_CONTAINER.pack(high, _ARRAY, cardinality), _array_bytes(container)]
+            else:
+                parts += [_CONTAINER.pack(high, _BITMAP, cardinality), bytes(container)]
+        return b"".join(parts)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, value):
+        entry = self._containers.get(value >> 16)
+        if entry is None:
+            return False
+        low, container = value & 0xFFFF, entry[1]
+        if isinstance(container, array):
+            i = bisect.bisect_left(container, low)
+            return i < len(container) and container[i] == low
+        return bool(container[low >> 3] >> (low & 7) & 1)
+
+    def __iter__(self):
+        for high in sorted(self._containers):
+            base = high << 16
+            container = self._containers[high][1]
+            if isinstance(container, array):
+                for low in container:
+                    yield base | low
+            else:
+                for byte_index, byte in enumerate(container):
+                    while byte:
+                        bit = byte & -byte
+                        yield base | (byte_index << 3) | (bit.bit_length() - 1)
+                        byte ^= bit
+
+    def add_many(self, ids):
+        """Add ``ids``; returns how many were new."""
+        by_high = {}
+        for value in ids:
+            if value < 0:
+                raise ValueError(f"IdBitmap holds non-negative IDs, not {value}")
+            by_high.setdefault(value >> 16, set()).add(value & 0xFFFF)
+
+        added = 0
+        for high, lows in by_high.items():
+            entry = self._containers.get(high)
+            if entry is None:
+                entry = self._containers[high] = [0, array("H")]
+            cardinality, container = entry
+
+            if isinstance(container, array):
+                merged = set(container)
+                merged.update(lows)
+                new = len(merged) - cardinality
+                if len(merged) > ARRAY_MAX:
+                    entry[1] = _bitmap_of(merged)
+                else:
+                    entry[1] = array("H", sorted(merged))
+            else:
+                new = 0
+                for low in lows:
+                    mask = 1 << (low & 7)
+                    if not container[low >> 3] & mask:
+                        container[low >> 3] |= mask
+                        new += 1
+            entry[0] += new
+            added += new
+        self._count += added
+        return added
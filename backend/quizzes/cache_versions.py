@@ -0,0 +1,40 @@
+"""
+Monotonic version counters kept in the ``versions`` Django cache.
+
+The cache is shared by every worker and ``manage.py`` (``CACHES`` in
+settings, ``backend/caches.py``), so a bump made by a loader, the admin or
+another worker is seen by all of them on their next read. It is kept
+apart from the default cache so culling there never drops a counter, and
+its ``incr`` is atomic across processes on every backend.
+
+Cached artefacts embed the current version in their keys; bumping the
+version makes every older entry unreachable without having to find and
+delete them. Counters start from the current time in milliseconds so a
+counter that was evicted never restarts at a value older entries used.
+"""
+import time
+
+from django.core.cache import caches
+
+
+def _key(name):
+    return f"quizzes:version:{name}"
+
+
+def get_version(name):
+    counters = caches["versions"]
+    version = counters.get(_key(name))
+    if version is None:
+        counters.add(_key(name), int(time.time() * 1000), timeout=None)
+        version = counters.get(_key(name))
+    return version
+
+
+def bump_version(name):
+    counters = caches["versions"]
+    try:
+        return counters.incr(_key(name))
+    except ValueError:
+        # Counter missing (first use or evicted): start a fresh epoch.
+        counters.add(_key(name), int(time.time() * 1000), timeout=None)
+        return counters.incr(_key(name))
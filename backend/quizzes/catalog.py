@@ -0,0 +1,126 @@
+"""
+Conditional GET for the quiz catalog endpoints.
+
+The catalog (quiz list, grouped and by-type views) changes a few times a
+week but is downloaded on every page load. A single content version,
+``catalog_version()``, is bumped by the Quiz / Passage / DataSet /
+Question / Choice signals in ``quizzes/signals.py`` (and by the bulk
+importer, which sends no signals). The catalog views derive a strong
+ETag and a Last-Modified date from it, and ``If-None-Match`` /
+``If-Modified-Since`` are answered with a 304 before the view touches
+the database: the only work is two cache reads.
+
+The version lives in the shared Django cache like the answer-key version,
+so every worker moves to the new ETag as soon as any process bumps it.
+
+``summary_queryset`` is the light catalog for the home and quiz-type
+pages: quiz titles, types, time limits and counts, one aggregate query,
+no question trees (those stay with the detail endpoints).
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache_versions import get_version, bump_version
+from .models import Quiz, Question
+from .serializers import QuizSummarySerializer
+
+
+VERSION_NAME = "catalog"
+
+
+def _modified_key(version):
+    return f"quizzes:catalog:modified:{version}"
+
+
+def invalidate_catalog(**kwargs):
+    version = bump_version(VERSION_NAME)
+    cache.set(_modified_key(version), timezone.now(), timeout=None)
+
+
+def catalog_version():
+    """(version, modified_at) of the catalog content."""
+    version = get_version(VERSION_NAME)
+    modified = cache.get(_modified_key(version))
+    if modified is None:
+        # First use (or evicted): the content is at least as new as now
+        cache.add(_modified_key(version), timezone.now().replace(microsecond=0), timeout=None)
+        modified = cache.get(_modified_key(version))
+    return version, modified
+
+
+def catalog_etag(request, *args, **kwargs):
+    # JSON and the browsable API are different bytes, so they get different tags
+    renderer = getattr(getattr(request, "accepted_renderer", None), "format", "json")
+    version, _ = catalog_version()
+    return f"catalog-{version}-{renderer}"
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return catalog_version()[1]
+
+
+# Decorates the ``get`` of a DRF view: runs after content negotiation and
+# before the handler, so a 304 skips every query and the serialization.
+conditional_catalog = method_decorator(
+    condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified),
+    name="get",
+)
+
+
+# ----------------------------------------------------------------------
+# Summary
+# ----------------------------------------------------------------------
+def _question_count(**owner):
+    # Correlated COUNT over one indexed path (quiz_id, or passage/dataset -> quiz_id)
+    return Coalesce(Subquery(
+        Question.objects.filter(**owner)
+        .order_by()
+        .annotate(n=Func(F('id'), function='COUNT'))
+        .values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def summary_queryset():
+    """
+    Every quiz with ``question_count`` (standalone, passage and dataset
+    questions), ``passage_count`` and ``dataset_count`` in a single query.
+    """
+    return (
+        Quiz.objects.order_by('id')
+        # Passages and datasets are a handful per quiz: joining both is cheap
+        .annotate(
+            passage_count=Count('passages', distinct=True),
+            dataset_count=Count('datasets', distinct=True),
+            question_count=(
+                _question_count(quiz=OuterRef('pk'), passage__isnull=True, dataset__isnull=True)
+                + _question_count(passage__quiz=OuterRef('pk'))
+                + _question_count(dataset__quiz=OuterRef('pk'))
+            ),
+        )
+    )
+
+
+def type_totals(quizzes):
+    """Per quiz type: label, number of quizzes and of questions."""
+    totals = {code: {"code": code, "label": label, "quizzes": 0, "questions": 0} for code, label in Quiz.QUIZ_TYPES}
+    for quiz in quizzes:
+        row = totals.get(quiz.quiz_type)
+        if row:
+            row["quizzes"] += 1
+            row["questions"] += quiz.question_count
+    return list(totals.values())
+
+
+def summary_payload():
+    """Body of ``summary/``: per-type totals and one light row per quiz."""
+    quizzes = list(summary_queryset())
+    return {
+        "types": type_totals(quizzes),
+        "quizzes": QuizSummarySerializer(quizzes, many=True).data,
+        "total": len(quizzes),
+    }
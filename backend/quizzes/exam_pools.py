@@ -0,0 +1,369 @@
+"""
+Pre-generated exam pools.
+
+Every quiz detail and ``random/?type=`` request samples the bank, loads
+the rows and runs the nested serializers. A pool holds
+``QUIZ_EXAM_POOL_SIZE`` exam variants of one quiz or one quiz type,
+sampled and serialized ahead of time and stored in the shared Django cache
+as a single entry, so every worker serves the pools one of them built.
+A request reads the pool and the catalog version (the bank version, see
+``catalog.py``), picks a variant at random and only signs its exam token. Variants are rotated
+rather than popped, so serving never writes to the cache. The pools are
+opt-in: with ``QUIZ_EXAM_POOL_SIZE`` at 0 (the default) every request
+samples live and no refiller is started.
+
+A pool is not served when it is missing, was built for an older catalog
+version (any change to the bank, bulk imports included), or is older than
+``QUIZ_EXAM_POOL_MAX_AGE`` (so the variants on offer keep changing):
+requests fall back to live sampling and mark the pool wanted. Pools are
+rebuilt one refill interval before their max age, so the age limit only
+shows when no refiller is running. Each
+process that serves a pooled exam starts a refiller thread that wakes every
+``QUIZ_EXAM_POOL_REFILL_INTERVAL`` seconds, and at once after a miss.
+``manage.py refill_exam_pools`` does the same job from outside. The
+refillers of all processes see the same pools and skip the fresh ones,
+and a ``cache.add`` lease per pool keeps two of them from building the
+same pool.
+
+Hits, misses, the pool sizes this process has seen and the refill lag are
+exported at ``/metrics``. The refill lag runs from the first miss, or the
+end of the max age, to the rebuild.
+"""
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from rest_framework.renderers import JSONRenderer
+
+from .cache_versions import get_version
+from .catalog import VERSION_NAME as CATALOG_VERSION
+from .exam_tokens import issue_exam_token, collect_question_ids
+from .metrics import Histogram
+from .models import Quiz
+from .sampling import get_sampling_index, fetch_questions, fetch_passages, fetch_datasets
+from .serializers import QuizSerializer
+
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("quiz", "type")
+
+LEASE_SECONDS = 60
+WANTED_SECONDS = 60 * 60
+
+REFILL_LAG = Histogram(
+    "quiz_exam_pool_refill_lag_seconds",
+    "Time from a pool being needed (first miss or end of its max age) to its rebuild.",
+    labelnames=("kind",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+_stats = {kind: {"hits": 0, "misses": 0, "refills": 0} for kind in KINDS}
+_sizes = {}  # (kind, key) -> variants in the pool, as last seen here
+_stats_lock = threading.Lock()
+
+
+def pool_size():
+    """Variants per pool; 0 (the default) turns the pools, and the refiller, off."""
+    return getattr(settings, "QUIZ_EXAM_POOL_SIZE", 0)
+
+
+def _max_age():
+    return getattr(settings, "QUIZ_EXAM_POOL_MAX_AGE", 15 * 60)
+
+
+def _seen_max_overlap():
+    return getattr(settings, "QUIZ_SEEN_POOL_MAX_OVERLAP", 0.5)
+
+
+def _refill_margin():
+    # Pools are rebuilt this long before their max age, so the refiller
+    # replaces them before requests start missing
+    interval = getattr(settings, "QUIZ_EXAM_POOL_REFILL_INTERVAL", 30)
+    return min(interval, _max_age() / 2)
+
+
+def _pool_key(kind, key):
+    return f"quizzes:exam_pool:{kind}:{key}"
+
+
+def _wanted_key(kind, key):
+    return f"quizzes:exam_pool:{kind}:{key}:wanted"
+
+
+def _count(kind, name, size=None, key=None):
+    with _stats_lock:
+        _stats[kind][name] += 1
+        if size is not None:
+            _sizes[(kind, key)] = size
+
+
+def pool_stats():
+    """Per kind: hits, misses, hit ratio, refills and pool sizes seen by this process."""
+    with _stats_lock:
+        stats = {kind: dict(counts) for kind, counts in _stats.items()}
+        sizes = dict(_sizes)
+    for kind, counts in stats.items():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        counts["pools"] = {key: size for (k, key), size in sorted(sizes.items()) if k == kind}
+    return stats
+
+
+# ----------------------------------------------------------------------
+# Serving
+# ----------------------------------------------------------------------
+def pooled_exam(kind, key, request, seen=None):
+    """
+    A pre-generated exam of quiz ``key`` (``kind="quiz"``) or quiz type
+    ``key`` (``kind="type"``) with a fresh exam token, or None when its
+    pool is missing or stale: serve a live exam then, and ``mark_wanted``.
+
+    With the user's seen set, the variant repeating the fewest of their
+    questions is served; None (a live exam that avoids them) when even
+    that one repeats more than ``QUIZ_SEEN_POOL_MAX_OVERLAP`` of its
+    questions.
+    """
+    if not pool_size():
+        return None
+    start_refiller()
+
+    version = get_version(CATALOG_VERSION)
+    pool = cache.get(_pool_key(kind, key))
+    if (pool is None or pool["version"] != version or not pool["variants"]
+            or pool["built_at"] + _max_age() <= time.time()):
+        _count(kind, "misses")
+        return None
+    position = random.randrange(len(pool["variants"]))
+    if seen:
+        overlaps = [sum(qid in seen for qid in ids) for ids in pool["question_ids"]]
+        fewest = min(overlaps)
+        position = random.choice([i for i, overlap in enumerate(overlaps) if overlap == fewest])
+        if fewest > _seen_max_overlap() * len(pool["question_ids"][position]):
+            _count(kind, "misses")
+            return None
+    _count(kind, "hits", len(pool["variants"]), key)
+
+    # Variants are stored as JSON: only the one served is decoded
+    variant = json.loads(pool["variants"][position])
+    payload = variant["payload"]
+    for dataset in payload.get("datasets") or []:
+        # Built without a request: make image URLs absolute like the live views
+        if dataset.get("image"):
+            dataset["image"] = request.build_absolute_uri(dataset["image"])
+
+    if kind == "quiz":
+        quiz = Quiz(id=key, time_limit=variant["time_limit"])
+        payload["exam_token"] = issue_exam_token(variant["question_ids"], quiz=quiz)
+    else:
+        payload["exam_token"] = issue_exam_token(variant["question_ids"], quiz_type=key)
+    return payload
+
+
+def mark_wanted(kind, key):
+    """Record that a request was served live (the refill lag starts now) and wake the refiller."""
+    if not pool_size():
+        return
+    cache.add(_wanted_key(kind, key), time.time(), timeout=WANTED_SECONDS)
+    if _refiller is not None:
+        _refiller.wake()
+
+
+# ----------------------------------------------------------------------
+# Building
+# ----------------------------------------------------------------------
+def _by_id(rows):
+    return {row.id: row for row in rows}
+
+
+def _variant(payload, **extra):
+    return JSONRenderer().render({"payload": payload, "question_ids": collect_question_ids(payload), **extra})
+
+
+def build_quiz_variants(quiz, index, size):
+    """``size`` serialized detail payloads of ``quiz`` (one query per model for all of them)."""
+    from .views import QuizDetailAPIView, sample_quiz
+
+    limit = QuizDetailAPIView.QUESTION_LIMITS.get(quiz.quiz_type, 20)
+    samples = [sample_quiz(quiz, index, limit) for _ in range(size)]
+    questions = _by_id(fetch_questions([qid for s in samples for qid in s[0]]))
+    passages = _by_id(fetch_passages(sorted({pid for s in samples for pid in s[1]})))
+    datasets = _by_id(fetch_datasets(sorted({did for s in samples for did in s[2]})))
+
+    variants = []
+    for question_ids, passage_ids, dataset_ids in samples:
+        context = {
+            "sampled_questions": [questions[i] for i in dict.fromkeys(question_ids) if i in questions],
+            "randomized_passages": [passages[i] for i in passage_ids if i in passages],
+            "randomized_datasets": [datasets[i] for i in dataset_ids if i in datasets],
+        }
+        payload = QuizSerializer(quiz, context=context).data
+        variants.append(_variant(payload, time_limit=quiz.time_limit))
+    return variants
+
+
+def build_type_variants(quiz_type, index, size):
+    """``size`` serialized random exams of ``quiz_type``."""
+    from .views import sample_random_quiz, random_quiz_payload
+
+    samples = [sample_random_quiz(quiz_type, index) for _ in range(size)]
+    questions = _by_id(fetch_questions(
+        [qid for s in samples for qid in s["standalone_ids"] + s["group_question_ids"]]
+    ))
+    passages = _by_id(fetch_passages(sorted({s["passage_id"] for s in samples if s["passage_id"]})))
+    datasets = _by_id(fetch_datasets(sorted({s["dataset_id"] for s in samples if s["dataset_id"]})))
+
+    variants = []
+    for sample in samples:
+        ids = dict.fromkeys(sample["standalone_ids"] + sample["group_question_ids"])
+        payload = random_quiz_payload(
+            None, quiz_type, sample, [questions[i] for i in ids if i in questions],
+            passages.get(sample["passage_id"]), datasets.get(sample["dataset_id"]),
+        )
+        variants.append(_variant(payload))
+    return variants
+
+
+def refill_pools(force=False):
+    """
+    Rebuild every pool that is missing, stale, short or past its max age
+    (all of them with ``force``), the ones requests are waiting for first.
+    Pools another process is building are skipped. Returns the number of
+    pools rebuilt.
+    """
+    size = pool_size()
+    if not size:
+        return 0
+
+    version = get_version(CATALOG_VERSION)
+    index = get_sampling_index()
+    targets = [("type", quiz_type) for quiz_type in sorted(index.type_quizzes)]
+    targets += [("quiz", quiz_id) for quiz_id in sorted(q for ids in index.type_quizzes.values() for q in ids)]
+
+    pools = cache.get_many([_pool_key(*target) for target in targets])
+    wanted = cache.get_many([_wanted_key(*target) for target in targets])
+    now = time.time()
+    due = []
+    for target in targets:
+        pool = pools.get(_pool_key(*target))
+        if force or pool is None or pool["version"] != version or len(pool["variants"]) < size:
+            due.append((target, wanted.get(_wanted_key(*target))))
+        elif pool["built_at"] + _max_age() - _refill_margin() <= now:
+            due.append((target, pool["built_at"] + _max_age()))
+    due.sort(key=lambda item: item[1] is None)
+
+    quizzes = Quiz.objects.in_bulk([key for (kind, key), _ in due if kind == "quiz"])
+    rebuilt = 0
+    for (kind, key), needed_since in due:
+        if kind == "quiz" and key not in quizzes:
+            continue
+        lease = f"{_pool_key(kind, key)}:lease"
+        if not cache.add(lease, 1, timeout=LEASE_SECONDS):
+            continue  # another process is building this one
+        try:
+            if kind == "quiz":
+                variants = build_quiz_variants(quizzes[key], index, size)
+            else:
+                variants = build_type_variants(key, index, size)
+            cache.set(_pool_key(kind, key), {
+                "version": version,
+                "built_at": time.time(),
+                "variants": variants,
+                # Per variant, for choosing one against a user's seen set without decoding them all
+                "question_ids": [json.loads(variant)["question_ids"] for variant in variants],
+            }, timeout=None)
+        finally:
+            cache.delete(lease)
+
+        cache.delete(_wanted_key(kind, key))
+        if needed_since is not None:
+            REFILL_LAG.observe(max(0.0, time.time() - needed_since), kind)
+        _count(kind, "refills", len(variants), key)
+        rebuilt += 1
+    return rebuilt
+
+
+# ----------------------------------------------------------------------
+# Background refiller
+# ----------------------------------------------------------------------
+class PoolRefiller:
+    """Thread running ``refill`` every ``interval`` seconds, and whenever woken."""
+
+    def __init__(self, interval, refill=None):
+        self.interval = interval
+        self.refill = refill or refill_pools
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._wakeup.set()  # fill the pools straight away
+            self._thread = threading.Thread(target=self._run, name="exam-pool-refiller", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            close_old_connections()
+            try:
+                self.refill()
+            except Exception:
+                logger.exception("Exam pool refill failed")
+        connection.close()
+
+    def close(self):
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            thread.join()
+            self._thread = None
+
+
+_refiller = None
+_refiller_lock = threading.Lock()
+
+
+def start_refiller():
+    """The process-wide refiller, started on first use; None when the interval is 0."""
+    global _refiller
+    interval = getattr(settings, "QUIZ_EXAM_POOL_REFILL_INTERVAL", 30)
+    if _refiller is not None or not interval:
+        return _refiller
+    with _refiller_lock:
+        if _refiller is None:
+            _refiller = PoolRefiller(interval)
+            _refiller.start()
+    return _refiller
+
+
+class ExamPoolMetrics:
+    """``/metrics`` collector for the exam pools (see ``quizzes/metrics.py``)."""
+
+    def render(self):
+        stats = pool_stats()
+        lines = []
+        for name in ("hits", "misses", "refills"):
+            lines.append(f"# TYPE quiz_exam_pool_{name}_total counter")
+            lines += [f'quiz_exam_pool_{name}_total{{kind="{kind}"}} {stats[kind][name]}' for kind in KINDS]
+        lines.append("# TYPE quiz_exam_pool_hit_ratio gauge")
+        lines += [f'quiz_exam_pool_hit_ratio{{kind="{kind}"}} {stats[kind]["hit_ratio"]}' for kind in KINDS]
+        lines.append("# TYPE quiz_exam_pool_variants gauge")
+        for kind in KINDS:
+            lines += [
+                f'quiz_exam_pool_variants{{kind="{kind}",key="{key}"}} {size}'
+                for key, size in stats[kind]["pools"].items()
+            ]
+        return "\n".join(lines) + "\n" + REFILL_LAG.render()
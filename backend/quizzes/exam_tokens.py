@@ -0,0 +1,108 @@
+"""
+Signed exam-session tokens.
+
+The detail and ``random/`` endpoints hand out a token that records exactly
+which questions were delivered, for which quiz (or quiz type) and when.
+Submissions grade that set and nothing else, so clients can neither shrink
+the exam nor force a re-sampling. Tokens are HMAC-signed with SECRET_KEY
+(``django.core.signing``) and never stored.
+"""
+import time
+
+from django.conf import settings
+from django.core import signing
+
+
+SALT = "quizzes.exam_token"
+
+
+class ExamTokenError(ValueError):
+    """Raised when a submission's exam token is missing, forged or expired."""
+
+
+def _grace_seconds():
+    return getattr(settings, "EXAM_TOKEN_GRACE_SECONDS", 120)
+
+
+def _untimed_max_age():
+    return getattr(settings, "EXAM_TOKEN_UNTIMED_MAX_AGE", 60 * 60 * 6)
+
+
+def token_lifetime(time_limit):
+    """Seconds a session stays valid for a quiz with ``time_limit`` minutes."""
+    if time_limit and time_limit > 0:
+        return time_limit * 60 + _grace_seconds()
+    return _untimed_max_age()
+
+
+def _pack_ids(ids):
+    """Sorted IDs as deltas — keeps the signed payload small."""
+    packed, previous = [], 0
+    for qid in sorted(set(ids)):
+        packed.append(qid - previous)
+        previous = qid
+    return packed
+
+
+def _unpack_ids(packed):
+    ids, current = [], 0
+    for delta in packed:
+        current += delta
+        ids.append(current)
+    return ids
+
+
+def collect_question_ids(payload):
+    """Every question ID a serialized exam payload shows to the client."""
+    ids = [q["id"] for q in payload.get("questions") or []]
+    groups = list(payload.get("passages") or []) + list(payload.get("datasets") or [])
+    if payload.get("passage"):
+        groups.append(payload["passage"])
+    for group in groups:
+        ids.extend(q["id"] for q in group.get("questions") or [])
+    return ids
+
+
+def issue_exam_token(question_ids, quiz=None, quiz_type=None):
+    """Sign a session for a quiz (detail mode) or a quiz type (random mode)."""
+    now = int(time.time())
+    if quiz is not None:
+        scope = f"q:{quiz.id}"
+        lifetime = token_lifetime(quiz.time_limit)
+    else:
+        scope = f"t:{quiz_type}"
+        lifetime = token_lifetime(0)
+
+    payload = {"s": scope, "i": now, "e": now + lifetime, "q": _pack_ids(question_ids)}
+    return signing.Signer(salt=SALT).sign_object(payload, compress=True)
+
+
+def verify_exam_token(token, quiz=None, quiz_type=None):
+    """
+    Return ``{"questions": [...], "quiz_type": ..., "issued_at": ...}`` for a
+    valid token issued for ``quiz`` / ``quiz_type``; raise ExamTokenError
+    otherwise.
+    """
+    if not token:
+        raise ExamTokenError("Missing exam session token.")
+
+    try:
+        payload = signing.Signer(salt=SALT).unsign_object(token)
+    except signing.BadSignature:
+        raise ExamTokenError("Invalid exam session token.")
+
+    scope = payload.get("s", "")
+    expected = f"q:{quiz.id}" if quiz is not None else None
+    if expected and scope != expected:
+        raise ExamTokenError("Exam session token does not belong to this quiz.")
+    if quiz is None and (not scope.startswith("t:") or (quiz_type and scope != f"t:{quiz_type}")):
+        raise ExamTokenError("Exam session token does not belong to this quiz type.")
+
+    if payload.get("e", 0) < time.time():
+        raise ExamTokenError("Exam session has expired.")
+
+    return {
+        "questions": _unpack_ids(payload.get("q", [])),
+        "quiz_type": scope[2:] if scope.startswith("t:") else None,
+        "issued_at": payload.get("i"),
+    }
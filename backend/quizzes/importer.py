@@ -0,0 +1,631 @@
+"""
+Bulk, idempotent import engine shared by the quiz loader commands.
+
+The loaders used to ``get_or_create`` every question and choice (thousands
+of round trips) or delete and recreate a whole quiz (new primary keys on
+every run, so exam tokens and cached answer keys pointed at rows that no
+longer existed).
+
+``import_quiz_file`` instead syncs one file into one quiz:
+
+1. every incoming question is normalised and hashed (text, explanation,
+   type and choices -> ``Question.content_hash``);
+2. the quiz's existing questions in scope are read with one query and
+   matched by text;
+3. unchanged rows are skipped, changed rows are ``bulk_update``d (their
+   choices diffed by text, so choice IDs survive too), new rows are
+   ``bulk_create``d and rows missing from the file are deleted.
+
+Everything for a file runs in one transaction. Re-importing an unchanged
+file reads but writes nothing, and existing question, choice and passage
+IDs are kept.
+
+Input can be a parsed list or a lazy iterator: ``iter_file_items``
+streams the items of a top-level JSON array (or a JSON Lines file) one at
+a time and rows are written in bounded batches, so peak memory does not
+grow with the size of the file (only the quiz's existing rows are kept,
+as 20-byte digests).
+
+``parse_quiz_file`` does the read-and-validate half of a file on its own
+(no database access), so ``load_all_stand_alone_quizzes --workers N`` can
+run it in a process pool and feed the normalised rows to a single writer.
+
+Bulk writes do not send model signals, so the sampling index, the
+answer-key cache and the catalog version are invalidated once the
+transaction commits.
+"""
+import hashlib
+import itertools
+import json
+import time
+
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from .models import Quiz, Passage, Question, Choice
+from .sampling import invalidate_sampling_index
+from .answer_keys import invalidate_answer_keys
+from .catalog import invalidate_catalog
+
+
+BATCH_SIZE = 1000
+
+# bulk_update builds one CASE WHEN per field per batch, which SQLite
+# evaluates row by row; small batches keep that linear
+UPDATE_BATCH_SIZE = 100
+
+# Stay under SQLite's bound-parameter limit for id__in lookups
+IN_CHUNK = 900
+
+
+def _chunks(items, size=IN_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def _insert_choices(rows):
+    """
+    Insert (question_id, text, is_correct) tuples with executemany.
+    Choices are the bulk of an import (4+ per question) and nothing needs
+    their IDs back, so this skips building a model instance per row, which
+    is most of bulk_create's cost at this volume.
+    """
+    if not rows:
+        return
+    meta = Choice._meta
+    quote = connection.ops.quote_name
+    columns = [meta.get_field(name).column for name in ("question", "text", "is_correct")]
+    sql = "INSERT INTO {} ({}) VALUES (%s, %s, %s)".format(
+        quote(meta.db_table), ", ".join(quote(c) for c in columns)
+    )
+    with connection.cursor() as cursor:
+        for chunk in _chunks(rows, BATCH_SIZE * 10):
+            cursor.executemany(sql, chunk)
+
+
+# ----------------------------------------------------------------------
+# Normalisation
+# ----------------------------------------------------------------------
+def normalize_question(raw, default_type="MCQ"):
+    """
+    Clean one question dict from a JSON file. Choices with empty text are
+    dropped; text is stripped.
+    """
+    choices = [
+        (choice["text"].strip(), bool(choice.get("is_correct", False)))
+        for choice in raw.get("choices", [])
+        if (choice.get("text") or "").strip()
+    ]
+    question = {
+        "text": raw["text"].strip(),
+        "explanation": raw.get("explanation", "") or "",
+        "question_type": raw.get("question_type") or default_type,
+        "choices": choices,
+    }
+    question["hash"] = content_hash(question)
+    return question
+
+
+def content_hash(question):
+    payload = [
+        question["text"],
+        question["explanation"],
+        question["question_type"],
+        question["choices"],
+    ]
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def load_json_file(path):
+    """Parse a JSON file. Returns (data, parse_ms)."""
+    start = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data, _ms(start)
+
+
+# ----------------------------------------------------------------------
+# Streaming readers
+# ----------------------------------------------------------------------
+READ_CHUNK = 1 << 16
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK):
+    """
+    Yield the items of a top-level JSON array one at a time, reading the
+    file in chunks. Memory is bounded by the largest single item plus one
+    chunk, not by the file size.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_space()
+    if buffer[pos:pos + 1] != "[":
+        raise ValueError("Expected a top-level JSON array")
+    pos += 1
+
+    expect_item = True
+    while True:
+        skip_space()
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file inside the top-level array")
+        if buffer[pos] == "]":
+            return
+        if not expect_item:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {pos}")
+            pos += 1
+            expect_item = True
+            continue
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item not complete yet: read more (and fail for real at EOF)
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number may continue in the next chunk
+                fill()
+                continue
+            break
+        pos = end
+        expect_item = False
+        yield item
+
+
+def iter_json_lines(f):
+    """Yield one item per non-empty line of a JSON Lines file."""
+    for number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number}: {e}") from e
+
+
+def iter_file_items(path):
+    """
+    Stream the top-level items of ``path``: JSON Lines for ``.jsonl`` /
+    ``.ndjson`` files, otherwise a top-level JSON array.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            yield from iter_json_lines(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def read_items(path, stream=False):
+    """
+    The top-level items of a quiz file: parsed in one go, or (with
+    ``stream``, and always for JSON Lines) one item at a time.
+    """
+    if stream or path.endswith((".jsonl", ".ndjson")):
+        return iter_file_items(path)
+    return _load_lazily(path)
+
+
+def _load_lazily(path):
+    # Parse on first use so the importer's batching times it as parse time
+    yield from load_json_file(path)[0]
+
+
+def parse_quiz_file(path, stream=False):
+    """
+    Read and normalise every standalone question of ``path``. Touches no
+    database, so it can run in a worker process; the result is handed to
+    ``import_quiz_file(..., normalized=True)``.
+
+    Returns (questions, parse_ms, error). ``parse_ms`` is CPU time, so
+    workers sharing a core do not inflate it. A broken file is reported as
+    an error message instead of raised, so one bad file does not take down
+    the other files of a process pool.
+    """
+    start = time.process_time()
+    try:
+        questions = [normalize_question(raw) for raw in read_items(path, stream=stream)]
+    except (OSError, ValueError, KeyError) as e:
+        return [], (time.process_time() - start) * 1000, str(e)
+    return questions, (time.process_time() - start) * 1000, None
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+class ImportReport:
+    """Row counts and timings (ms) for one imported file."""
+
+    COUNTERS = (
+        "questions_created", "questions_updated", "questions_deleted", "questions_unchanged",
+        "choices_created", "choices_updated", "choices_deleted",
+        "passages_created", "passages_updated", "passages_deleted",
+        "duplicates",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.timings = {"parse": 0.0, "diff": 0.0, "write": 0.0}
+
+    def add(self, counter, n=1):
+        self.counts[counter] += n
+
+    @property
+    def questions(self):
+        c = self.counts
+        return c["questions_created"] + c["questions_updated"] + c["questions_unchanged"]
+
+    @property
+    def changed(self):
+        return any(v for k, v in self.counts.items() if k not in ("questions_unchanged", "duplicates"))
+
+    @property
+    def total_ms(self):
+        return sum(self.timings.values())
+
+    def summary(self):
+        c, t = self.counts, self.timings
+        line = (
+            f"{self.questions} questions ({c['questions_created']} new, {c['questions_updated']} updated, "
+            f"{c['questions_deleted']} deleted, {c['questions_unchanged']} unchanged)"
+        )
+        if c["passages_created"] or c["passages_updated"] or c["passages_deleted"]:
+            line += (
+                f", passages +{c['passages_created']}/~{c['passages_updated']}/-{c['passages_deleted']}"
+            )
+        line += f" | parse {t['parse']:.1f} ms, diff {t['diff']:.1f} ms, write {t['write']:.1f} ms"
+        return line
+
+
+# ----------------------------------------------------------------------
+# Quizzes
+# ----------------------------------------------------------------------
+def sync_quizzes(rows):
+    """
+    Create the (title, quiz_type, description) quizzes that do not exist
+    yet with one bulk insert. Existing quizzes are left untouched.
+    Returns (created_titles, existing_titles).
+    """
+    existing = set(Quiz.objects.values_list("title", "quiz_type"))
+    missing = [row for row in rows if (row[0], row[1]) not in existing]
+
+    with transaction.atomic():
+        Quiz.objects.bulk_create([
+            Quiz(title=title, quiz_type=quiz_type, description=description, time_limit=20, is_random=False)
+            for title, quiz_type, description in missing
+        ])
+        if missing:
+            transaction.on_commit(invalidate_sampling_index)
+            transaction.on_commit(invalidate_catalog)
+
+    created = [row[0] for row in missing]
+    return created, [row[0] for row in rows if (row[0], row[1]) in existing]
+
+
+# ----------------------------------------------------------------------
+# Questions / passages
+# ----------------------------------------------------------------------
+def _key(text):
+    # Existing rows are kept as 20-byte digests, so the bookkeeping for a
+    # large quiz stays small
+    return hashlib.sha1(text.strip().encode("utf-8")).digest()
+
+
+def _sync_choices(question_ids, incoming, report):
+    """Diff the choices of changed questions by text, keeping choice IDs."""
+    existing = {}
+    for chunk in _chunks(question_ids):
+        for choice_id, question_id, text, is_correct in (
+            Choice.objects.filter(question_id__in=chunk)
+            .order_by("id")
+            .values_list("id", "question_id", "text", "is_correct")
+        ):
+            existing.setdefault(question_id, []).append((choice_id, (text or "").strip(), is_correct))
+
+    to_create, to_update, to_delete = [], [], []
+    for question_id in question_ids:
+        current = {}
+        for choice_id, text, is_correct in existing.get(question_id, ()):
+            if text in current:
+                to_delete.append(choice_id)  # duplicate choice text
+            else:
+                current[text] = (choice_id, is_correct)
+
+        for text, is_correct in incoming[question_id]:
+            if text in current:
+                choice_id, old_correct = current.pop(text)
+                if old_correct != is_correct:
+                    to_update.append(Choice(id=choice_id, is_correct=is_correct))
+            else:
+                to_create.append((question_id, text, is_correct))
+        to_delete.extend(choice_id for choice_id, _ in current.values())
+
+    _insert_choices(to_create)
+    Choice.objects.bulk_update(to_update, ["is_correct"], batch_size=UPDATE_BATCH_SIZE)
+    for chunk in _chunks(to_delete):
+        Choice.objects.filter(id__in=chunk).delete()
+
+    report.add("choices_created", len(to_create))
+    report.add("choices_updated", len(to_update))
+    report.add("choices_deleted", len(to_delete))
+
+
+class QuizSync:
+    """
+    Incremental diff of one quiz against a stream of incoming questions.
+
+    ``load_existing`` reads the quiz's rows in scope once; ``add`` then
+    takes batches of ``(question dict, passage dict or None)`` and writes
+    them; ``finish`` deletes what the input never mentioned. Run all of it
+    inside one transaction (``import_quiz_file`` does).
+    """
+
+    def __init__(self, quiz, report, standalone=True, passages=False):
+        self.quiz = quiz
+        self.report = report
+        self.sync_passages = passages
+
+        self.scope = Question.objects.filter(quiz=quiz, dataset__isnull=True)
+        if not standalone:
+            self.scope = self.scope.filter(passage__isnull=False)
+        elif not passages:
+            self.scope = self.scope.filter(passage__isnull=True)
+
+        # Questions are keyed by (passage_id, text key): the same question
+        # text under two passages ("What is the main idea?") is two rows
+        self.existing = {}            # (passage_id, key) -> (id, content_hash, passage_id)
+        self.existing_by_text = {}    # key -> [(passage_id, key)], to follow a question to another passage
+        self.existing_passages = {}   # key -> (id, title)
+        self.passage_ids = {}         # key -> id, for passages seen in the input
+
+    def load_existing(self):
+        start = time.perf_counter()
+        for question_id, text, old_hash, passage_id in (
+            self.scope.order_by("id").values_list("id", "text", "content_hash", "passage_id").iterator()
+        ):
+            key = (passage_id, _key(text))
+            if key not in self.existing:
+                self.existing[key] = (question_id, old_hash, passage_id)
+                self.existing_by_text.setdefault(key[1], []).append(key)
+
+        if self.sync_passages:
+            for passage_id, text, title in Passage.objects.filter(quiz=self.quiz).values_list("id", "text", "title"):
+                self.existing_passages.setdefault(_key(text), (passage_id, title))
+        self.report.timings["diff"] += _ms(start)
+
+    def _add_passages(self, passages):
+        to_create, to_update, batch_keys = [], [], set()
+        for passage in passages:
+            key = _key(passage["text"])
+            if key in self.passage_ids or key in batch_keys:
+                continue
+            batch_keys.add(key)
+            title = passage.get("title", "")
+            if key in self.existing_passages:
+                passage_id, old_title = self.existing_passages.pop(key)
+                self.passage_ids[key] = passage_id
+                if old_title != title:
+                    to_update.append(Passage(id=passage_id, title=title))
+            else:
+                to_create.append((key, Passage(quiz=self.quiz, text=passage["text"], title=title)))
+
+        created = Passage.objects.bulk_create([p for _, p in to_create], batch_size=BATCH_SIZE)
+        for (key, _), passage in zip(to_create, created):
+            self.passage_ids[key] = passage.id
+        Passage.objects.bulk_update(to_update, ["title"], batch_size=UPDATE_BATCH_SIZE)
+
+        self.report.add("passages_created", len(to_create))
+        self.report.add("passages_updated", len(to_update))
+
+    def add(self, batch, passages=(), normalized=False):
+        """
+        Diff and write one batch of (raw question, passage or None) pairs.
+        ``passages`` are the passage dicts the batch's questions refer to.
+        With ``normalized`` the questions are already ``normalize_question``
+        output.
+        """
+        report = self.report
+        start = time.perf_counter()
+
+        if passages:
+            self._add_passages(passages)
+
+        to_create, to_update, changed_choices = [], [], {}
+        for raw, passage in batch:
+            question = raw if normalized else normalize_question(raw)
+            passage_id = self.passage_ids.get(_key(passage["text"])) if passage else None
+            row = self._claim(passage_id, _key(question["text"]))
+
+            if row is None:
+                to_create.append((question, Question(
+                    quiz=self.quiz,
+                    passage_id=passage_id,
+                    text=question["text"],
+                    explanation=question["explanation"],
+                    question_type=question["question_type"],
+                    content_hash=question["hash"],
+                )))
+                continue
+
+            question_id, old_hash, old_passage = row
+            if old_hash == question["hash"] and old_passage == passage_id:
+                report.add("questions_unchanged")
+                continue
+
+            to_update.append(Question(
+                id=question_id,
+                passage_id=passage_id,
+                text=question["text"],
+                explanation=question["explanation"],
+                question_type=question["question_type"],
+                content_hash=question["hash"],
+            ))
+            if old_hash != question["hash"]:
+                changed_choices[question_id] = question["choices"]
+        report.timings["diff"] += _ms(start)
+
+        start = time.perf_counter()
+        created = Question.objects.bulk_create([q for _, q in to_create], batch_size=BATCH_SIZE)
+        _insert_choices([
+            (row.id, text, is_correct)
+            for (question, _), row in zip(to_create, created)
+            for text, is_correct in question["choices"]
+        ])
+        report.add("questions_created", len(created))
+        report.add("choices_created", sum(len(q["choices"]) for q, _ in to_create))
+
+        Question.objects.bulk_update(
+            to_update,
+            ["passage", "text", "explanation", "question_type", "content_hash"],
+            batch_size=UPDATE_BATCH_SIZE,
+        )
+        report.add("questions_updated", len(to_update))
+        _sync_choices(list(changed_choices), changed_choices, report)
+        report.timings["write"] += _ms(start)
+
+    def _claim(self, passage_id, key):
+        """
+        The existing row for this passage and text; failing that, an
+        unclaimed row with the same text under another passage (the
+        question moved, or its passage was edited into a new one).
+        """
+        row = self.existing.pop((passage_id, key), None)
+        if row is not None:
+            return row
+        for other in self.existing_by_text.get(key, ()):
+            row = self.existing.pop(other, None)
+            if row is not None:
+                return row
+        return None
+
+    def _drop_duplicates(self):
+        """
+        A text repeated under the same passage (or outside passages) in the
+        input was matched (or created) by its first occurrence and created
+        again by the later ones. Rather than keep every text seen in memory,
+        remove the extra rows in one pass at the end: the lowest ID (the
+        first occurrence) wins.
+        """
+        duplicated = (
+            self.scope.values("passage", "text")
+            .annotate(rows=Count("id"), keep=Min("id"))
+            .filter(rows__gt=1)
+            .order_by()
+        )
+        extra = []
+        for group in duplicated:
+            extra.extend(
+                self.scope.filter(passage=group["passage"], text=group["text"])
+                .exclude(id=group["keep"])
+                .values_list("id", flat=True)
+            )
+        for chunk in _chunks(extra):
+            Question.objects.filter(id__in=chunk).delete()
+        self.report.add("duplicates", len(extra))
+        self.report.add("questions_created", -len(extra))
+
+    def finish(self):
+        """Delete the rows in scope that the input did not contain."""
+        start = time.perf_counter()
+        if self.report.counts["questions_created"]:
+            self._drop_duplicates()
+
+        stale_questions = [row[0] for row in self.existing.values()]
+        for chunk in _chunks(stale_questions):
+            Question.objects.filter(id__in=chunk).delete()
+        self.report.add("questions_deleted", len(stale_questions))
+
+        stale_passages = [passage_id for passage_id, _ in self.existing_passages.values()]
+        for chunk in _chunks(stale_passages):
+            Passage.objects.filter(id__in=chunk).delete()
+        self.report.add("passages_deleted", len(stale_passages))
+        self.existing, self.existing_by_text, self.existing_passages = {}, {}, {}
+
+        if self.report.changed:
+            # bulk_create / bulk_update send no model signals
+            transaction.on_commit(invalidate_sampling_index)
+            transaction.on_commit(invalidate_answer_keys)
+            transaction.on_commit(invalidate_catalog)
+        self.report.timings["write"] += _ms(start)
+
+
+def _batches(items, size, report):
+    """Group an iterable into lists of ``size``; time spent pulling items counts as parse time."""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        batch = list(itertools.islice(iterator, size))
+        report.timings["parse"] += _ms(start)
+        if not batch:
+            return
+        yield batch
+
+
+def import_quiz_file(quiz, standalone=None, passages=None, name=None, parse_ms=0.0,
+                     batch_size=BATCH_SIZE, normalized=False):
+    """
+    Sync a quiz with the content of one file, in one transaction.
+
+    ``standalone``: question dicts attached directly to the quiz.
+    ``passages``: ``{"text", "title", "questions": [...]}`` dicts.
+    Either may be a list or a lazy iterator (see ``iter_file_items``); rows
+    are diffed and written ``batch_size`` questions at a time, so a
+    streamed file is never held in memory as a whole.
+
+    With ``normalized`` the standalone questions come from
+    ``parse_quiz_file`` and are not validated again.
+
+    Only the segment(s) given are synced; e.g. importing standalone
+    questions never touches the quiz's passage questions. Returns an
+    ImportReport.
+    """
+    report = ImportReport(name or quiz.title)
+    report.timings["parse"] = parse_ms
+    sync = QuizSync(quiz, report, standalone=standalone is not None, passages=passages is not None)
+
+    with transaction.atomic():
+        sync.load_existing()
+
+        if standalone is not None:
+            for batch in _batches(standalone, batch_size, report):
+                sync.add([(raw, None) for raw in batch], normalized=normalized)
+
+        if passages is not None:
+            # Passages carry their questions; keep roughly batch_size questions per write
+            for batch in _batches(passages, max(1, batch_size // 10), report):
+                sync.add(
+                    [(raw, passage) for passage in batch for raw in passage["questions"]],
+                    passages=batch,
+                )
+
+        sync.finish()
+    return report
@@ -0,0 +1,222 @@
+"""
+Percentiles and leaderboards from bucketed score histograms.
+
+Every user has one ``BestScore`` per scope: ``"q:<quiz_id>"`` for a quiz
+and ``"t:<quiz_type>"`` for a quiz type (the same scope strings the exam
+tokens use). ``ScoreBucket`` counts those best scores in fixed 1-point
+buckets (0..100), so per scope there are at most 101 small rows:
+
+* percentile / rank of a score = sum over the buckets, O(buckets), no
+  scan of QuizResult;
+* the leaderboard total is the histogram sum, and its pages are read from
+  the (scope, -score) index of BestScore.
+
+``record_result_scores`` is called by ``user_stats.record_result`` inside
+the submission transaction. A best score only moves when it improves;
+the move is a compare-and-swap on the previous value, so two concurrent
+submissions cannot both move the same user out of the same bucket.
+
+``rebuild_leaderboards`` recomputes both tables by streaming QuizResult
+rows ordered by user, keeping only one user's best scores in memory.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import BestScore, ScoreBucket, QuizResult
+
+
+BUCKETS = 101  # 0, 1, ..., 100
+
+
+def bucket_for(score):
+    return min(BUCKETS - 1, max(0, int(score)))
+
+
+def quiz_scope(quiz_id):
+    return f"q:{quiz_id}"
+
+
+def type_scope(quiz_type):
+    return f"t:{quiz_type}"
+
+
+def result_scopes(quiz_id, quiz_type):
+    scopes = []
+    if quiz_id:
+        scopes.append(quiz_scope(quiz_id))
+    if quiz_type:
+        scopes.append(type_scope(quiz_type))
+    return scopes
+
+
+# ----------------------------------------------------------------------
+# Incremental updates
+# ----------------------------------------------------------------------
+def _bump(scope, bucket, delta):
+    row = ScoreBucket.objects.filter(scope=scope, bucket=bucket)
+    if not row.update(count=F('count') + delta):
+        # INSERT OR IGNORE: a concurrent first insert is not an error
+        ScoreBucket.objects.bulk_create([ScoreBucket(scope=scope, bucket=bucket)], ignore_conflicts=True)
+        row.update(count=F('count') + delta)
+
+
+_UNREAD = object()
+
+
+def _improve(user_id, scope, score, achieved_at, best=_UNREAD):
+    """Raise the user's best score in ``scope`` and move it between buckets."""
+    while True:
+        if best is _UNREAD:
+            best = BestScore.objects.filter(user_id=user_id, scope=scope).first()
+
+        if best is None:
+            try:
+                with transaction.atomic():
+                    BestScore.objects.create(
+                        user_id=user_id, scope=scope, score=score, achieved_at=achieved_at
+                    )
+            except IntegrityError:
+                best = _UNREAD  # a concurrent submission created it first
+                continue
+            _bump(scope, bucket_for(score), 1)
+            return
+
+        if score <= best.score:
+            return
+
+        # Compare-and-swap: only succeeds if nobody moved the score since we read it
+        swapped = BestScore.objects.filter(pk=best.pk, score=best.score).update(
+            score=score, achieved_at=achieved_at
+        )
+        if not swapped:
+            best = _UNREAD
+            continue
+
+        old_bucket, new_bucket = bucket_for(best.score), bucket_for(score)
+        if old_bucket != new_bucket:
+            _bump(scope, old_bucket, -1)
+            _bump(scope, new_bucket, 1)
+        return
+
+
+def record_result_scores(result, quiz_type):
+    """Fold a saved QuizResult into the quiz and quiz-type histograms."""
+    if not result.user_id:
+        return
+    scopes = result_scopes(result.quiz_id, quiz_type)
+    current = {
+        best.scope: best
+        for best in BestScore.objects.filter(user_id=result.user_id, scope__in=scopes)
+    }
+    for scope in scopes:
+        _improve(result.user_id, scope, float(result.score), result.submitted_at, current.get(scope))
+
+
+# ----------------------------------------------------------------------
+# Reads
+# ----------------------------------------------------------------------
+def histogram(scope):
+    """Bucket counts for a scope as a list of length BUCKETS."""
+    counts = [0] * BUCKETS
+    for bucket, count in ScoreBucket.objects.filter(scope=scope).values_list('bucket', 'count'):
+        counts[bucket] = count
+    return counts
+
+
+def rank_in(counts, score):
+    """
+    Position of ``score`` in a histogram: total entries, 1-based rank
+    (entries in higher buckets + 1) and percentile (share of entries below,
+    counting half of the score's own bucket).
+    """
+    total = sum(counts)
+    if not total:
+        return {"total": 0, "rank": 1, "percentile": None}
+
+    bucket = bucket_for(score)
+    below = sum(counts[:bucket])
+    above = sum(counts[bucket + 1:])
+    percentile = (below + counts[bucket] / 2) / total * 100
+    return {"total": total, "rank": above + 1, "percentile": round(percentile, 2)}
+
+
+class LeaderboardEntries:
+    """
+    Sliceable view of a scope's BestScore rows, highest first, whose
+    ``count()`` comes from the histogram instead of a COUNT(*) scan.
+    Meant to be handed to a DRF paginator.
+    """
+
+    def __init__(self, scope, total=None):
+        self.scope = scope
+        self.total = sum(histogram(scope)) if total is None else total
+        self.queryset = (
+            BestScore.objects.filter(scope=scope)
+            .select_related('user')
+            .order_by('-score', 'achieved_at', 'id')
+        )
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, item):
+        return self.queryset[item]
+
+
+# ----------------------------------------------------------------------
+# Bulk rebuild
+# ----------------------------------------------------------------------
+def rebuild_leaderboards(batch_size=2000):
+    """
+    Recompute BestScore and ScoreBucket from QuizResult history, streaming
+    the rows in user order. Returns (best score rows, scopes).
+    """
+    rows = (
+        QuizResult.objects.filter(user__isnull=False)
+        .order_by('user_id', 'submitted_at', 'id')
+        .values_list('user_id', 'quiz_id', 'quiz_type', 'quiz__quiz_type', 'score', 'submitted_at')
+        .iterator(chunk_size=batch_size)
+    )
+
+    buckets = {}
+    pending = []
+    written = 0
+
+    def flush_user(user_id, bests):
+        for scope, (score, achieved_at) in bests.items():
+            pending.append(BestScore(user_id=user_id, scope=scope, score=score, achieved_at=achieved_at))
+            counts = buckets.setdefault(scope, [0] * BUCKETS)
+            counts[bucket_for(score)] += 1
+
+    with transaction.atomic():
+        BestScore.objects.all().delete()
+        ScoreBucket.objects.all().delete()
+
+        current_user, bests = None, {}
+        for user_id, quiz_id, own_type, quiz_type, score, submitted_at in rows:
+            if user_id != current_user:
+                flush_user(current_user, bests)
+                current_user, bests = user_id, {}
+                if len(pending) >= batch_size:
+                    BestScore.objects.bulk_create(pending)
+                    written += len(pending)
+                    pending.clear()
+
+            for scope in result_scopes(quiz_id, own_type or quiz_type):
+                if scope not in bests or score > bests[scope][0]:
+                    bests[scope] = (score, submitted_at)
+
+        flush_user(current_user, bests)
+        BestScore.objects.bulk_create(pending, batch_size=batch_size)
+        written += len(pending)
+
+        ScoreBucket.objects.bulk_create([
+            ScoreBucket(scope=scope, bucket=bucket, count=count)
+            for scope, counts in buckets.items()
+            for bucket, count in enumerate(counts) if count
+        ], batch_size=batch_size)
+
+    return written, len(buckets)
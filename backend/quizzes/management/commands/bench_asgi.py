@@ -0,0 +1,265 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.benchmarks import summarize
+
+
+SERVERS = {
+    # name: (QUIZ_ASYNC_VIEWS, uvicorn --interface)
+    "wsgi": ("0", "wsgi"),
+    "asgi": ("1", "asgi3"),
+}
+
+ROUTES = ("GET detail", "POST submit", "GET random", "POST random submit")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client (one request at a time)."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAccept: application/json\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + data)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            payload = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                payload += chunk[:-2]
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+        return int(status_line.split()[1]), payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def answers_for(payload):
+    """First choice of every delivered question (the score does not matter here)."""
+    groups = [payload] + list(payload.get("passages") or []) + list(payload.get("datasets") or [])
+    if payload.get("passage"):
+        groups.append(payload["passage"])
+    return [
+        {"question": q["id"], "choice": q["choices"][0]["id"]}
+        for group in groups for q in group.get("questions") or [] if q.get("choices")
+    ]
+
+
+async def run_load(port, clients, duration, quiz_ids, quiz_types):
+    """``clients`` concurrent clients taking exams for ``duration`` seconds."""
+    latencies = {route: [] for route in ROUTES}
+    errors = [0]
+    deadline = time.perf_counter() + duration
+
+    async def timed(connection, route, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, payload = await connection.request(method, path, body)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            await connection.close()
+            errors[0] += 1
+            return None
+        latencies[route].append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            errors[0] += 1
+            return None
+        return json.loads(payload)
+
+    async def client():
+        connection = HTTPConnection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < deadline:
+                if random.random() < 0.5:
+                    quiz_id = random.choice(quiz_ids)
+                    exam = await timed(connection, "GET detail", "GET", f"/api/quizzes/{quiz_id}/")
+                    if exam:
+                        await timed(connection, "POST submit", "POST", f"/api/quizzes/{quiz_id}/submit/", {
+                            "answers": answers_for(exam), "exam_token": exam["exam_token"],
+                        })
+                else:
+                    quiz_type = random.choice(quiz_types)
+                    exam = await timed(connection, "GET random", "GET", f"/api/quizzes/random/?type={quiz_type}")
+                    if exam:
+                        await timed(connection, "POST random submit", "POST", "/api/quizzes/random/submit/", {
+                            "answers": answers_for(exam), "quiz_type": quiz_type, "exam_token": exam["exam_token"],
+                        })
+        finally:
+            await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors[0], time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    """
+    Requests/sec and tail latency of the exam endpoints (quiz detail and
+    submit, random exam and submit) under uvicorn: the WSGI application
+    (sync views, uvicorn's WSGI thread pool) against the ASGI one (async
+    views, see quizzes/async_views.py), with CLIENTS concurrent keep-alive
+    clients each taking exams back to back for DURATION seconds.
+
+    The servers run against a fresh SQLite copy of the bundled question
+    bank in a temporary directory. Requests are anonymous, so nothing is
+    written. SQLite answers in microseconds; --db-latency-ms adds the round
+    trip of a database server to every query (see quizzes/bench_apps.py),
+    which is where a worker thread sits idle under WSGI. Needs uvicorn
+    (requirements.txt).
+
+    Run:
+        python manage.py bench_asgi --clients 500 --duration 30 --db-latency-ms 2
+    """
+
+    help = "Benchmark the exam endpoints under uvicorn: WSGI vs ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500, help="Concurrent clients.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds of load per server.")
+        parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes.")
+        parser.add_argument("--servers", default="wsgi,asgi", help="Comma-separated: wsgi, asgi.")
+        parser.add_argument("--db-latency-ms", type=float, default=0,
+                            help="Delay added to every query (network round trip to a database server).")
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("bench_asgi needs uvicorn: pip install uvicorn")
+
+        servers = [s.strip() for s in options["servers"].split(",") if s.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.sqlite3')}",
+                DATABASE_REPLICA_URLS="",
+                SQL_PROFILER="0",
+            )
+            self.stdout.write("⏳ Building the benchmark database...")
+            for command in ("migrate", "seed_quizzes", "load_all_stand_alone_quizzes"):
+                self._manage(env, command)
+
+            self.stdout.write(self.style.NOTICE(
+                f"\n📊 {options['clients']} clients × {options['duration']:.0f} s, "
+                f"{options['workers']} uvicorn worker(s), {options['db_latency_ms']:g} ms per query"
+            ))
+            self.stdout.write(
+                f"  {'server':<7} {'route':<20} {'requests':>9} {'req/s':>8} {'p50':>10} {'p99':>10} {'errors':>7}"
+            )
+            totals = {}
+            for name in servers:
+                totals[name] = self._bench(name, env, options)
+
+        if "wsgi" in totals and "asgi" in totals and totals["wsgi"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ asgi: {totals['asgi'] / totals['wsgi']:.2f}× the requests per second of wsgi"
+            ))
+
+    def _manage(self, env, *args):
+        completed = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), *args, "-v", "0"],
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f"manage.py {' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+
+    def _bench(self, name, env, options):
+        async_views, interface = SERVERS[name]
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "quizzes.bench_apps:application", "--interface", interface,
+             "--port", str(port), "--workers", str(options["workers"]), "--log-level", "warning",
+             "--no-access-log", "--backlog", str(max(2048, options["clients"] * 2))],
+            cwd=settings.BASE_DIR,
+            env=dict(env, QUIZ_ASYNC_VIEWS=async_views, BENCH_DB_LATENCY_MS=str(options["db_latency_ms"])),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            quiz_ids, quiz_types = asyncio.run(self._wait_ready(server, port))
+            # Warm every worker's caches (sampling index, answer keys) before measuring
+            asyncio.run(run_load(port, 20, 2, quiz_ids, quiz_types))
+            latencies, errors, elapsed = asyncio.run(
+                run_load(port, options["clients"], options["duration"], quiz_ids, quiz_types)
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        everything = [ms for samples in latencies.values() for ms in samples]
+        for route, samples in [*latencies.items(), ("all", everything)]:
+            stats = summarize(samples)
+            self.stdout.write(
+                f"  {name:<7} {route:<20} {len(samples):>9} {len(samples) / elapsed:>8.1f} "
+                f"{stats['p50']:>7.1f} ms {stats['p99']:>7.1f} ms {errors if route == 'all' else '':>7}"
+            )
+        return len(everything) / elapsed
+
+    async def _wait_ready(self, server, port, timeout=30):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"uvicorn exited:\n{server.stderr.read()[-2000:]}")
+            connection = HTTPConnection("127.0.0.1", port)
+            try:
+                status, payload = await connection.request("GET", "/api/quizzes/summary/")
+                if status == 200:
+                    summary = json.loads(payload)
+                    break
+            except OSError:
+                await asyncio.sleep(0.2)
+            finally:
+                await connection.close()
+        else:
+            raise CommandError("uvicorn did not start in time")
+
+        quizzes = summary["quizzes"] if isinstance(summary, dict) else summary
+        quiz_ids = [q["id"] for q in quizzes if not q.get("is_random")]
+        quiz_types = sorted({q["quiz_type"] for q in quizzes})
+        return quiz_ids, quiz_types
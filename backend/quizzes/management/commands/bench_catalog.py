@@ -0,0 +1,59 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from quizzes.benchmarks import build_synthetic_bank, time_calls, summarize
+from quizzes.catalog import summary_payload
+from quizzes.models import Quiz
+from quizzes.snapshots import grouped_payload
+
+
+class Command(BaseCommand):
+    """
+    Compares the full ``grouped/`` catalog (every question, choice and
+    passage) with the ``summary/`` payload: queries, response size (plain
+    and gzipped) and render latency, at several bank sizes. Both are
+    rendered from scratch, as on a snapshot / cache miss.
+
+    Everything runs inside a transaction that is rolled back at the end.
+
+    Run:
+        python manage.py bench_catalog --sizes 1000,10000,100000
+    """
+
+    help = "Benchmark the catalog summary against the full grouped catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Comma-separated bank sizes (questions).")
+        parser.add_argument("--runs", type=int, default=20, help="Renders per payload.")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+
+        for size in sizes:
+            self.stdout.write(self.style.NOTICE(f"\n📊 Bank size: {size:,} questions"))
+            with transaction.atomic():
+                Quiz.objects.all().delete()
+                build_synthetic_bank(size)
+                self._run(options["runs"])
+                transaction.set_rollback(True)
+
+    def _run(self, runs):
+        renderer = JSONRenderer()
+        rows = [
+            ("grouped/ (full trees)", lambda: renderer.render(grouped_payload())),
+            ("summary/ (counts)", lambda: renderer.render(summary_payload())),
+        ]
+        for label, render in rows:
+            with CaptureQueriesContext(connection) as queries:
+                body = render()
+            stats = summarize(time_calls(render, runs))
+            self.stdout.write(
+                f"  {label:<24} {len(queries):>3} queries  {len(body):>12,} B "
+                f"({len(gzip.compress(body)):>10,} B gzip)  "
+                f"p50={stats['p50']:>9.2f} ms  p99={stats['p99']:>9.2f} ms"
+            )
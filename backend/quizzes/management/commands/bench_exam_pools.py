@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from quizzes.benchmarks import build_synthetic_bank, time_calls, summarize
+from quizzes.exam_pools import refill_pools
+from quizzes.models import Quiz
+from quizzes.sampling import invalidate_sampling_index
+from quizzes.views import QuizDetailAPIView, RandomizedByTypeAPIView
+
+
+class Command(BaseCommand):
+    """
+    Compares live exams (sample, load, serialize on every request) with
+    pre-generated exam pools for ``random/?type=VER`` and a quiz detail:
+    queries and latency per request (rendered JSON included), plus the
+    time to refill every pool, at several bank sizes.
+
+    Everything runs inside a transaction that is rolled back at the end
+    (the pools are built in this process; the refiller thread stays off).
+
+    Run:
+        python manage.py bench_exam_pools --sizes 1000,100000 --pool-size 8
+    """
+
+    help = "Benchmark pre-generated exam pools against live sampling and serialization."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,100000",
+                            help="Comma-separated bank sizes (questions).")
+        parser.add_argument("--runs", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--pool-size", type=int, default=8, help="Variants per pool.")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+
+        with override_settings(QUIZ_EXAM_POOL_REFILL_INTERVAL=0):
+            for size in sizes:
+                self.stdout.write(self.style.NOTICE(f"\n📊 Bank size: {size:,} questions"))
+                with transaction.atomic():
+                    Quiz.objects.all().delete()
+                    build_synthetic_bank(size)
+                    invalidate_sampling_index()
+                    self._run(options["runs"], options["pool_size"])
+                    transaction.set_rollback(True)
+                invalidate_sampling_index()
+                cache.clear()
+
+    def _run(self, runs, pool_size):
+        factory = RequestFactory(HTTP_HOST="localhost")
+        quiz = Quiz.objects.filter(quiz_type="VER").first()
+        detail_view = QuizDetailAPIView.as_view()
+        random_view = RandomizedByTypeAPIView.as_view()
+
+        def random_exam():
+            return random_view(factory.get("/api/quizzes/random/", {"type": "VER"})).render()
+
+        def detail_exam():
+            return detail_view(factory.get(f"/api/quizzes/{quiz.id}/"), pk=quiz.id).render()
+
+        with override_settings(QUIZ_EXAM_POOL_SIZE=pool_size):
+            refill = time_calls(lambda: refill_pools(force=True), 1)
+        self.stdout.write(f"  Refill of every pool ({pool_size} variants): {refill[0]:.1f} ms")
+
+        for mode, size in (("live", 0), ("pooled", pool_size)):
+            with override_settings(QUIZ_EXAM_POOL_SIZE=size):
+                for label, fn in (("random/", random_exam), ("detail", detail_exam)):
+                    with CaptureQueriesContext(connection) as queries:
+                        fn()
+                    stats = summarize(time_calls(fn, runs))
+                    self.stdout.write(
+                        f"  {label:<8} {mode:<7} {len(queries):>3} queries  "
+                        f"p50={stats['p50']:>8.3f} ms  p99={stats['p99']:>8.3f} ms"
+                    )
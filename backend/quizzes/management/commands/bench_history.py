@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from quizzes.benchmarks import build_synthetic_bank, build_synthetic_history, time_calls, summarize
+from quizzes.models import Quiz, QuizResult
+from quizzes.pagination import HistoryPagination
+from quizzes.views import UserResultsAPIView
+
+
+class LegacyUserResultsAPIView(UserResultsAPIView):
+    """results/my/ as it was: COUNT + OFFSET pages."""
+
+    pagination_class = PageNumberPagination
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('-submitted_at')
+
+
+class Command(BaseCommand):
+    """
+    Per-page latency of results/my/ at increasing page depths for a user
+    with a long history: page-number pagination (COUNT + OFFSET) against
+    keyset pagination on (submitted_at, id). Other users' results are
+    added so the composite index has something to skip.
+
+    Everything runs inside a transaction that is rolled back at the end.
+
+    Run:
+        python manage.py bench_history --results 100000
+    """
+
+    help = "Benchmark result history pagination (OFFSET vs keyset)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--results", type=int, default=100000, help="Results of the benchmarked user.")
+        parser.add_argument("--others", type=int, default=100000, help="Results spread over other users.")
+        parser.add_argument("--runs", type=int, default=50, help="Requests per page depth.")
+
+    def handle(self, *args, **options):
+        total = options["results"]
+        with transaction.atomic():
+            quizzes = build_synthetic_bank(1000)
+            user = User.objects.create_user(username="bench-history")
+            build_synthetic_history(user, total, quizzes)
+            for n in range(10):
+                other = User.objects.create_user(username=f"bench-history-{n}")
+                build_synthetic_history(other, options["others"] // 10, quizzes)
+
+            self.stdout.write(self.style.NOTICE(
+                f"\n📊 {total:,} results for one user, {QuizResult.objects.count():,} in total"
+            ))
+            self._run(user, total, options["runs"])
+            transaction.set_rollback(True)
+
+    def _run(self, user, total, runs):
+        factory = APIRequestFactory()
+        size = HistoryPagination.page_size
+        legacy_view = LegacyUserResultsAPIView.as_view()
+        keyset_view = UserResultsAPIView.as_view()
+
+        def request(view, path):
+            req = factory.get(path, HTTP_HOST="localhost")
+            force_authenticate(req, user=user)
+            return lambda: view(req).render()
+
+        pages = sorted({1, 10, 100, 1000, total // size // 2, max(1, total // size)})
+        ordered = QuizResult.objects.filter(user=user).order_by("-submitted_at", "-id")
+
+        self.stdout.write(f"  {'page':>7}  {'OFFSET p50':>12} {'p99':>10}  {'keyset p50':>12} {'p99':>10}")
+        for page in pages:
+            legacy = request(legacy_view, f"/api/quizzes/results/my/?page={page}")
+
+            # The cursor a client would hold after reading the previous page
+            path = "/api/quizzes/results/my/"
+            if page > 1:
+                previous_row = ordered[(page - 1) * size - 1]
+                paginator = HistoryPagination()
+                paginator.base_url = "http://localhost" + path
+                path = paginator.encode_cursor(previous_row, reverse=False)
+            keyset = request(keyset_view, path)
+
+            old, new = summarize(time_calls(legacy, runs)), summarize(time_calls(keyset, runs))
+            self.stdout.write(
+                f"  {page:>7}  {old['p50']:>9.2f} ms {old['p99']:>7.2f} ms  "
+                f"{new['p50']:>9.2f} ms {new['p99']:>7.2f} ms"
+            )
@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quizzes.benchmarks import write_synthetic_json_files
+from quizzes.importer import import_quiz_file, load_json_file
+from quizzes.models import Quiz, Question, Choice
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the bulk import engine on a generated JSON bank: first
+    import, unchanged re-import and a re-import with 1% of the questions
+    edited. The legacy per-row get_or_create loader is timed on a sample
+    and extrapolated, since running it on the full bank takes minutes.
+
+    Everything runs inside a transaction that is rolled back at the end.
+
+    Run:
+        python manage.py bench_import --questions 100000
+    """
+
+    help = "Benchmark the quiz JSON import engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=100000)
+        parser.add_argument("--files", type=int, default=20)
+        parser.add_argument("--legacy-sample", type=int, default=2000,
+                            help="Questions imported with the old get_or_create loop.")
+
+    def handle(self, *args, **options):
+        total = options["questions"]
+        with tempfile.TemporaryDirectory() as directory:
+            files = write_synthetic_json_files(directory, total, options["files"])
+            self.stdout.write(self.style.NOTICE(
+                f"\n📦 Generated {total:,} questions in {len(files)} files"
+            ))
+
+            with transaction.atomic():
+                quizzes = {
+                    title: Quiz.objects.create(title=title, quiz_type="GEN")
+                    for _, title in files
+                }
+                self._legacy(files[0], quizzes, options["legacy_sample"], total)
+
+                self._pass("first import", files, quizzes)
+                self._pass("re-import, unchanged", files, quizzes)
+                self._edit(files)
+                self._pass("re-import, 1% edited", files, quizzes)
+                transaction.set_rollback(True)
+
+    def _legacy(self, first_file, quizzes, sample, total):
+        path, title = first_file
+        data, _ = load_json_file(path)
+        quiz = quizzes[title]
+        data = data[:sample]
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            for q in data:
+                question, _ = Question.objects.get_or_create(
+                    quiz=quiz, text=q["text"],
+                    defaults={"explanation": q.get("explanation", ""), "question_type": "MCQ"},
+                )
+                for choice in q.get("choices", []):
+                    Choice.objects.get_or_create(
+                        question=question, text=choice["text"],
+                        defaults={"is_correct": choice.get("is_correct", False)},
+                    )
+            transaction.set_rollback(True)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        per_question = elapsed / max(1, len(data))
+        self.stdout.write(
+            f"  {'legacy get_or_create':<24} {len(data):>7,} questions in {elapsed:>9.1f} ms "
+            f"-> ~{per_question * total / 1000:,.1f} s projected for {total:,}"
+        )
+
+    def _pass(self, label, files, quizzes):
+        start = time.perf_counter()
+        reports = []
+        for path, title in files:
+            data, parse_ms = load_json_file(path)
+            reports.append(import_quiz_file(quizzes[title], standalone=data, parse_ms=parse_ms))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        counts = {k: sum(r.counts[k] for r in reports) for k in reports[0].counts}
+        phases = {k: sum(r.timings[k] for r in reports) for k in reports[0].timings}
+        slowest = max(reports, key=lambda r: r.total_ms)
+        self.stdout.write(
+            f"  {label:<24} {elapsed:>9.1f} ms total "
+            f"(parse {phases['parse']:.0f} / diff {phases['diff']:.0f} / write {phases['write']:.0f} ms) "
+            f"+{counts['questions_created']:,} ~{counts['questions_updated']:,} "
+            f"-{counts['questions_deleted']:,} ={counts['questions_unchanged']:,} "
+            f"| slowest file {slowest.total_ms:.1f} ms"
+        )
+
+    def _edit(self, files):
+        # Change the explanation of every 100th question and flip its answer
+        for path, _ in files:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for q in data[::100]:
+                q["explanation"] += " (revised)"
+                q["choices"][0]["is_correct"], q["choices"][1]["is_correct"] = (
+                    q["choices"][1]["is_correct"], q["choices"][0]["is_correct"]
+                )
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
@@ -0,0 +1,102 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quizzes.benchmarks import build_synthetic_bank, time_calls, summarize
+from quizzes.models import Quiz, Passage, Question
+from quizzes.sampling import (
+    get_sampling_index,
+    invalidate_sampling_index,
+    fetch_questions,
+    fetch_passages,
+)
+
+
+class Command(BaseCommand):
+    """
+    Compares ORDER BY RANDOM() / load-and-shuffle sampling against the
+    in-memory sampling index at several bank sizes.
+
+    Everything runs inside a transaction that is rolled back at the end.
+
+    Run:
+        python manage.py bench_sampling --sizes 1000,100000,1000000
+    """
+
+    help = "Benchmark question sampling (ORDER BY RANDOM vs sampling index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,100000,1000000",
+                            help="Comma-separated bank sizes (questions).")
+        parser.add_argument("--runs", type=int, default=100, help="Requests per scenario.")
+        parser.add_argument("--choices", type=int, default=4, help="Choices per question.")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+
+        for size in sizes:
+            self.stdout.write(self.style.NOTICE(f"\n📊 Bank size: {size:,} questions"))
+            with transaction.atomic():
+                Quiz.objects.all().delete()
+                build_synthetic_bank(size, choices_per_question=options["choices"])
+                invalidate_sampling_index()
+                self._run(options["runs"])
+                transaction.set_rollback(True)
+            invalidate_sampling_index()
+
+    def _run(self, runs):
+        ver_quizzes = list(Quiz.objects.filter(quiz_type="VER"))
+        gen_quiz = Quiz.objects.filter(quiz_type="GEN").first()
+
+        def materialize(questions):
+            # What serialization needs: the quiz and every choice of each row
+            for q in questions:
+                q.quiz, list(q.choices.all())
+            return questions
+
+        # --- legacy implementations (as the views used to do it) ---
+        def legacy_random():
+            passage = Passage.objects.filter(quiz__in=ver_quizzes).order_by("?").first()
+            picked = list(passage.questions.all()[:5]) if passage else []
+            if passage:
+                materialize(list(passage.questions.all()))
+            for quiz in ver_quizzes:
+                picked.extend(
+                    Question.objects.filter(quiz=quiz, passage__isnull=True).order_by("?")[:8]
+                )
+            return materialize(picked)
+
+        def legacy_detail():
+            questions = list(gen_quiz.questions.filter(passage__isnull=True, dataset__isnull=True))
+            random.shuffle(questions)
+            return materialize(questions[:20])
+
+        # --- sampling index ---
+        def index_random():
+            index = get_sampling_index()
+            passage_id = index.pick_one(index.type_passages.get("VER"))
+            ids = list(index.passage_questions.get(passage_id, ())[:5])
+            for quiz_id in index.type_quizzes["VER"]:
+                ids.extend(index.sample_quiz_questions(quiz_id, 8, exclude="passage"))
+            for passage in fetch_passages([passage_id] if passage_id else []):
+                materialize(passage.questions.all())
+            return materialize(fetch_questions(ids))
+
+        def index_detail():
+            return materialize(fetch_questions(get_sampling_index().sample_standalone(gen_quiz.id, 20)))
+
+        build = time_calls(lambda: (invalidate_sampling_index(), get_sampling_index()), 1)
+        self.stdout.write(f"  Index build: {build[0]:.1f} ms")
+
+        rows = [
+            ("random/ legacy ORDER BY RANDOM()", legacy_random),
+            ("random/ sampling index", index_random),
+            ("detail  legacy load + shuffle", legacy_detail),
+            ("detail  sampling index", index_detail),
+        ]
+        for label, fn in rows:
+            stats = summarize(time_calls(fn, runs))
+            self.stdout.write(
+                f"  {label:<36} p50={stats['p50']:>9.3f} ms  p99={stats['p99']:>9.3f} ms"
+            )
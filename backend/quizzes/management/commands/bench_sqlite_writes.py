@@ -0,0 +1,224 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from quizzes.benchmarks import build_synthetic_bank, summarize
+from quizzes.leaderboards import record_result_scores
+from quizzes.models import QuizResult, UserTypeStats
+from backend.transactions import is_lock_error, stats as retry_stats
+from quizzes.user_stats import apply_result, record_result, result_quiz_type
+from users.models import Profile
+
+
+MODES = {
+    # mode: (DB_SQLITE_TUNED, description)
+    "legacy": ("0", "rollback journal, deferred transactions, no retry"),
+    "tuned": ("1", "WAL + pragmas, immediate transactions with retry"),
+}
+
+# Between two reads of a reader thread: a tight loop would mostly measure
+# the GIL taken away from the writers
+READ_PAUSE = 0.005
+
+
+def legacy_record_result(**fields):
+    """record_result as it was: a deferred transaction, no retry."""
+    with transaction.atomic():
+        result = QuizResult.objects.create(**fields)
+        apply_result(result)
+        record_result_scores(result, result_quiz_type(result))
+    return result
+
+
+def legacy_activate_premium(profile):
+    profile.is_premium = True
+    profile.save()
+
+
+class Command(BaseCommand):
+    """
+    Multi-threaded write stress test of the SQLite setup: WRITERS threads
+    submit results as fast as they can (every tenth one also activates a
+    premium) while READERS threads read history and statistics. Reports
+    submissions per second, "database is locked" failures and read / write
+    latencies, before (legacy) and after (tuned) the WAL / immediate
+    transaction / retry changes.
+
+    Each mode runs in its own process against a fresh SQLite file in a
+    temporary directory (the configured database is not touched).
+
+    Run:
+        python manage.py bench_sqlite_writes --writers 16 --submissions 50 --readers 4
+    """
+
+    help = "Stress concurrent SQLite writes (legacy vs WAL + immediate transactions + retry)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=16, help="Submitting threads.")
+        parser.add_argument("--submissions", type=int, default=50, help="Submissions per writer.")
+        parser.add_argument("--readers", type=int, default=4, help="Threads reading while the writers run.")
+        parser.add_argument("--modes", default="legacy,tuned", help="Comma-separated: legacy, tuned.")
+        parser.add_argument("--worker", choices=sorted(MODES), help="Run one mode in this process (used by the comparison).")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            self.stdout.write(json.dumps(self._work(options)))
+            return
+
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(self.style.NOTICE(
+            f"\n📊 {options['writers']} writers × {options['submissions']} submissions, "
+            f"{options['readers']} readers"
+        ))
+        self.stdout.write(
+            f"  {'mode':<8} {'subs/s':>8} {'locked':>7} {'retries':>8}  "
+            f"{'write p50':>10} {'p99':>9}  {'read p50':>9} {'p99':>9}  journal"
+        )
+        reports = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in modes:
+                reports[mode] = report = self._spawn(mode, directory, options)
+                self.stdout.write(
+                    f"  {mode:<8} {report['per_second']:>8.1f} {report['locked']:>7} {report['retries']:>8}  "
+                    f"{report['write']['p50']:>7.2f} ms {report['write']['p99']:>6.2f} ms  "
+                    f"{report['read']['p50']:>6.2f} ms {report['read']['p99']:>6.2f} ms  {report['journal_mode']}"
+                )
+
+        if "legacy" in reports and "tuned" in reports and reports["legacy"]["per_second"]:
+            speedup = reports["tuned"]["per_second"] / reports["legacy"]["per_second"]
+            self.stdout.write(self.style.SUCCESS(f"\n✅ tuned: {speedup:.1f}× the submissions per second"))
+
+    def _spawn(self, mode, directory, options):
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(directory, mode + '.sqlite3')}",
+            DATABASE_REPLICA_URLS="",
+            DB_SQLITE_TUNED=MODES[mode][0],
+            QUIZ_RESULT_WRITE_MODE="sync",
+        )
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "bench_sqlite_writes",
+            "--worker", mode,
+            "--writers", str(options["writers"]),
+            "--submissions", str(options["submissions"]),
+            "--readers", str(options["readers"]),
+        ]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"{mode} run failed:\n{completed.stderr[-2000:]}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # ------------------------------------------------------------------
+    # Worker process: one mode against a fresh database
+    # ------------------------------------------------------------------
+    def _work(self, options):
+        mode = options["worker"]
+        call_command("migrate", verbosity=0)
+        quizzes = build_synthetic_bank(200)
+        users = User.objects.bulk_create([
+            User(username=f"bench-writer-{n}") for n in range(options["writers"])
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        connection.close()
+
+        if mode == "legacy":
+            write_result, activate = legacy_record_result, legacy_activate_premium
+        else:
+            write_result, activate = record_result, Profile.activate_premium
+
+        lock = threading.Lock()
+        writes, reads, locked = [], [], [0]
+        writing = threading.Event()
+        writing.set()
+        start_line = threading.Barrier(options["writers"] + options["readers"] + 1)
+
+        def count_lock(error):
+            if not is_lock_error(error):
+                raise error
+            with lock:
+                locked[0] += 1
+
+        def writer(user):
+            profile = Profile.objects.get(user=user)
+            samples = []
+            start_line.wait()
+            try:
+                for n in range(options["submissions"]):
+                    quiz = quizzes[(user.id + n) % len(quizzes)]
+                    started = time.perf_counter()
+                    try:
+                        write_result(
+                            quiz=quiz, user=user, quiz_type=quiz.quiz_type,
+                            score=(n * 7) % 101, correct=n % 20, total=20, time_spent=60,
+                        )
+                        if n % 10 == 0:
+                            activate(profile)
+                    except OperationalError as e:
+                        count_lock(e)
+                    samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                writes.extend(samples)
+
+        def reader(number):
+            user = users[number % len(users)]
+            samples = []
+            start_line.wait()
+            try:
+                while writing.is_set():
+                    started = time.perf_counter()
+                    try:
+                        list(QuizResult.objects.filter(user=user).order_by("-submitted_at", "-id")[:10])
+                        list(UserTypeStats.objects.filter(user=user))
+                    except OperationalError as e:
+                        count_lock(e)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    time.sleep(READ_PAUSE)
+            finally:
+                connection.close()
+            with lock:
+                reads.extend(samples)
+
+        writers = [threading.Thread(target=writer, args=(user,)) for user in users]
+        readers = [threading.Thread(target=reader, args=(n,)) for n in range(options["readers"])]
+        for thread in writers + readers:
+            thread.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        saved = QuizResult.objects.count()
+        return {
+            "mode": mode,
+            "journal_mode": journal_mode,
+            "submissions": saved,
+            "seconds": round(elapsed, 3),
+            "per_second": round(saved / elapsed, 1) if elapsed else 0.0,
+            "locked": locked[0],
+            "retries": retry_stats["retries"],
+            "write": summarize(writes),
+            "read": summarize(reads),
+        }
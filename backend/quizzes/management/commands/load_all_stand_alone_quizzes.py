@@ -96,9 +96,13 @@
 
 
 import os
-import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
 from django.core.management.base import BaseCommand
-from quizzes.models import Quiz, Question, Choice
+from quizzes.models import Quiz
+from quizzes.importer import import_quiz_file, parse_quiz_file, read_items, BATCH_SIZE
 
 BASE_DIR = os.path.join("quizzes", "json_quizzes")
 
@@ -111,18 +115,52 @@ SKIP_FILES = {
 class Command(BaseCommand):
     help = "Loads all quiz JSON files inside json_quizzes/. Missing JSON files are simply skipped."
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=BASE_DIR, help="Folder to walk (default: json_quizzes/).")
+        parser.add_argument("--stream", action="store_true",
+                            help="Parse array items one at a time instead of loading whole files.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help="Questions written per batch.")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Parse files in N worker processes; this process stays the only writer. "
+                                 "Each worker hands back a whole file's questions, so --stream "
+                                 "does not bound memory here. Afterwards the files are parsed "
+                                 "once more in this process to report the speedup.")
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING("\n📥 Loading all quiz JSON files...\n"))
 
-        if not os.path.isdir(BASE_DIR):
-            self.stdout.write(self.style.ERROR(f"json_quizzes folder not found: {BASE_DIR}"))
+        base_dir = options["dir"]
+        if not os.path.isdir(base_dir):
+            self.stdout.write(self.style.ERROR(f"json_quizzes folder not found: {base_dir}"))
             return
 
-        json_files_found = set()
-
-        for root, dirs, files in os.walk(BASE_DIR):
-            for file in files:
-                if not file.endswith(".json"):
+        started = time.perf_counter()
+        jobs = list(self.find_files(base_dir))
+
+        parallel = options["workers"] > 1 and len(jobs) > 1
+        if parallel:
+            reports = self.import_parallel(jobs, options)
+        else:
+            reports = self.import_serial(jobs, options)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f"\n🎉 Finished loading {len(reports)} quiz JSON files "
+            f"({sum(r.questions for r in reports)} questions) in {elapsed:.1f} ms!\n"
+        ))
+        self.write_timings(reports, elapsed)
+        if parallel and reports:
+            self.write_speedup(jobs, reports, options, elapsed)
+
+    def find_files(self, base_dir):
+        """Yield (filepath, file, quiz) for every loadable file, in walk order."""
+        quizzes = {quiz.title.lower(): quiz for quiz in Quiz.objects.all()}
+
+        for root, dirs, files in sorted(os.walk(base_dir)):
+            for file in sorted(files):
+                # .jsonl / .ndjson files are JSON Lines (always streamed)
+                if not file.endswith((".json", ".jsonl", ".ndjson")):
                     continue
 
                 # 👉 Skip special JSONs
@@ -133,58 +171,113 @@ class Command(BaseCommand):
                     continue
 
                 filepath = os.path.join(root, file)
-                json_files_found.add(file)
 
                 quiz_title = (
-                    file.replace(".json", "")
+                    os.path.splitext(file)[0]
                         .replace("_", " ")
                         .title()
                 )
 
-                self.stdout.write(self.style.NOTICE(f"\n📘 Processing quiz: {quiz_title}"))
-                self.stdout.write(f"  Path: {filepath}")
-
-                quiz = Quiz.objects.filter(title__iexact=quiz_title).first()
+                quiz = quizzes.get(quiz_title.lower())
 
                 if not quiz:
                     self.stdout.write(self.style.WARNING(
-                        f"  ⚠️ Quiz '{quiz_title}' is NOT defined in seed_quizzes.py (skipped)"
+                        f"\n⚠️ Quiz '{quiz_title}' is NOT defined in seed_quizzes.py (skipped)"
                     ))
                     continue
 
-                try:
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"  ❌ Failed to load JSON: {e}"))
+                yield filepath, file, quiz
+
+    def import_serial(self, jobs, options):
+        reports = []
+        for filepath, file, quiz in jobs:
+            self.stdout.write(self.style.NOTICE(f"\n📘 Processing quiz: {quiz.title}"))
+            self.stdout.write(f"  Path: {filepath}")
+
+            try:
+                report = import_quiz_file(
+                    quiz,
+                    standalone=read_items(filepath, stream=options["stream"]),
+                    name=file,
+                    batch_size=options["batch_size"],
+                )
+            except (ValueError, KeyError) as e:
+                # Bad JSON rolls back the whole file, even mid-stream
+                self.stdout.write(self.style.ERROR(f"  ❌ Failed to load JSON: {e}"))
+                continue
+
+            reports.append(report)
+            self.stdout.write(self.style.SUCCESS(f"  ✓ {report.summary()}"))
+        return reports
+
+    def import_parallel(self, jobs, options):
+        """
+        Parse and validate files in a process pool; write them here, one
+        file at a time, as they come back. SQLite allows a single writer,
+        so only the parsing is spread over the cores.
+        """
+        workers = min(options["workers"], len(jobs))
+        self.stdout.write(self.style.NOTICE(f"\n⚙️ Parsing {len(jobs)} files with {workers} workers"))
+
+        reports = []
+        # Workers import quizzes.importer, which needs the app registry
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {
+                pool.submit(parse_quiz_file, filepath, options["stream"]): (filepath, file, quiz)
+                for filepath, file, quiz in jobs
+            }
+            for future in as_completed(futures):
+                filepath, file, quiz = futures[future]
+                questions, parse_ms, error = future.result()
+
+                self.stdout.write(self.style.NOTICE(f"\n📘 Processing quiz: {quiz.title}"))
+                self.stdout.write(f"  Path: {filepath}")
+                if error:
+                    self.stdout.write(self.style.ERROR(f"  ❌ Failed to load JSON: {error}"))
                     continue
 
-                question_count = 0
-                new_count = 0
-
-                for q in data:
-                    question_count += 1
-                    question, created = Question.objects.get_or_create(
-                        quiz=quiz,
-                        text=q["text"],
-                        defaults={
-                            "explanation": q.get("explanation", ""),
-                            "question_type": q.get("question_type", "MCQ"),
-                        }
-                    )
-
-                    if created:
-                        new_count += 1
-
-                    for choice in q.get("choices", []):
-                        Choice.objects.get_or_create(
-                            question=question,
-                            text=choice["text"],
-                            defaults={"is_correct": choice.get("is_correct", False)},
-                        )
-
-                self.stdout.write(self.style.SUCCESS(
-                    f"  ✓ Loaded {question_count} questions ({new_count} new)"
-                ))
-
-        self.stdout.write(self.style.SUCCESS("\n🎉 Finished loading all quiz JSON files!\n"))
+                report = import_quiz_file(
+                    quiz,
+                    standalone=questions,
+                    name=file,
+                    parse_ms=parse_ms,
+                    batch_size=options["batch_size"],
+                    normalized=True,
+                )
+                reports.append(report)
+                self.stdout.write(self.style.SUCCESS(f"  ✓ {report.summary()}"))
+        return reports
+
+    def write_timings(self, reports, elapsed):
+        if not reports:
+            return
+
+        self.stdout.write(f"  {'file':<40} {'parse ms':>10} {'insert ms':>10}")
+        for report in sorted(reports, key=lambda r: r.name):
+            insert_ms = report.timings["diff"] + report.timings["write"]
+            self.stdout.write(f"  {report.name:<40} {report.timings['parse']:>10.1f} {insert_ms:>10.1f}")
+
+        work = sum(r.total_ms for r in reports)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n⏱️ {work:.1f} ms of parse + insert work, {elapsed:.1f} ms wall-clock"
+        ))
+
+    def write_speedup(self, jobs, reports, options, elapsed):
+        """
+        Parallel wall-clock time against a serial run: the files are parsed
+        again here, one after another and timed, plus the inserts, which
+        ran in this process either way.
+        """
+        imported = {report.name for report in reports}
+        start = time.perf_counter()
+        for filepath, file, quiz in jobs:
+            if file in imported:
+                parse_quiz_file(filepath, options["stream"])
+        serial_parse = (time.perf_counter() - start) * 1000
+        inserts = sum(r.timings["diff"] + r.timings["write"] for r in reports)
+
+        serial = serial_parse + inserts
+        self.stdout.write(self.style.SUCCESS(
+            f"⏱️ Serial: {serial_parse:.1f} ms parse + {inserts:.1f} ms insert = {serial:.1f} ms; "
+            f"parallel: {elapsed:.1f} ms wall-clock ({serial / elapsed:.2f}x speedup)"
+        ))
@@ -53,58 +53,45 @@
 #         self.stdout.write(self.style.SUCCESS("✅ Reading Comprehension updated from JSON!"))
 
 
-import json
 import os
 from django.core.management.base import BaseCommand
-from quizzes.models import Quiz, Question, Choice, Passage
+from quizzes.models import Quiz
+from quizzes.importer import import_quiz_file, read_items, BATCH_SIZE
 
 class Command(BaseCommand):
     help = "Load Reading Comprehension passages and questions from json_quizzes folder"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=os.path.join("quizzes/json_quizzes/verbal_ability",
+                                                           "reading_comprehension.json"),
+                            help="Passages file (.json array or .jsonl, one passage per line).")
+        parser.add_argument("--stream", action="store_true",
+                            help="Parse passages one at a time instead of loading the whole file.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help="Questions written per batch.")
+
+    def handle(self, *args, **options):
         quiz = Quiz.objects.filter(title="Reading Comprehension").first()
         if not quiz:
             self.stdout.write(self.style.ERROR("❌ Quiz 'Reading Comprehension' not found!"))
             return
 
-        base_path = "quizzes/json_quizzes/verbal_ability"
-        file_path = os.path.join(base_path, "reading_comprehension.json")
+        file_path = options["file"]
 
         if not os.path.exists(file_path):
             self.stdout.write(self.style.WARNING("⚠ No reading_comprehension.json found. Skipping..."))
             return
 
-        # 🔥 Clean old data FIRST
-        Passage.objects.filter(quiz=quiz).delete()
-        Question.objects.filter(quiz=quiz).delete()
-
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        for index, item in enumerate(data, start=1):
-
-            passage_obj = Passage.objects.create(
-                quiz=quiz,
-                text=item["passage"],
-                title=f"Passage {index}"
-            )
-
-            for q in item["questions"]:
-
-                question = Question.objects.create(
-                    quiz=quiz,
-                    text=q["text"],
-                    explanation=q.get("explanation", ""),
-                    question_type="MCQ",   # 🔥 FIXED
-                    passage=passage_obj,
-                )
+        items = read_items(file_path, stream=options["stream"])
 
-                for choice in q.get("choices", []):
-                    if choice["text"].strip():      # 🔥 avoid empty choices
-                        Choice.objects.create(
-                            question=question,
-                            text=choice["text"].strip(),
-                            is_correct=choice["is_correct"]
-                        )
+        # Passages and questions are matched by text, so re-running keeps
+        # their IDs and only writes what changed in the file
+        passages = (
+            {"text": item["passage"], "title": f"Passage {index}", "questions": item["questions"]}
+            for index, item in enumerate(items, start=1)
+        )
+        report = import_quiz_file(
+            quiz, passages=passages, name=os.path.basename(file_path), batch_size=options["batch_size"]
+        )
 
-        self.stdout.write(self.style.SUCCESS("✅ Reading Comprehension loaded cleanly!"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Reading Comprehension synced: {report.summary()}"))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the best-score histograms behind the rank and leaderboard
+    endpoints from QuizResult history. Rows are streamed in user order, so
+    memory stays flat however large the history is.
+
+    Run:
+        python manage.py rebuild_leaderboards
+        python manage.py rebuild_leaderboards --batch-size 5000
+    """
+
+    help = "Rebuild BestScore / ScoreBucket from QuizResult history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("🏆 Rebuilding leaderboards..."))
+
+        start = time.perf_counter()
+        rows, scopes = rebuild_leaderboards(batch_size=options["batch_size"])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ {rows} best scores across {scopes} leaderboards in {elapsed:.1f} ms"
+        ))
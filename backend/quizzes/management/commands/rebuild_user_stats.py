@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.user_stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the per-user, per-type UserTypeStats table from QuizResult
+    history. The submission views keep it current on their own; run this
+    after importing or deleting results outside the API.
+
+    Run:
+        python manage.py rebuild_user_stats
+        python manage.py rebuild_user_stats --user 3 --user 7
+    """
+
+    help = "Rebuild UserTypeStats from QuizResult history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only rebuild these user IDs (repeatable).")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("📊 Rebuilding user statistics..."))
+
+        start = time.perf_counter()
+        rows = rebuild_user_stats(options["user_ids"])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(self.style.SUCCESS(f"  ✓ {rows} stats rows written in {elapsed:.1f} ms"))
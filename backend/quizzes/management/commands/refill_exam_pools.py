@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.exam_pools import refill_pools, pool_size, pool_stats
+
+
+class Command(BaseCommand):
+    """
+    Builds the pre-generated exam pools (per quiz and per quiz type) that
+    are missing, stale or past their max age, e.g. right after a deploy or
+    an import. With --every, keeps doing so: a refiller for deployments
+    that turn the per-process thread off (QUIZ_EXAM_POOL_REFILL_INTERVAL=0).
+
+    Run:
+        python manage.py refill_exam_pools
+        python manage.py refill_exam_pools --force
+        python manage.py refill_exam_pools --every 30
+    """
+
+    help = "Build the pre-generated exam pools served by the detail and random endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild every pool, fresh or not.")
+        parser.add_argument("--every", type=float, default=0,
+                            help="Keep refilling every this many seconds.")
+
+    def handle(self, *args, **options):
+        if not pool_size():
+            self.stdout.write(self.style.WARNING("⚠️ Exam pools are off (QUIZ_EXAM_POOL_SIZE=0)."))
+            return
+
+        self.stdout.write(self.style.WARNING(f"🧺 Refilling exam pools ({pool_size()} variants each)..."))
+        force = options["force"]
+        while True:
+            start = time.perf_counter()
+            rebuilt = refill_pools(force=force)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(self.style.SUCCESS(f"  ✓ {rebuilt} pools rebuilt in {elapsed:.1f} ms"))
+
+            if not options["every"]:
+                break
+            force = False
+            time.sleep(options["every"])
+
+        stats = pool_stats()
+        self.stdout.write(
+            f"  Pools built by this run: {len(stats['quiz']['pools'])} quizzes, "
+            f"{len(stats['type']['pools'])} quiz types"
+        )
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quizzes.result_buffer import replay_journals
+from quizzes.user_stats import save_results
+
+
+class Command(BaseCommand):
+    """
+    Writes QuizResults left in the write-behind journal by a crashed
+    process (QUIZ_RESULT_WRITE_MODE = "journal"), and files a failed replay
+    left claimed. Workers also do this on a background thread when their
+    buffer starts; run it by hand before bringing them back after an
+    outage, or after a replay error in the logs. Entries already in the
+    database are skipped.
+
+    Run:
+        python manage.py replay_result_journal
+        python manage.py replay_result_journal --all   # workers stopped
+    """
+
+    help = "Replay QuizResults from the write-behind journal."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Also replay journals of processes that still look alive.")
+
+    def handle(self, *args, **options):
+        journal_dir = settings.QUIZ_RESULT_JOURNAL_DIR
+        self.stdout.write(self.style.WARNING(f"📼 Replaying journals in {journal_dir}..."))
+
+        files, entries = replay_journals(journal_dir, save_results, include_live=options["all"])
+
+        self.stdout.write(self.style.SUCCESS(f"  ✓ {entries} entries from {files} files"))
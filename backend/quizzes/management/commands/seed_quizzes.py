@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from quizzes.models import Quiz
+from quizzes.importer import sync_quizzes
 
 class Command(BaseCommand):
     """
@@ -63,24 +63,23 @@ class Command(BaseCommand):
         """
         self.stdout.write(self.style.WARNING("Starting CSE Quiz Seeding..."))
 
+        rows = [
+            (title, quiz_type_code, description)
+            for quiz_type_code, type_data in self.QUIZ_STRUCTURE.items()
+            for quizzes in type_data.values()
+            for title, description in quizzes
+        ]
+        # One read + one bulk insert for the missing quizzes
+        created, existing = sync_quizzes(rows)
+        created, existing = set(created), set(existing)
+
         for quiz_type_code, type_data in self.QUIZ_STRUCTURE.items():
             for type_name, quizzes in type_data.items():
 
                 self.stdout.write(self.style.NOTICE(f"\nSeeding Quiz Type: {type_name} ({quiz_type_code})"))
 
                 for title, description in quizzes:
-
-                    quiz, created = Quiz.objects.get_or_create(
-                        title=title,
-                        quiz_type=quiz_type_code,
-                        defaults={
-                            "description": description,
-                            "time_limit": 20,
-                            "is_random": False,
-                        }
-                    )
-
-                    if created:
+                    if title in created:
                         self.stdout.write(self.style.SUCCESS(f"  ✓ Created: {title}"))
                     else:
                         self.stdout.write(self.style.WARNING(f"  • Already exists: {title}"))
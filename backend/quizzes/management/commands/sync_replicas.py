@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_sqlite(source_path, target_path):
+    """Consistent online copy of one SQLite file over another (backup API)."""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        with target:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    """
+    Copies the SQLite primary over every SQLite replica in
+    DATABASE_REPLICA_URLS: local stand-ins for read replicas, so the
+    routing in backend/routers.py can be exercised without a real
+    replicated server. Run it again to "replicate" (the time between runs
+    is the replication lag). Real replicas are left alone.
+
+    Run:
+        DATABASE_REPLICA_URLS=sqlite:///replica1.sqlite3,sqlite:///replica2.sqlite3 \
+            python manage.py sync_replicas
+    """
+
+    help = "Copy the SQLite primary to the SQLite stand-in replicas."
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("sync_replicas only copies a SQLite primary.")
+
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if not replicas:
+            self.stdout.write(self.style.WARNING("⚠ No replicas configured (DATABASE_REPLICA_URLS). Nothing to do."))
+            return
+
+        for alias in replicas:
+            config = settings.DATABASES[alias]
+            if config["ENGINE"] != "django.db.backends.sqlite3":
+                self.stdout.write(f"  • {alias}: not SQLite, skipped")
+                continue
+
+            connections[alias].close()  # don't copy under an open handle of our own
+            start = time.perf_counter()
+            copy_sqlite(str(primary["NAME"]), str(config["NAME"]))
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(self.style.SUCCESS(f"  ✓ {alias} ← default ({config['NAME']}) in {elapsed:.1f} ms"))
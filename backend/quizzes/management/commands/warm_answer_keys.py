@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.answer_keys import warm_answer_keys, get_quiz_answer_key, cache_stats
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    """
+    Pre-builds the grading answer keys (one per quiz) in the Django cache so the first submissions after a deploy or import do not
+    pay for the misses.
+
+    Run:
+        python manage.py warm_answer_keys
+        python manage.py warm_answer_keys --quiz 3 --quiz 7
+    """
+
+    help = "Warm the answer-key cache used by the grading views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiz", type=int, action="append", dest="quiz_ids",
+                            help="Only warm these quiz IDs (repeatable).")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("🔑 Warming answer keys..."))
+
+        start = time.perf_counter()
+        quizzes, questions = warm_answer_keys(options["quiz_ids"])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        # Read the keys back so the counters confirm the backend kept them
+        quiz_ids = options["quiz_ids"] or Quiz.objects.values_list("id", flat=True)
+        for quiz_id in quiz_ids:
+            get_quiz_answer_key(quiz_id)
+
+        stats = cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ {quizzes} quizzes / {questions} questions warmed in {elapsed:.1f} ms"
+        ))
+        self.stdout.write(
+            f"  Cache counters (this process): hits={stats['hits']} "
+            f"misses={stats['misses']} hit_ratio={stats['hit_ratio']}"
+        )
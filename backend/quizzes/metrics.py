@@ -0,0 +1,148 @@
+"""
+Per-stage latency of the quiz views, exported in Prometheus text format.
+
+The quiz detail / random quiz endpoints and both submission endpoints run
+in distinct stages (sample, resolve, grade, persist, serialize...). Each
+view creates a ``StageTimer`` and calls ``lap(stage)`` when a stage ends;
+the time since the previous lap goes into the ``quiz_view_stage_seconds``
+histogram, labelled by view and stage. A lap is a ``perf_counter()`` call
+and a bucket increment under a lock.
+
+``render_metrics()`` is served at ``/metrics``. Histograms are per process:
+with several workers, Prometheus scrapes each one (or sums them).
+
+``debug_sampled(logger)`` guards the views' debug logging: it is false,
+after a single level check, unless the logger is at DEBUG, and then true
+for ``QUIZ_DEBUG_LOG_SAMPLE_RATE`` of the calls. Build the log fields
+inside the ``if`` so a disabled log costs nothing.
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+
+# Seconds; +Inf is implied
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """A Prometheus histogram with a fixed label set, safe across threads."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        """{labels: (cumulative bucket counts, sum, count)}."""
+        with self._lock:
+            return {
+                labels: (list(_cumulative(counts)), total, count)
+                for labels, (counts, total, count) in self._series.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for labels, (cumulative, total, count) in sorted(self.samples().items()):
+            for bound, seen in zip(bounds, cumulative):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', bound)])} {seen}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _cumulative(counts):
+    running = 0
+    for n in counts:
+        running += n
+        yield running
+
+
+STAGE_SECONDS = Histogram(
+    "quiz_view_stage_seconds",
+    "Time spent in each stage of the quiz views.",
+    labelnames=("view", "stage"),
+)
+
+# Anything with a render() returning exposition text; apps append their own
+REGISTRY = [STAGE_SECONDS]
+
+
+def render_metrics():
+    """Every registered metric in Prometheus text exposition format (0.0.4)."""
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+class StageTimer:
+    """
+    Lap timer for one request::
+
+        stages = StageTimer("quiz_submit")
+        ...parse...
+        stages.lap("parse")
+        ...grade...
+        stages.lap("grade")
+    """
+
+    __slots__ = ("view", "enabled", "last")
+
+    def __init__(self, view):
+        self.view = view
+        self.enabled = getattr(settings, "QUIZ_METRICS_ENABLED", True)
+        self.last = time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or the start) as ``stage``."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - self.last, self.view, stage)
+        self.last = now
+
+
+def debug_sampled(logger):
+    """True for a sample of the calls when ``logger`` is at DEBUG level."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    rate = getattr(settings, "QUIZ_DEBUG_LOG_SAMPLE_RATE", 1.0)
+    return rate >= 1 or random.random() < rate
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTypeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quiz_type', models.CharField(choices=[('NUM', 'Numerical Ability'), ('VER', 'Verbal Ability'), ('ANA', 'Analytical Ability'), ('CLE', 'Clerical Ability'), ('GEN', 'General Information')], max_length=3)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('best_score', models.FloatField(default=0)),
+                ('total_time_spent', models.PositiveIntegerField(default=0, help_text='Seconds')),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'quiz_type'), name='unique_user_type_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_score_histograms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizresult',
+            name='entry_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery
+
+
+def backfill_quiz_type(apps, schema_editor):
+    # random/results/ filters on QuizResult.quiz_type (indexed) instead of
+    # joining Quiz; older rows of regular quizzes left it empty
+    QuizResult = apps.get_model('quizzes', 'QuizResult')
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    QuizResult.objects.filter(
+        Q(quiz_type__isnull=True) | Q(quiz_type=''), quiz__isnull=False
+    ).update(quiz_type=Subquery(Quiz.objects.filter(pk=OuterRef('quiz_id')).values('quiz_type')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_question_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(fields=['user', 'submitted_at', 'id'], name='result_user_history'),
+        ),
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(fields=['user', 'quiz_type', 'submitted_at', 'id'], name='result_user_type_history'),
+        ),
+        migrations.RunPython(backfill_quiz_type, migrations.RunPython.noop),
+    ]
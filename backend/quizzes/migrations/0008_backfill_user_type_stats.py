@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def backfill_user_type_stats(apps, schema_editor):
+    """
+    Totals for the results saved before 0002. Recomputes every row, so rows
+    written since then come out the same (see quizzes/user_stats.py).
+    """
+    QuizResult = apps.get_model('quizzes', 'QuizResult')
+    UserTypeStats = apps.get_model('quizzes', 'UserTypeStats')
+
+    totals = (
+        QuizResult.objects.filter(user__isnull=False)
+        .annotate(effective_type=Coalesce(NullIf('quiz_type', Value('')), 'quiz__quiz_type'))
+        .filter(effective_type__isnull=False)
+        .values('user_id', 'effective_type')
+        .annotate(
+            attempts=Count('id'),
+            score_sum=Sum('score'),
+            best_score=Max('score'),
+            total_time_spent=Sum('time_spent'),
+            last_attempt_at=Max('submitted_at'),
+        )
+        .order_by()
+    )
+    rows = [
+        UserTypeStats(
+            user_id=t['user_id'],
+            quiz_type=t['effective_type'],
+            attempts=t['attempts'],
+            score_sum=t['score_sum'] or 0,
+            best_score=t['best_score'] or 0,
+            total_time_spent=max(0, t['total_time_spent'] or 0),
+            last_attempt_at=t['last_attempt_at'],
+        )
+        for t in totals.iterator()
+    ]
+    UserTypeStats.objects.all().delete()
+    UserTypeStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_seen_questions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_type_stats, migrations.RunPython.noop),
+    ]
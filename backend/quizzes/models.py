@@ -100,6 +100,9 @@ class Question(models.Model):
         choices=QUESTION_TYPES,
         default='MCQ'
     )
+    # SHA-1 of the imported content (text, explanation, type, choices),
+    # used by quizzes/importer.py to skip unchanged rows on re-import
+    content_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
 
     class Meta:
         ordering = ['id']
@@ -142,7 +145,17 @@ class QuizResult(models.Model):
     total = models.IntegerField(default=0)
     submitted_at = models.DateTimeField(auto_now_add=True)
     time_spent = models.IntegerField(default=0, help_text="Time spent in seconds")
+    # Set for results written through the write-behind journal so a replay
+    # after a crash never inserts the same submission twice
+    entry_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
+    class Meta:
+        indexes = [
+            # History pages are keyset reads on (submitted_at, id) per user
+            # (see quizzes/pagination.py); SQLite walks these backwards for DESC
+            models.Index(fields=['user', 'submitted_at', 'id'], name='result_user_history'),
+            models.Index(fields=['user', 'quiz_type', 'submitted_at', 'id'], name='result_user_type_history'),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else "Anonymous"
@@ -159,3 +172,101 @@ class QuizResult(models.Model):
 
         # Fallback
         return f"{username} - Random Quiz ({self.score}%)"
+
+
+class UserTypeStats(models.Model):
+    """
+    Running totals of a user's results per quiz type, kept up to date by
+    ``quizzes.user_stats.record_result`` so the dashboard summary is a
+    single indexed read instead of a scan over QuizResult.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='type_stats'
+    )
+    quiz_type = models.CharField(max_length=3, choices=Quiz.QUIZ_TYPES)
+    attempts = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    best_score = models.FloatField(default=0)
+    total_time_spent = models.PositiveIntegerField(default=0, help_text="Seconds")
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz_type'], name='unique_user_type_stats'),
+        ]
+
+    @property
+    def average_score(self):
+        return round(self.score_sum / self.attempts, 2) if self.attempts else 0
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz_type} ({self.attempts} attempts)"
+
+
+class SeenQuestions(models.Model):
+    """
+    The questions a user has submitted answers to, per quiz type, as a
+    compact bitmap of question IDs (``quizzes/bitmaps.py``). Random exams
+    prefer the questions outside it; see ``quizzes/seen_questions.py``.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='seen_questions'
+    )
+    quiz_type = models.CharField(max_length=3, choices=Quiz.QUIZ_TYPES)
+    bitmap = models.BinaryField(default=b'')
+    count = models.PositiveIntegerField(default=0)
+    resets = models.PositiveIntegerField(default=0, help_text="Times the set started over at full coverage")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz_type'], name='unique_user_seen_questions'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz_type} ({self.count} seen)"
+
+
+class BestScore(models.Model):
+    """
+    A user's best score in a leaderboard scope: ``q:<quiz_id>`` or
+    ``t:<quiz_type>`` (see ``quizzes.leaderboards``).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='best_scores'
+    )
+    scope = models.CharField(max_length=20)
+    score = models.FloatField(default=0)
+    achieved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope'], name='unique_user_best_score'),
+        ]
+        indexes = [
+            models.Index(fields=['scope', '-score', 'achieved_at'], name='best_score_ranking'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.scope} ({self.score}%)"
+
+
+class ScoreBucket(models.Model):
+    """Number of users whose best score in ``scope`` falls in a 1-point bucket."""
+    scope = models.CharField(max_length=20)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'bucket'], name='unique_score_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} [{self.bucket}] = {self.count}"
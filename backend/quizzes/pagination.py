@@ -0,0 +1,145 @@
+"""
+Keyset pagination for result history.
+
+``PageNumberPagination`` runs a ``COUNT(*)`` and an ``OFFSET`` scan per
+page, so page 500 of a long history reads (and throws away) 5000 rows
+first. ``HistoryPagination`` instead remembers the ``(submitted_at, id)``
+of the last row shown and asks for the rows strictly after it::
+
+    WHERE user_id = %s
+      AND submitted_at <= %s
+      AND (submitted_at < %s OR id < %s)
+    ORDER BY submitted_at DESC, id DESC
+    LIMIT page_size + 1
+
+With the ``(user, submitted_at, id)`` index every page is one index range
+read, whatever its depth. (The redundant ``submitted_at <= %s`` is what
+lets SQLite seek into the index; with only the OR it scans from the
+newest row down to the cursor.) ``id`` breaks ties between results submitted
+in the same instant, so no row is skipped or repeated.
+
+Responses look like DRF's ``CursorPagination``: ``next`` / ``previous``
+links carrying an opaque ``?cursor=`` and ``results``, no total count.
+"""
+import base64
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class HistoryPagination(BasePagination):
+    """Newest first, keyed on (submitted_at, id)."""
+
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+
+        if position is None:
+            rows = list(queryset.order_by("-submitted_at", "-id")[:size + 1])
+        elif not reverse:
+            submitted_at, pk = position
+            rows = list(
+                queryset.filter(submitted_at__lte=submitted_at)
+                .filter(Q(submitted_at__lt=submitted_at) | Q(id__lt=pk))
+                .order_by("-submitted_at", "-id")[:size + 1]
+            )
+        else:
+            # Walking back towards newer rows: read ascending, then flip
+            submitted_at, pk = position
+            rows = list(
+                queryset.filter(submitted_at__gte=submitted_at)
+                .filter(Q(submitted_at__gt=submitted_at) | Q(id__gt=pk))
+                .order_by("submitted_at", "id")[:size + 1]
+            )
+
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        # Forward pages have newer rows behind them if we came from a cursor;
+        # reverse pages always have the page we came from ahead of them
+        self.has_next = bool(rows) and (more if not reverse else True)
+        self.has_previous = bool(rows) and (position is not None if not reverse else more)
+        self.first, self.last = (rows[0], rows[-1]) if rows else (None, None)
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------------------------------------------------
+    # Cursors
+    # ------------------------------------------------------------------
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            query = parse.parse_qs(base64.b64decode(encoded.encode("ascii")).decode("ascii"), strict_parsing=True)
+            submitted_at = parse_datetime(query["p"][0])
+            pk = int(query["i"][0])
+            reverse = bool(int(query.get("r", ["0"])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if submitted_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, (submitted_at, pk)
+
+    def encode_cursor(self, row, reverse):
+        query = {"p": row.submitted_at.isoformat(), "i": row.id}
+        if reverse:
+            query["r"] = 1
+        encoded = base64.b64encode(parse.urlencode(query, doseq=True).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Responses
+    # ------------------------------------------------------------------
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
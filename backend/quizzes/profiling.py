@@ -0,0 +1,231 @@
+"""
+SQL profiler middleware.
+
+Off by default; ``SQL_PROFILER_ENABLED = True`` (or ``SQL_PROFILER=1`` in
+the environment) turns it on. For every request it records, on every
+database connection:
+
+* the number of queries and the total time spent in SQL;
+* duplicate fingerprints: the same statement (``IN (...)`` lists
+  collapsed) run more than once, which is how an N+1 loop shows up;
+* ``EXPLAIN QUERY PLAN`` (``EXPLAIN`` on other backends) of every SELECT
+  slower than ``SQL_PROFILER_SLOW_MS``;
+* the route's query budget from ``query_budgets.json`` (the file the
+  API regression tests use, see ``quizzes/testing.py``).
+
+Each request is written as one JSON line to the ``quizzes.profiling``
+logger, which settings route to a rotating file. A request over its
+budget logs a warning; with ``SQL_PROFILER_BUDGET_MODE = "raise"`` (the
+test suite) it raises ``QueryBudgetExceeded`` instead.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than its route allows."""
+
+
+# ----------------------------------------------------------------------
+# Budgets
+# ----------------------------------------------------------------------
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def budget_file():
+    return getattr(settings, "QUERY_BUDGETS_FILE", os.path.join(settings.BASE_DIR, "query_budgets.json"))
+
+
+def load_budgets(path=None):
+    """``{"METHOD /route/": {"queries": n, "bytes": n}}``, read once per file."""
+    path = path or budget_file()
+    with _budgets_lock:
+        if path not in _budgets:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _budgets[path] = json.load(f)
+            except FileNotFoundError:
+                _budgets[path] = {}
+        return _budgets[path]
+
+
+_CONVERTER = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def normalize_route(route):
+    """``api/quizzes/<int:pk>/`` -> ``api/quizzes/<pk>/``."""
+    return _CONVERTER.sub(r"<\1>", route)
+
+
+def route_keys(request):
+    """
+    Budget keys for a request, most specific first: the route suffixed with
+    its URLconf (``"GET / [results.urls]"``, the form the tests use for apps
+    mounted on their own), then the plain ``"GET /api/quizzes/<pk>/"``.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return []
+    key = f"{request.method} /{normalize_route(match.route)}"
+    urlconf = getattr(request, "urlconf", None) or settings.ROOT_URLCONF
+    return [f"{key} [{urlconf}]", key]
+
+
+def route_budget(request):
+    budgets = load_budgets()
+    for key in route_keys(request):
+        if key in budgets:
+            return key, budgets[key]
+    return (route_keys(request) or [None])[-1], None
+
+
+# ----------------------------------------------------------------------
+# Recording
+# ----------------------------------------------------------------------
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def fingerprint(sql):
+    """The statement with its ``IN (%s, %s, ...)`` lists collapsed."""
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook that times every statement."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": self.alias,
+                "sql": sql,
+                "params": params,
+                "many": many,
+                "ms": (time.perf_counter() - start) * 1000,
+            })
+
+
+def explain(alias, sql, params):
+    """Query plan of a SELECT, read on the backend cursor so it is not itself recorded."""
+    connection = connections[alias]
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    try:
+        with connection.cursor() as cursor:
+            raw = cursor.cursor  # below Django's wrappers: no debug log, no execute_wrapper
+            raw.execute(prefix + sql, params)
+            return [" ".join(str(col) for col in row) for row in raw.fetchall()]
+    except Exception as e:  # a plan is diagnostics only; never fail the request for it
+        return [f"EXPLAIN failed: {e}"]
+
+
+def build_profile(request, response, queries, elapsed_ms):
+    slow_ms = getattr(settings, "SQL_PROFILER_SLOW_MS", 50)
+    route, budget = route_budget(request)
+
+    counts = {}
+    for query in queries:
+        key = fingerprint(query["sql"])
+        counts[key] = counts.get(key, 0) + 1
+    duplicates = [
+        {"sql": sql, "count": count}
+        for sql, count in sorted(counts.items(), key=lambda item: -item[1])
+        if count > 1
+    ]
+
+    slow = []
+    for query in queries:
+        if query["ms"] >= slow_ms:
+            entry = {"sql": query["sql"], "ms": round(query["ms"], 3)}
+            if not query["many"] and query["sql"].lstrip().upper().startswith("SELECT"):
+                entry["plan"] = explain(query["alias"], query["sql"], query["params"])
+            slow.append(entry)
+
+    return {
+        "method": request.method,
+        "path": request.path,
+        "route": route,
+        "status": getattr(response, "status_code", None),
+        "ms": round(elapsed_ms, 3),
+        "queries": len(queries),
+        "sql_ms": round(sum(q["ms"] for q in queries), 3),
+        "duplicates": duplicates,
+        "slow": slow,
+        "budget": budget["queries"] if budget else None,
+        "over_budget": bool(budget) and len(queries) > budget["queries"],
+    }
+
+
+class SQLProfilerMiddleware:
+    """Records the SQL of each request; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SQL_PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+        log_file = getattr(settings, "SQL_PROFILER_LOG_FILE", None)
+        if log_file:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    def __call__(self, request):
+        recorders = [QueryRecorder(alias) for alias in connections]
+        wrappers = [connections[r.alias].execute_wrapper(r) for r in recorders]
+
+        start = time.perf_counter()
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        queries = [q for r in recorders for q in r.queries]
+        profile = build_profile(request, response, queries, elapsed)
+
+        if profile["over_budget"]:
+            message = (
+                f"{profile['route']} ran {profile['queries']} queries (budget {profile['budget']})"
+            )
+            logger.warning(message, extra={"profile": profile})
+            if getattr(settings, "SQL_PROFILER_BUDGET_MODE", "warn") == "raise":
+                raise QueryBudgetExceeded(message)
+        else:
+            logger.info("%s %s", request.method, request.path, extra={"profile": profile})
+        return response
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, message, then the request
+    profile or the ``fields`` passed as ``extra`` (the views' debug logs).
+    """
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "profile", {}))
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, default=str)
@@ -0,0 +1,59 @@
+"""
+Query plans for the nested quiz serializers.
+
+Every queryset that feeds QuizSerializer / PassageSerializer /
+DataSetSerializer / QuestionSerializer should go through one of these
+helpers, so a whole quiz tree is loaded in a constant number of queries
+(one per level) no matter how many quizzes, passages or questions it holds.
+"""
+from django.db.models import Prefetch
+
+from .models import Passage, DataSet, Question
+
+
+def plan_question_queryset(queryset=None):
+    """Questions + their choices + whatever ``get_quiz_name`` walks."""
+    if queryset is None:
+        queryset = Question.objects.all()
+    return (
+        queryset
+        .select_related('quiz', 'passage__quiz', 'dataset__quiz')
+        .prefetch_related('choices')
+    )
+
+
+def plan_passage_queryset(queryset=None):
+    if queryset is None:
+        queryset = Passage.objects.all()
+    return queryset.prefetch_related(
+        Prefetch('questions', queryset=plan_question_queryset())
+    )
+
+
+def plan_dataset_queryset(queryset=None):
+    if queryset is None:
+        queryset = DataSet.objects.all()
+    return queryset.prefetch_related(
+        Prefetch('questions', queryset=plan_question_queryset())
+    )
+
+
+def plan_quiz_queryset(queryset):
+    """Full catalog tree: passages, datasets and questions, each with choices."""
+    return queryset.prefetch_related(
+        Prefetch('passages', queryset=plan_passage_queryset()),
+        Prefetch('datasets', queryset=plan_dataset_queryset()),
+        Prefetch('questions', queryset=plan_question_queryset()),
+    )
+
+
+def related(instance, name, plan):
+    """
+    ``instance.<name>.all()``: served from the prefetch cache when the view
+    planned it, otherwise loaded through ``plan`` so nested levels still
+    cost one query each instead of one per row.
+    """
+    manager = getattr(instance, name)
+    if name in getattr(instance, '_prefetched_objects_cache', {}):
+        return manager.all()
+    return plan(manager.all())
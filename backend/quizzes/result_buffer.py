@@ -0,0 +1,617 @@
+"""
+Write-behind buffer for QuizResult inserts.
+
+With ``QUIZ_RESULT_WRITE_MODE = "sync"`` (the default) submissions insert
+their result inside the request, as before. In the buffered modes
+``user_stats.record_result`` hands the result to this process-wide buffer
+instead and the response goes out without touching the database. A
+background thread drains the queue with one ``bulk_create`` transaction
+(stats and leaderboards included) when ``QUIZ_RESULT_FLUSH_BATCH`` results
+are waiting or ``QUIZ_RESULT_FLUSH_INTERVAL`` seconds have passed, so a
+spike of submissions takes the SQLite write lock once per batch instead of
+once per request.
+
+Durability:
+
+* ``buffered`` - queued results are lost if the process dies before the
+  next flush (a clean shutdown flushes through ``atexit``).
+* ``journal`` - every result is also appended and fsync'd to
+  ``QUIZ_RESULT_JOURNAL_DIR/results-<owner>.jsonl`` before the request
+  returns. A flush seals the current journal segment and deletes it once
+  the batch is committed. Segments left behind by a dead process are
+  replayed by a background thread when a worker's buffer starts (or with
+  ``manage.py replay_result_journal``), never inside a request; each
+  entry carries a UUID stored in ``QuizResult.entry_id`` so a replay never
+  inserts a submission twice.
+
+The owner in the file names is the PID plus a random suffix, unique per
+buffer, so a restarted process that gets a dead one's PID starts new
+files. An owner is alive while it holds an exclusive ``flock`` on its
+``results-<owner>.lock``; the OS drops the lock however the process dies.
+A replay claims each file by renaming it to ``<file>.replaying-<owner>``;
+claimed files whose replayer is gone (it failed or died) are claimed
+again by the next replay.
+
+A batch the writer rejects is written again in halves, down to single
+rows, so one row that can never be written (say, for a quiz deleted in
+the meantime) does not hold back the others. Rows that fail on their own
+are logged and appended to ``<journal dir>/dead-letter.jsonl``; rows left
+by a transient database error (locked, disconnected) stay queued.
+
+The queue never grows past ``QUIZ_RESULT_BUFFER_CAPACITY``: a request that
+finds it full flushes inline (back-pressure, at most once per
+``FAILURE_BACKOFF`` seconds while flushes fail) and, if it is still full,
+writes its own result synchronously as in ``sync`` mode.
+``stats()`` reports the queue depth and flush latencies.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .benchmarks import summarize
+
+try:
+    import fcntl
+except ImportError:  # Windows: owners are checked by PID only
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sync", "buffered", "journal")
+
+RESULT_FIELDS = ("quiz_id", "user_id", "quiz_type", "score", "correct", "total", "time_spent")
+
+
+def make_entry(fields):
+    """
+    Normalise ``QuizResult`` keyword arguments into a JSON-serialisable
+    entry (model instances become IDs, the submit time is captured now).
+    Fields left out keep their model defaults.
+    """
+    entry = {
+        "entry_id": uuid.uuid4().hex,
+        "submitted_at": timezone.now().isoformat(),
+    }
+    for name in RESULT_FIELDS:
+        relation = name[:-3] if name.endswith("_id") else None
+        if relation and relation in fields:
+            value = fields[relation]
+            entry[name] = value.pk if value is not None else None
+        elif name in fields:
+            entry[name] = fields[name]
+    if "time_spent" in entry:
+        try:
+            entry["time_spent"] = max(0, int(entry["time_spent"] or 0))
+        except (TypeError, ValueError):
+            entry["time_spent"] = 0
+    return entry
+
+
+def entry_time(entry):
+    return parse_datetime(entry["submitted_at"])
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# results-<owner>[-<segment>.sealed].jsonl[.replaying-<replayer>]; owners
+# without a suffix are the PID-only names of older releases
+JOURNAL_NAME = re.compile(
+    r"^results-(?P<owner>\d+(?:-[0-9a-f]{12})?)(?:-\d+\.sealed)?\.jsonl"
+    r"(?:\.replaying-(?P<replayer>\d+-[0-9a-f]{12}))?$"
+)
+LOCK_NAME = re.compile(r"^results-(?P<owner>\d+-[0-9a-f]{12})\.lock$")
+# A dead owner's lock file is only removed once it is this old (a new owner
+# creates the file a moment before it locks it)
+STALE_LOCK_SECONDS = 60
+
+DEAD_LETTER_NAME = "dead-letter.jsonl"
+# Errors of the database rather than of the rows: batches are not split on them
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+# Seconds a full queue waits after a failed flush before a request flushes inline again
+FAILURE_BACKOFF = 1.0
+
+
+def write_batch(writer, entries, **kwargs):
+    """
+    Write ``entries`` with ``writer``; when the batch fails, write its
+    halves separately, down to single rows. Returns (rejected, deferred):
+    rows that failed on their own, and rows a transient error left
+    unwritten. Raises the batch's error when no row could be written at
+    all, since then the database rather than the rows is the likely cause.
+    """
+    try:
+        writer(entries, **kwargs)
+        return [], []
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        if len(entries) == 1:
+            raise
+        batch_error = e
+
+    rejected, deferred, written = [], [], 0
+
+    def split(chunk):
+        nonlocal written
+        try:
+            writer(chunk, **kwargs)
+            written += len(chunk)
+        except TRANSIENT_ERRORS:
+            deferred.extend(chunk)
+        except Exception:
+            if len(chunk) > 1:
+                middle = len(chunk) // 2
+                split(chunk[:middle])
+                split(chunk[middle:])
+            else:
+                logger.exception("QuizResult entry %s cannot be written", chunk[0].get("entry_id"))
+                rejected.extend(chunk)
+
+    middle = len(entries) // 2
+    split(entries[:middle])
+    split(entries[middle:])
+    if not written:
+        raise batch_error
+    return rejected, deferred
+
+
+def dead_letter(entries, journal_dir=None):
+    """Log rows that cannot be written and keep them in the dead-letter file."""
+    if not entries:
+        return
+    logger.error("Dropping %d QuizResult entries that cannot be written", len(entries))
+    if not journal_dir:
+        for entry in entries:
+            logger.error("Dropped QuizResult entry: %s", json.dumps(entry))
+        return
+    os.makedirs(journal_dir, exist_ok=True)
+    with open(os.path.join(journal_dir, DEAD_LETTER_NAME), "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def new_owner():
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+
+def _lock_path(journal_dir, owner):
+    return os.path.join(journal_dir, f"results-{owner}.lock")
+
+
+def hold_owner_lock(journal_dir, owner):
+    """Lock ``owner``'s lock file; it stays locked until the returned file is closed."""
+    lock = open(_lock_path(journal_dir, owner), "a")
+    if fcntl:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return lock
+
+
+def release_owner_lock(journal_dir, owner, lock):
+    lock.close()
+    try:
+        os.remove(_lock_path(journal_dir, owner))
+    except FileNotFoundError:
+        pass
+
+
+def owner_alive(journal_dir, owner):
+    """Is the process (buffer or replay) that wrote ``owner``'s files still running?"""
+    pid, _, suffix = owner.partition("-")
+    if not suffix or fcntl is None:
+        return _pid_alive(int(pid))
+    try:
+        lock = open(_lock_path(journal_dir, owner), "r")
+    except FileNotFoundError:
+        return False  # closed cleanly, or its lock was cleaned up after it died
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        lock.close()  # also releases the lock if we got it
+    return False
+
+
+class ResultBuffer:
+    """Bounded in-process queue of result entries flushed by ``writer``."""
+
+    def __init__(self, writer, mode="buffered", capacity=5000, batch_size=200,
+                 interval=1.0, journal_dir=None, autostart=True):
+        if mode not in ("buffered", "journal"):
+            raise ValueError(f"ResultBuffer mode must be 'buffered' or 'journal', not {mode!r}")
+
+        self.writer = writer
+        self.mode = mode
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+        # Instrumentation
+        self._high_water = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._failures = 0
+        self._last_failure = None
+        self._dead_lettered = 0
+        self._inline_flushes = 0
+        self._sync_writes = 0
+        self._flush_ms = []
+        self._lag_ms = []
+
+        self.journal_dir = journal_dir
+        self.owner = None
+        self._owner_lock = None
+        self._journal = None
+        self._sealed = []
+        self._segment = 0
+        if mode == "journal":
+            os.makedirs(journal_dir, exist_ok=True)
+            self.owner = new_owner()
+            self._owner_lock = hold_owner_lock(journal_dir, self.owner)
+            self._journal_path = os.path.join(journal_dir, f"results-{self.owner}.jsonl")
+
+        if autostart:
+            self.start()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit(self, fields):
+        """Queue one result (``QuizResult`` kwargs). Returns the entry."""
+        entry = make_entry(fields)
+        line = json.dumps(entry) + "\n" if self.mode == "journal" else None
+
+        if self._depth() >= self.capacity:
+            # Queue full: this request pays for the flush. Still full (the
+            # writer keeps failing): write this result now, like sync mode
+            self._flush_inline()
+            if self._depth() >= self.capacity:
+                self._sync_writes += 1
+                self.writer([entry])
+                return entry
+
+        with self._lock:
+            if line:
+                self._append_journal(line)
+            self._pending.append(entry)
+            depth = len(self._pending)
+            self._high_water = max(self._high_water, depth)
+            if depth >= self.batch_size:
+                self._wakeup.notify()
+
+        if self._thread is None and depth >= self.batch_size:
+            # No background thread: the request that fills a batch flushes it
+            self._flush_inline()
+        return entry
+
+    def _depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _flush_inline(self):
+        last_failure = self._last_failure
+        if last_failure is not None and time.monotonic() - last_failure < FAILURE_BACKOFF:
+            return
+        self._inline_flushes += 1
+        self.flush()
+
+    def _append_journal(self, line):
+        if self._journal is None:
+            self._journal = open(self._journal_path, "a", encoding="utf-8")
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _seal_journal(self):
+        """Close the live segment so new entries go to a fresh file."""
+        if self._journal is None:
+            return
+        self._journal.close()
+        self._journal = None
+        self._segment += 1
+        sealed = f"{self._journal_path[:-len('.jsonl')]}-{self._segment}.sealed.jsonl"
+        os.replace(self._journal_path, sealed)
+        self._sealed.append(sealed)
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def flush(self):
+        """Write everything queued so far. Returns the number of results written."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+                if self.mode == "journal":
+                    self._seal_journal()
+                sealed = list(self._sealed)
+
+            if not entries:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                rejected, deferred = write_batch(self.writer, entries)
+            except Exception:
+                rejected, deferred = [], entries
+                logger.exception("QuizResult flush of %d entries failed", len(entries))
+
+            if rejected:
+                dead_letter(rejected, self.journal_dir)
+                self._dead_lettered += len(rejected)
+            if deferred:
+                # Keep them (and the journal segments holding them) for the next
+                # attempt; a replay skips the rows of those segments already written
+                with self._lock:
+                    self._pending[:0] = deferred
+                self._failures += 1
+                self._last_failure = time.monotonic()
+
+            written = len(entries) - len(rejected) - len(deferred)
+            if written:
+                elapsed = (time.perf_counter() - start) * 1000
+                oldest = min(entry_time(e) for e in entries)
+                self._record_flush(written, elapsed, (timezone.now() - oldest).total_seconds() * 1000)
+
+            if not deferred:
+                self._last_failure = None
+                for path in sealed:
+                    os.remove(path)
+                    self._sealed.remove(path)
+            return written
+
+    def _record_flush(self, count, elapsed_ms, lag_ms):
+        self._flushes += 1
+        self._flushed += count
+        # Keep the last 1000 samples for the percentiles
+        self._flush_ms = (self._flush_ms + [elapsed_ms])[-1000:]
+        self._lag_ms = (self._lag_ms + [lag_ms])[-1000:]
+        logger.debug("Flushed %d QuizResults in %.1f ms (oldest waited %.0f ms)", count, elapsed_ms, lag_ms)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.interval)
+                stopping = self._stopping
+            close_old_connections()
+            self.flush()
+            if stopping:
+                break
+        connection.close()
+
+    def start(self):
+        if self._thread is None and self.interval:
+            self._thread = threading.Thread(target=self._run, name="quiz-result-flusher", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the flusher thread and write whatever is still queued."""
+        thread = self._thread
+        if thread is not None:
+            with self._lock:
+                self._stopping = True
+                self._wakeup.notify()
+            thread.join()
+            self._thread = None
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if os.path.exists(self._journal_path) and not os.path.getsize(self._journal_path):
+                os.remove(self._journal_path)
+        if self._owner_lock is not None:
+            # Anything left (a failed last flush) now belongs to a dead owner
+            release_owner_lock(self.journal_dir, self.owner, self._owner_lock)
+            self._owner_lock = None
+
+    def stats(self):
+        with self._lock:
+            depth = len(self._pending)
+        return {
+            "mode": self.mode,
+            "depth": depth,
+            "high_water": self._high_water,
+            "flushes": self._flushes,
+            "flushed": self._flushed,
+            "failures": self._failures,
+            "dead_lettered": self._dead_lettered,
+            "inline_flushes": self._inline_flushes,
+            "sync_writes": self._sync_writes,
+            "flush_ms": summarize(self._flush_ms) if self._flush_ms else None,
+            "lag_ms": summarize(self._lag_ms) if self._lag_ms else None,
+        }
+
+
+# ----------------------------------------------------------------------
+# Crash recovery
+# ----------------------------------------------------------------------
+def read_journal(path):
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn last line from a crash mid-write
+                logger.warning("Skipping unreadable journal line in %s", path)
+    return entries
+
+
+def replay_journals(journal_dir, writer, include_live=False):
+    """
+    Write the entries of journal files left by dead owners, including
+    files a failed or dead replay had claimed (every owner but this
+    process's buffer with ``include_live``; only safe when no worker is
+    running). Each file is claimed with an atomic rename first, so
+    concurrent replays never write the same file. Returns (files, entries).
+    """
+    files = entries = 0
+    me = new_owner()
+    buffer = _buffer
+    own = {buffer.owner, str(os.getpid())} if buffer is not None else {str(os.getpid())}
+    alive = {}
+
+    lock = hold_owner_lock(journal_dir, me)
+    try:
+        for path in sorted(glob.glob(os.path.join(journal_dir, "results-*.jsonl*"))):
+            match = JOURNAL_NAME.match(os.path.basename(path))
+            if not match:
+                continue
+            owner = match["replayer"] or match["owner"]
+            if owner in own:
+                continue
+            if not include_live:
+                if owner not in alive:
+                    alive[owner] = owner_alive(journal_dir, owner)
+                if alive[owner]:
+                    continue
+
+            claimed = f"{path.partition('.replaying-')[0]}.replaying-{me}"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # another replay claimed it
+
+            # On failure the file stays claimed by us: the next replay takes it over
+            batch = read_journal(claimed)
+            if batch:
+                rejected, deferred = write_batch(writer, batch, replay=True)
+                dead_letter(rejected, journal_dir)
+                if deferred:
+                    # Keep only the unwritten rows in the claimed file
+                    with open(claimed, "w", encoding="utf-8") as f:
+                        f.writelines(json.dumps(entry) + "\n" for entry in deferred)
+                    logger.warning("Replay of %s left %d entries for the next attempt", path, len(deferred))
+                    continue
+            os.remove(claimed)
+            files += 1
+            entries += len(batch)
+
+        _remove_stale_locks(journal_dir, exclude=own | {me})
+    finally:
+        release_owner_lock(journal_dir, me, lock)
+    return files, entries
+
+
+def _remove_stale_locks(journal_dir, exclude):
+    """Lock files of dead owners that have no journal files left."""
+    names = os.listdir(journal_dir)
+    owners_with_files = set()
+    for name in names:
+        match = JOURNAL_NAME.match(name)
+        if match:
+            owners_with_files.update({match["owner"], match["replayer"]})
+
+    now = time.time()
+    for name in names:
+        match = LOCK_NAME.match(name)
+        if not match or match["owner"] in exclude or match["owner"] in owners_with_files:
+            continue
+        path = os.path.join(journal_dir, name)
+        try:
+            old = now - os.path.getmtime(path) > STALE_LOCK_SECONDS
+        except FileNotFoundError:
+            continue
+        if old and not owner_alive(journal_dir, match["owner"]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def replay_in_background(journal_dir):
+    """Replay dead owners' journals on a thread: errors are logged, never raised to a request."""
+    def run():
+        from .user_stats import save_results
+
+        try:
+            files, entries = replay_journals(journal_dir, save_results)
+            if files:
+                logger.warning("Replayed %d QuizResults from %d journal files", entries, files)
+        except Exception:
+            logger.exception("Journal replay failed; the files are kept for manage.py replay_result_journal")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name="quiz-result-replay", daemon=True)
+    thread.start()
+    return thread
+
+
+# ----------------------------------------------------------------------
+# Process-wide buffer
+# ----------------------------------------------------------------------
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_mode():
+    mode = getattr(settings, "QUIZ_RESULT_WRITE_MODE", "sync")
+    if mode not in MODES:
+        raise ValueError(f"QUIZ_RESULT_WRITE_MODE must be one of {MODES}, not {mode!r}")
+    return mode
+
+
+def get_result_buffer():
+    """The process-wide buffer, or None in sync mode."""
+    global _buffer
+    if _buffer is not None or write_mode() == "sync":
+        return _buffer
+
+    from .user_stats import save_results
+
+    with _buffer_lock:
+        if _buffer is None:
+            mode = write_mode()
+            journal_dir = getattr(settings, "QUIZ_RESULT_JOURNAL_DIR", None)
+            _buffer = ResultBuffer(
+                save_results,
+                mode=mode,
+                capacity=getattr(settings, "QUIZ_RESULT_BUFFER_CAPACITY", 5000),
+                batch_size=getattr(settings, "QUIZ_RESULT_FLUSH_BATCH", 200),
+                interval=getattr(settings, "QUIZ_RESULT_FLUSH_INTERVAL", 1.0),
+                journal_dir=journal_dir,
+            )
+            atexit.register(_buffer.close)
+            if mode == "journal":
+                replay_in_background(journal_dir)
+    return _buffer
+
+
+def buffer_stats():
+    """Instrumentation for the current process (``{"mode": "sync"}`` when unbuffered)."""
+    buffer = _buffer
+    if buffer is None:
+        return {"mode": write_mode()}
+    return buffer.stats()
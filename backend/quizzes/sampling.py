@@ -0,0 +1,312 @@
+"""
+In-memory sampling index for the question bank.
+
+Random exams used to be assembled with ``ORDER BY RANDOM()`` (one query per
+quiz) or by loading every standalone question into Python just to shuffle
+it. Both scan the whole table on every request.
+
+The index keeps, per quiz and per quiz_type, compact arrays of question,
+passage and dataset IDs. It is built once per process with four
+``values_list`` queries and tagged with the bank version it was built at.
+That version lives in the shared cache (``cache_versions.py``) and is
+bumped by the model signals in ``quizzes/signals.py`` and by the importer,
+whichever process they run in; every request compares it with the
+index's and rebuilds lazily when they differ. Picking IDs
+is O(k); the rows are then loaded with a single ``id__in`` query. Given a
+user's seen set (``seen_questions.py``) the random-exam helpers prefer the
+questions outside it, drawing more candidates as less of the bank is left
+unseen but never looking at the seen set beyond membership tests.
+"""
+import math
+import random
+import threading
+from array import array
+
+from asgiref.sync import sync_to_async
+
+from .cache_versions import get_version, bump_version
+from .models import Quiz, Passage, DataSet, Question
+from .query_plans import plan_question_queryset, plan_passage_queryset, plan_dataset_queryset
+
+
+VERSION_NAME = "sampling"
+
+
+def _ids():
+    return array('q')
+
+
+def _sample(ids, k):
+    """Pick up to ``k`` random items from a sequence in O(k)."""
+    if not ids or k <= 0:
+        return []
+    return random.sample(ids, min(k, len(ids)))
+
+
+def _sample_segments(segments, k):
+    """
+    Sample up to ``k`` items from the union of several sequences without
+    concatenating them (keeps the cost O(k) instead of O(n)).
+    """
+    total = sum(len(s) for s in segments)
+    if not total or k <= 0:
+        return []
+
+    picked = []
+    for position in random.sample(range(total), min(k, total)):
+        for segment in segments:
+            if position < len(segment):
+                picked.append(segment[position])
+                break
+            position -= len(segment)
+    return picked
+
+
+# Random positions drawn per question wanted, over what the unseen fraction
+# of the bank needs on average, when preferring unseen ones
+SEEN_OVERSAMPLE = 4
+
+
+def _sample_segments_unseen(segments, k, seen, unseen_fraction=1.0):
+    """
+    ``_sample_segments`` preferring items outside ``seen``: draws random
+    positions until ``k`` unseen items are found, topping up with seen
+    ones. At most ``SEEN_OVERSAMPLE * k / unseen_fraction`` positions are
+    drawn, so the cost follows how much of the bank is left unseen, never
+    the size of ``seen``.
+    """
+    total = sum(len(s) for s in segments)
+    if not total or k <= 0:
+        return []
+
+    cap = min(total, math.ceil(SEEN_OVERSAMPLE * k / max(unseen_fraction, 1 / total)))
+    unseen, already_seen = [], []
+    for position in random.sample(range(total), cap):
+        for segment in segments:
+            if position < len(segment):
+                item = segment[position]
+                (already_seen if item in seen else unseen).append(item)
+                break
+            position -= len(segment)
+        if len(unseen) == k:
+            break
+    return (unseen + already_seen)[:k]
+
+
+class SamplingIndex:
+    """Immutable snapshot of the question bank's ID structure."""
+
+    def __init__(self, version=None):
+        # Bank version (``VERSION_NAME``) read before the build started
+        self.version = version
+
+        # quiz_type -> [quiz_id], and quiz_id -> quiz_type
+        self.type_quizzes = {}
+        self.quiz_types = {}
+        # quiz_type -> [passage_id] / [dataset_id]
+        self.type_passages = {}
+        self.type_datasets = {}
+
+        # quiz_id -> [passage_id] / [dataset_id]
+        self.quiz_passages = {}
+        self.quiz_datasets = {}
+
+        # quiz_id -> question IDs attached directly to the quiz
+        self.standalone = {}        # no passage, no dataset
+        self.passage_linked = {}    # quiz FK set and inside a passage
+        self.dataset_linked = {}    # quiz FK set and inside a dataset
+
+        # passage_id / dataset_id -> child question IDs (ordered by id)
+        self.passage_questions = {}
+        self.dataset_questions = {}
+
+        # question_id -> quiz it belongs to (its own, or its passage's / dataset's)
+        self.question_quizzes = {}
+
+        self.question_count = 0
+        self._type_question_counts = {}
+
+    @classmethod
+    def build(cls, version=None):
+        index = cls(version)
+        quiz_types = index.quiz_types
+
+        for quiz_id, quiz_type in Quiz.objects.order_by('id').values_list('id', 'quiz_type'):
+            quiz_types[quiz_id] = quiz_type
+            index.type_quizzes.setdefault(quiz_type, []).append(quiz_id)
+
+        passage_quizzes, dataset_quizzes = {}, {}
+        for passage_id, quiz_id in Passage.objects.order_by('id').values_list('id', 'quiz_id'):
+            passage_quizzes[passage_id] = quiz_id
+            index.quiz_passages.setdefault(quiz_id, _ids()).append(passage_id)
+            index.type_passages.setdefault(quiz_types.get(quiz_id), _ids()).append(passage_id)
+
+        for dataset_id, quiz_id in DataSet.objects.order_by('id').values_list('id', 'quiz_id'):
+            dataset_quizzes[dataset_id] = quiz_id
+            index.quiz_datasets.setdefault(quiz_id, _ids()).append(dataset_id)
+            index.type_datasets.setdefault(quiz_types.get(quiz_id), _ids()).append(dataset_id)
+
+        rows = (
+            Question.objects.order_by('id')
+            .values_list('id', 'quiz_id', 'passage_id', 'dataset_id')
+            .iterator(chunk_size=10000)
+        )
+        for question_id, quiz_id, passage_id, dataset_id in rows:
+            index.question_count += 1
+            owner = quiz_id or passage_quizzes.get(passage_id) or dataset_quizzes.get(dataset_id)
+            if owner:
+                index.question_quizzes[question_id] = owner
+
+            if passage_id:
+                index.passage_questions.setdefault(passage_id, _ids()).append(question_id)
+            if dataset_id:
+                index.dataset_questions.setdefault(dataset_id, _ids()).append(question_id)
+
+            if not quiz_id:
+                continue
+            if passage_id:
+                bucket = index.passage_linked
+            elif dataset_id:
+                bucket = index.dataset_linked
+            else:
+                bucket = index.standalone
+            bucket.setdefault(quiz_id, _ids()).append(question_id)
+
+        return index
+
+    # ------------------------------------------------------------------
+    # Sampling helpers
+    # ------------------------------------------------------------------
+    def sample_standalone(self, quiz_id, k):
+        """Random standalone (no passage / dataset) questions of a quiz."""
+        return _sample(self.standalone.get(quiz_id), k)
+
+    def sample_quiz_questions(self, quiz_id, k, exclude=None, seen=None):
+        """
+        Random questions attached to a quiz, optionally leaving out the
+        passage-linked or dataset-linked ones (``exclude='passage'|'dataset'``)
+        and preferring IDs not in ``seen``.
+        """
+        segments = [self.standalone.get(quiz_id, ())]
+        if exclude != 'passage':
+            segments.append(self.passage_linked.get(quiz_id, ()))
+        if exclude != 'dataset':
+            segments.append(self.dataset_linked.get(quiz_id, ()))
+        if seen:
+            unseen_fraction = self.unseen_fraction(self.quiz_types.get(quiz_id), seen)
+            return _sample_segments_unseen(segments, k, seen, unseen_fraction)
+        return _sample_segments(segments, k)
+
+    def sample_groups(self, group_ids, children, groups, per_group):
+        """
+        Pick ``groups`` random passages/datasets and ``per_group`` random
+        child questions from each. Returns (group_ids, question_ids).
+        """
+        picked = _sample(group_ids, groups)
+        question_ids = []
+        for group_id in picked:
+            question_ids.extend(_sample(children.get(group_id), per_group))
+        return picked, question_ids
+
+    def pick_one(self, ids):
+        return random.choice(ids) if ids else None
+
+    def pick_group(self, group_ids, children, per_group, seen=None):
+        """
+        A random passage / dataset; with ``seen``, the one whose first
+        ``per_group`` questions have been seen least, out of a few drawn.
+        """
+        if not seen or not group_ids:
+            return self.pick_one(group_ids)
+        candidates = _sample(group_ids, SEEN_OVERSAMPLE)
+        return min(
+            candidates,
+            key=lambda group_id: sum(qid in seen for qid in children.get(group_id, ())[:per_group]),
+        )
+
+    def unseen_fraction(self, quiz_type, seen):
+        """Share of ``quiz_type``'s questions outside ``seen`` (a lower bound: seen IDs may be gone)."""
+        total = self.type_question_count(quiz_type)
+        return max(0.0, 1 - len(seen) / total) if total else 1.0
+
+    def type_question_count(self, quiz_type):
+        """Questions a random exam of ``quiz_type`` can draw from."""
+        count = self._type_question_counts.get(quiz_type)
+        if count is None:
+            count = sum(len(self.standalone.get(q, ())) for q in self.type_quizzes.get(quiz_type, ()))
+            count += sum(len(self.passage_questions.get(p, ())) for p in self.type_passages.get(quiz_type, ()))
+            count += sum(len(self.dataset_questions.get(d, ())) for d in self.type_datasets.get(quiz_type, ()))
+            self._type_question_counts[quiz_type] = count
+        return count
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_sampling_index():
+    """Return the current index, building it if it is missing or stale."""
+    version = get_version(VERSION_NAME)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    return _rebuild(version)
+
+
+async def aget_sampling_index():
+    """``get_sampling_index()`` for async views: the version check and a rebuild leave the event loop."""
+    version = await sync_to_async(get_version, thread_sensitive=False)(VERSION_NAME)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    return await sync_to_async(_rebuild)(version)
+
+
+def _rebuild(version):
+    global _index
+    with _lock:
+        if _index is not None and _index.version == version:
+            return _index
+        # Tagged with the version read before the build: a bump while we
+        # read makes the next request rebuild again.
+        _index = SamplingIndex.build(version)
+        return _index
+
+
+def invalidate_sampling_index(**kwargs):
+    """Mark the index stale in every process; the next request rebuilds it."""
+    global _index
+    bump_version(VERSION_NAME)
+    _index = None
+
+
+# ----------------------------------------------------------------------
+# Row fetching (one query per model, choices prefetched)
+# ----------------------------------------------------------------------
+def _in_order(rows, ids):
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def fetch_questions(ids):
+    """Load questions by ID, keeping the sampled order."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return []
+    return _in_order(plan_question_queryset().filter(id__in=ids), ids)
+
+
+def fetch_passages(ids):
+    ids = list(ids)
+    if not ids:
+        return []
+    rows = plan_passage_queryset(Passage.objects.filter(id__in=ids))
+    return _in_order(rows, ids)
+
+
+def fetch_datasets(ids):
+    ids = list(ids)
+    if not ids:
+        return []
+    rows = plan_dataset_queryset(DataSet.objects.filter(id__in=ids))
+    return _in_order(rows, ids)
@@ -0,0 +1,73 @@
+"""
+Per-user, per-type sets of questions already answered.
+
+Random exams were sampled without looking at history, so users who take
+``random/`` repeatedly kept getting the same questions. Excluding them in
+SQL (``exclude(id__in=seen)``) would grow the query with every exam.
+Instead, ``SeenQuestions`` keeps each user's seen IDs per quiz type as a
+roaring-style bitmap (``bitmaps.py``): about 2 bytes per ID, or 8 KiB per
+65,536-ID range once a range fills up. ``load_seen`` reads it in one
+indexed query. The sampler tests candidate IDs against it as it draws
+them (``SamplingIndex.sample_quiz_questions``), so a request costs the
+same for a user with 50 answers as for one with 50,000.
+Pooled exams (``exam_pools.py``) are chosen the same way: the variant
+repeating the fewest of the user's questions.
+
+Both submission views call ``record_seen`` with the graded questions.
+Once the set covers ``QUIZ_SEEN_RESET_COVERAGE`` of the questions a
+random exam of the type can draw from, it starts over from the
+submission's questions, so the last few unseen questions do not make up
+every exam. The update runs in an immediate transaction that is retried
+while SQLite is locked (``backend/transactions.py``). In the buffered
+result write modes it still happens in the request.
+"""
+from django.conf import settings
+
+from backend.transactions import retry_on_lock
+from .bitmaps import IdBitmap
+from .models import SeenQuestions
+from .sampling import get_sampling_index
+
+
+def _reset_coverage():
+    return getattr(settings, "QUIZ_SEEN_RESET_COVERAGE", 0.9)
+
+
+def load_seen(user, quiz_type):
+    """The user's seen set for ``quiz_type`` (None when there is none yet)."""
+    bitmap = (
+        SeenQuestions.objects.filter(user=user, quiz_type=quiz_type)
+        .values_list("bitmap", flat=True)
+        .first()
+    )
+    return IdBitmap.from_bytes(bitmap) if bitmap is not None else None
+
+
+@retry_on_lock
+def record_seen(user, quiz_type, question_ids):
+    """Add ``question_ids`` to the user's seen set, starting over at full coverage."""
+    if not question_ids or not quiz_type:
+        return None
+
+    row = SeenQuestions.objects.select_for_update().filter(user=user, quiz_type=quiz_type).first()
+    seen = IdBitmap.from_bytes(row.bitmap) if row else IdBitmap()
+    seen.add_many(question_ids)
+
+    total = get_sampling_index().type_question_count(quiz_type)
+    resets = row.resets if row else 0
+    if total and len(seen) >= _reset_coverage() * total:
+        seen = IdBitmap(question_ids)
+        resets += 1
+
+    if row is None:
+        # First exam of the type: one INSERT. A concurrent first exam of the
+        # same user and type wins the race; this one's IDs are not kept.
+        row = SeenQuestions(user=user, quiz_type=quiz_type, bitmap=seen.to_bytes(), count=len(seen), resets=resets)
+        SeenQuestions.objects.bulk_create([row], ignore_conflicts=True)
+        return row
+
+    row.bitmap = seen.to_bytes()
+    row.count = len(seen)
+    row.resets = resets
+    row.save(update_fields=["bitmap", "count", "resets", "updated_at"])
+    return row
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Quiz, Passage, Question, Choice, QuizResult, DataSet
+from .query_plans import related, plan_question_queryset, plan_passage_queryset, plan_dataset_queryset
 
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,6 +16,14 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = ['id', 'text', 'explanation', 'question_type', 'quiz_name', 'choices']
 
+    def to_representation(self, instance):
+        # A question can appear both in a passage/dataset and in the quiz's
+        # own list; serialize it once per request and reuse the result.
+        memo = self.context.setdefault('_serialized_questions', {})
+        if instance.pk not in memo:
+            memo[instance.pk] = super().to_representation(instance)
+        return memo[instance.pk]
+
     def get_quiz_name(self, obj):
         # Prefer direct attributes if present (select_related in view makes these cheap)
         if getattr(obj, "quiz_id", None):
@@ -51,8 +60,15 @@ class DataSetSerializer(serializers.ModelSerializer):
         return None
 
 class QuizSerializer(serializers.ModelSerializer):
-    passages = PassageSerializer(many=True, read_only=True)
-    datasets = serializers.SerializerMethodField()  # <-- changed to method field
+    """
+    Serializes a quiz tree. Randomized subsets in the context
+    (``sampled_questions``, ``randomized_passages``, ``randomized_datasets``)
+    replace the full relations; otherwise the relations are read from the
+    view's prefetch plan (see ``quizzes/query_plans.py``). Each subtree is
+    serialized exactly once.
+    """
+    passages = serializers.SerializerMethodField()
+    datasets = serializers.SerializerMethodField()
     questions = serializers.SerializerMethodField()
     total_questions = serializers.SerializerMethodField()
 
@@ -71,47 +87,45 @@ class QuizSerializer(serializers.ModelSerializer):
             'total_questions',
         ]
 
+    def get_passages(self, obj):
+        """Randomized passages if present in context, otherwise all of them."""
+        passages = self.context.get('randomized_passages') or related(obj, 'passages', plan_passage_queryset)
+        return PassageSerializer(passages, many=True, context=self.context).data
+
     def get_datasets(self, obj):
         """Return datasets with context to properly generate image URLs."""
-        # Pass the request context to DataSetSerializer so image URLs are absolute
-        return DataSetSerializer(
-            obj.datasets.all(),
-            many=True,
-            context=self.context
-        ).data
+        datasets = self.context.get('randomized_datasets') or related(obj, 'datasets', plan_dataset_queryset)
+        return DataSetSerializer(datasets, many=True, context=self.context).data
 
     def get_questions(self, obj):
         """Return only the sampled/randomized questions if present in context."""
-        sampled_questions = self.context.get('sampled_questions')
-        if sampled_questions:
-            return QuestionSerializer(sampled_questions, many=True).data
-        return QuestionSerializer(obj.questions.all(), many=True).data
+        questions = self.context.get('sampled_questions') or related(obj, 'questions', plan_question_queryset)
+        return QuestionSerializer(questions, many=True, context=self.context).data
 
     def get_total_questions(self, obj):
         """Return the count of randomized questions actually included."""
         sampled_questions = self.context.get('sampled_questions', [])
         return len(sampled_questions)
 
-    def to_representation(self, instance):
-        """Ensure the serializer uses randomized versions for questions, passages, datasets."""
-        data = super().to_representation(instance)
-
-        # Use randomized questions if provided in context
-        sampled_questions = self.context.get('sampled_questions')
-        if sampled_questions:
-            data['questions'] = QuestionSerializer(sampled_questions, many=True).data
-
-        # Use randomized passages if available in context
-        randomized_passages = self.context.get('randomized_passages')
-        if randomized_passages:
-            data['passages'] = PassageSerializer(randomized_passages, many=True, context=self.context).data
 
-        # Use randomized datasets if available in context
-        randomized_datasets = self.context.get('randomized_datasets')
-        if randomized_datasets:
-            data['datasets'] = DataSetSerializer(randomized_datasets, many=True, context=self.context).data
+class QuizSummarySerializer(serializers.ModelSerializer):
+    """A catalog row without its question tree (see ``catalog.summary_queryset``)."""
+    question_count = serializers.IntegerField(read_only=True)
+    passage_count = serializers.IntegerField(read_only=True)
+    dataset_count = serializers.IntegerField(read_only=True)
 
-        return data
+    class Meta:
+        model = Quiz
+        fields = [
+            'id',
+            'title',
+            'quiz_type',
+            'time_limit',
+            'is_random',
+            'question_count',
+            'passage_count',
+            'dataset_count',
+        ]
 
 
 class QuizResultSerializer(serializers.ModelSerializer):
@@ -0,0 +1,54 @@
+# quizzes/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Quiz, Passage, DataSet, Question, Choice
+from .sampling import invalidate_sampling_index
+from .answer_keys import invalidate_answer_keys
+from .catalog import invalidate_catalog
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Passage)
+@receiver(post_delete, sender=Passage)
+@receiver(post_save, sender=DataSet)
+@receiver(post_delete, sender=DataSet)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_bank_changed(sender, **kwargs):
+    # Drop the index now (same-transaction reads) and again once the write
+    # is committed, so a rebuild that raced the transaction is not kept.
+    invalidate_sampling_index()
+    transaction.on_commit(invalidate_sampling_index)
+
+
+@receiver(post_save, sender=Passage)
+@receiver(post_delete, sender=Passage)
+@receiver(post_save, sender=DataSet)
+@receiver(post_delete, sender=DataSet)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def answer_key_changed(sender, **kwargs):
+    # Same double bump as above: keys rebuilt mid-transaction are orphaned.
+    invalidate_answer_keys()
+    transaction.on_commit(invalidate_answer_keys)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Passage)
+@receiver(post_delete, sender=Passage)
+@receiver(post_save, sender=DataSet)
+@receiver(post_delete, sender=DataSet)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def catalog_changed(sender, **kwargs):
+    # Bumped again on commit so an ETag handed out mid-transaction is not reused.
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
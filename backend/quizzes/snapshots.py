@@ -0,0 +1,208 @@
+"""
+Pre-rendered, pre-compressed snapshots of the catalog payloads.
+
+``grouped/`` and ``by-type/`` return the same bytes to every client until
+the catalog changes, yet each request ran the planned queries and a full
+nested ``QuizSerializer`` pass. A snapshot is that payload rendered once
+per catalog version (see ``catalog.py``) to JSON bytes, plus gzip and
+brotli variants (``Brotli`` is in requirements.txt; an install without
+it serves gzip only), stored in
+the shared Django cache, so every worker serves the snapshot one of them
+rendered and moves on together when the catalog version changes. The
+views pick the best variant the client accepts and send it as-is with the
+matching ``Content-Encoding``.
+
+Regeneration is single-flight: in a process, one thread renders while the
+others wait for it; across processes a short ``cache.add`` lease lets one
+worker render while the rest poll the cache for the result (and only
+render themselves if the lease holder takes longer than the lease).
+"""
+import gzip
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.renderers import JSONRenderer
+
+from .catalog import catalog_version, catalog_etag, catalog_last_modified
+from .models import Quiz
+from .query_plans import plan_quiz_queryset
+from .serializers import QuizSerializer
+
+try:
+    import brotli
+except ImportError:  # installs without Brotli offer gzip only
+    brotli = None
+
+
+LEASE_SECONDS = 30
+POLL_SECONDS = 0.05
+# Snapshots of older catalog versions are never read again: let them expire
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+# ----------------------------------------------------------------------
+# Payloads
+# ----------------------------------------------------------------------
+def grouped_payload():
+    """Quizzes grouped by quiz_type with readable labels (``grouped/``)."""
+    # One planned query set for the whole catalog, grouped in Python
+    quizzes = list(plan_quiz_queryset(Quiz.objects.order_by('id')))
+    serializer_context = {}  # shared, so repeated questions are serialized once
+
+    grouped = []
+    for code, label in Quiz.QUIZ_TYPES:
+        of_type = [quiz for quiz in quizzes if quiz.quiz_type == code]
+        serialized = QuizSerializer(of_type, many=True, context=serializer_context).data
+
+        grouped.append({
+            "code": code,
+            "label": label,
+            "quizzes": serialized,
+            "count": len(of_type)
+        })
+
+    return {
+        "groups": grouped,
+        "total": len(quizzes)
+    }
+
+
+def by_type_payload():
+    """quiz_type -> serialized quizzes (``by-type/``)."""
+    quizzes = plan_quiz_queryset(Quiz.objects.order_by('id'))
+    grouped = {}
+    serializer_context = {}  # shared, so repeated questions are serialized once
+
+    for quiz in quizzes:
+        grouped.setdefault(quiz.quiz_type, []).append(QuizSerializer(quiz, context=serializer_context).data)
+    return grouped
+
+
+PAYLOADS = {
+    "grouped": grouped_payload,
+    "by_type": by_type_payload,
+}
+
+
+# ----------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------
+_stats = {"hits": 0, "builds": 0, "waits": 0}
+_stats_lock = threading.Lock()
+_build_locks = {name: threading.Lock() for name in PAYLOADS}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def snapshot_stats():
+    """Hit / build / wait counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _key(version, name):
+    return f"quizzes:catalog:snapshot:{version}:{name}"
+
+
+def render_snapshot(name):
+    """{encoding: bytes} for one payload; ``identity`` is the plain JSON."""
+    body = JSONRenderer().render(PAYLOADS[name]())
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def get_snapshot(name):
+    """The snapshot of ``name`` for the current catalog version, rendered at most once."""
+    version, _ = catalog_version()
+    key = _key(version, name)
+
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        _count("hits")
+        return snapshot
+
+    # Threads of this process queue here; the first one renders
+    with _build_locks[name]:
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            _count("hits")
+            return snapshot
+
+        lease = f"{key}:lease"
+        if not cache.add(lease, 1, timeout=LEASE_SECONDS):
+            # Another process is rendering this version: wait for its result
+            _count("waits")
+            deadline = time.monotonic() + LEASE_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(POLL_SECONDS)
+                snapshot = cache.get(key)
+                if snapshot is not None:
+                    return snapshot
+
+        try:
+            _count("builds")
+            snapshot = render_snapshot(name)
+            cache.set(key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+        finally:
+            cache.delete(lease)
+    return snapshot
+
+
+def choose_encoding(request):
+    """The best pre-compressed variant the client accepts, or ``identity``."""
+    accepted = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = part.partition(";")
+        params = params.strip().replace(" ", "")
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return "identity"
+
+
+def snapshot_etag(request, *args, **kwargs):
+    # A compressed body is a different representation: it needs its own strong tag
+    etag = catalog_etag(request)
+    if getattr(getattr(request, "accepted_renderer", None), "format", "json") == "json":
+        etag = f"{etag}-{choose_encoding(request)}"
+    return etag
+
+
+# Like ``catalog.conditional_catalog``, for views answered by ``snapshot_response``
+conditional_snapshot = method_decorator(
+    condition(etag_func=snapshot_etag, last_modified_func=catalog_last_modified),
+    name="get",
+)
+
+
+def snapshot_response(request, name):
+    """Send the snapshot bytes directly, compressed when the client allows."""
+    encoding = choose_encoding(request)
+    body = get_snapshot(name)[encoding]
+
+    response = HttpResponse(body, content_type="application/json")
+    if encoding != "identity":
+        response["Content-Encoding"] = encoding
+    response["Content-Length"] = len(body)
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
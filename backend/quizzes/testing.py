@@ -0,0 +1,144 @@
+"""
+Shared fixtures for the API regression tests.
+
+``BankTestCase`` seeds the question bank through the real management
+commands and offers ``call()``, which performs a request and fails the test
+when it runs more SQL queries or returns more bytes than allowed for that
+route in ``query_budgets.json`` (next to manage.py). The SQL profiler
+middleware (``quizzes/profiling.py``) runs in "raise" mode for these tests,
+so a request over its route's budget fails even outside ``call()``.
+
+To re-measure after an intentional change, run the suite with
+``RECORD_QUERY_BUDGETS=observed.json``: budgets are not enforced and the
+worst case seen per route is written to that file on exit.
+"""
+import atexit
+import json
+import logging
+import os
+from contextlib import contextmanager
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .profiling import budget_file, load_budgets
+from .sampling import invalidate_sampling_index
+from users.authentication import user_cache
+
+
+SEED_COMMANDS = (
+    "seed_quizzes",
+    "load_all_stand_alone_quizzes",
+    "load_reading_comprehension",
+)
+
+TEST_PASSWORD = "Str0ng!Passw0rd"
+
+_observed = {}
+RECORD_PATH = os.environ.get("RECORD_QUERY_BUDGETS")
+
+
+def _write_observed():
+    with open(RECORD_PATH, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(_observed.items())), f, indent=2)
+        f.write("\n")
+
+
+if RECORD_PATH:
+    atexit.register(_write_observed)
+
+
+@contextmanager
+def working_directory(path):
+    # The loaders resolve json_quizzes/ relative to the current directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def seed_bank():
+    with working_directory(settings.BASE_DIR):
+        for command in SEED_COMMANDS:
+            call_command(command, stdout=StringIO())
+
+
+@override_settings(
+    SQL_PROFILER_ENABLED=True,
+    SQL_PROFILER_BUDGET_MODE="warn" if RECORD_PATH else "raise",
+    # No refiller thread: its connection could not see the test's data.
+    # Tests fill the exam pools with refill_pools() when they need them
+    QUIZ_EXAM_POOL_REFILL_INTERVAL=0,
+)
+class BankTestCase(TestCase):
+    """TestCase with the bundled quiz bank loaded and per-route budgets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_bank()
+        cls.user = User.objects.create_user(
+            username="reviewer", email="reviewer@example.com", password=TEST_PASSWORD
+        )
+
+    def setUp(self):
+        # Every test starts cold: no cached keys, no sampling index, no cached users
+        cache.clear()
+        caches["versions"].clear()
+        invalidate_sampling_index()
+        user_cache.clear()
+        self.client = APIClient()
+
+        # Keep the per-request profile lines out of logs/; over-budget warnings still go there
+        profiler = logging.getLogger("quizzes.profiling")
+        self.addCleanup(profiler.setLevel, profiler.level)
+        profiler.setLevel(logging.WARNING)
+
+    def authenticate(self, user=None):
+        token = RefreshToken.for_user(user or self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        return token
+
+    def call(self, route, path=None, data=None, status=200, **extra):
+        """
+        Perform ``route`` ("METHOD /template/") against ``path`` and check
+        the status code and the route's query / response-size budget.
+        """
+        method, template = route.split(" ", 1)
+        path = path or template
+
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data, format="json", **extra)
+
+        self.assertEqual(
+            response.status_code, status,
+            f"{route} returned {response.status_code}: {response.content[:300]!r}"
+        )
+
+        if RECORD_PATH:
+            seen = _observed.setdefault(route, {"queries": 0, "bytes": 0})
+            seen["queries"] = max(seen["queries"], len(queries))
+            seen["bytes"] = max(seen["bytes"], len(response.content))
+            return response
+
+        budget = load_budgets().get(route)
+        self.assertIsNotNone(budget, f"No budget for {route} in {budget_file()}")
+        self.assertLessEqual(
+            len(queries), budget["queries"],
+            f"{route} ran {len(queries)} queries (budget {budget['queries']}):\n"
+            + "\n".join(q["sql"] for q in queries.captured_queries)
+        )
+        self.assertLessEqual(
+            len(response.content), budget["bytes"],
+            f"{route} returned {len(response.content)} bytes (budget {budget['bytes']})"
+        )
+        return response
@@ -6,6 +6,7 @@ from .views import QuizByTypeView, QuizGroupedAPIView, RandomizedByTypeAPIView,
 urlpatterns = [
     path('', views.QuizListAPIView.as_view(), name='quiz-list'),
     path('grouped/', views.QuizGroupedAPIView.as_view(), name='quiz-grouped'),
+    path('summary/', views.QuizSummaryAPIView.as_view(), name='quiz-summary'),
     path('<int:pk>/', views.QuizDetailAPIView.as_view(), name='quiz-detail'),
     path('<int:pk>/submit/', views.QuizSubmissionAPIView.as_view(), name='quiz-submit'),
     
@@ -18,6 +19,8 @@ urlpatterns = [
 
     path("user/summary/", UserSummaryAPIView.as_view(), name="user-summary"),
     path('results/my/', views.UserResultsAPIView.as_view(), name='user-results'),  
+    path("rank/", views.ScoreRankAPIView.as_view(), name="score-rank"),
+    path("leaderboard/", views.LeaderboardAPIView.as_view(), name="leaderboard"),
 
 
 ]
@@ -0,0 +1,192 @@
+"""
+Per-user, per-quiz-type statistics.
+
+``UserTypeStats`` holds running totals (attempts, score sum, best score,
+time spent, last attempt) so ``UserSummaryAPIView`` reads at most five
+indexed rows instead of loading the user's whole history.
+
+Both submission views save through ``record_result``, which creates the
+QuizResult and folds it into the totals (and the leaderboard histograms,
+see ``leaderboards.py``) in the same transaction. The
+totals are changed with a single ``UPDATE ... SET attempts = attempts + 1``
+style statement, so two submissions racing on the same row both land: the
+database applies the increments one after the other instead of the last
+writer overwriting a value read in Python.
+
+With ``QUIZ_RESULT_WRITE_MODE`` set to a buffered mode, ``record_result``
+queues the result instead and ``save_results`` applies a whole batch in
+one transaction (``result_buffer.py``). Both write in an immediate
+transaction that is retried while SQLite is locked
+(``backend/transactions.py``).
+
+``rebuild_user_stats`` recomputes the table from QuizResult history (after
+imports or deletes in the admin); migration 0008 does the same once, with
+its own copy of the query, for the results saved before the table existed.
+"""
+from django.db import transaction
+from django.db.models import Case, When, F, Value, Count, Sum, Max
+from django.db.models.functions import Coalesce, Greatest, NullIf
+
+from backend.transactions import retry_on_lock
+from .models import Quiz, QuizResult, UserTypeStats
+from .leaderboards import record_result_scores
+from .result_buffer import get_result_buffer, entry_time, RESULT_FIELDS
+
+
+def result_quiz_type(result):
+    """The quiz type a result counts towards (random results carry their own)."""
+    if result.quiz_type:
+        return result.quiz_type
+    return result.quiz.quiz_type if result.quiz_id else None
+
+
+def _seconds(value):
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def apply_result(result):
+    """Fold one saved QuizResult into its user's totals (call inside a transaction)."""
+    quiz_type = result_quiz_type(result)
+    if not result.user_id or not quiz_type:
+        return
+
+    row = UserTypeStats.objects.filter(user_id=result.user_id, quiz_type=quiz_type)
+    changes = dict(
+        attempts=F('attempts') + 1,
+        score_sum=F('score_sum') + result.score,
+        best_score=Greatest(F('best_score'), Value(float(result.score))),
+        total_time_spent=F('total_time_spent') + _seconds(result.time_spent),
+        last_attempt_at=Case(
+            When(last_attempt_at__gt=result.submitted_at, then=F('last_attempt_at')),
+            default=Value(result.submitted_at),
+        ),
+    )
+
+    # Existing row: one relative UPDATE. First result of this type: insert
+    # an empty row (ignoring a concurrent insert of the same row) and apply it.
+    if not row.update(**changes):
+        UserTypeStats.objects.bulk_create(
+            [UserTypeStats(user_id=result.user_id, quiz_type=quiz_type)], ignore_conflicts=True
+        )
+        row.update(**changes)
+
+
+def record_result(**fields):
+    """
+    Create a QuizResult and update the user's statistics atomically.
+
+    In the buffered write modes the result is queued instead (see
+    ``result_buffer.py``) and None is returned; ``save_results`` writes it
+    with the next batch.
+    """
+    buffer = get_result_buffer()
+    if buffer is not None:
+        buffer.submit(fields)
+        return None
+
+    return _write_result(fields)
+
+
+@retry_on_lock
+def _write_result(fields):
+    result = QuizResult.objects.create(**fields)
+    apply_result(result)
+    record_result_scores(result, result_quiz_type(result))
+    return result
+
+
+@retry_on_lock
+def save_results(entries, replay=False):
+    """
+    Bulk-insert buffered result entries and fold them into the statistics,
+    all in one transaction. With ``replay`` entries already written (same
+    ``entry_id``) are skipped.
+    """
+    if replay:
+        done = {
+            u.hex for u in QuizResult.objects.filter(
+                entry_id__in=[e["entry_id"] for e in entries]
+            ).values_list('entry_id', flat=True)
+        }
+        entries = [e for e in entries if e["entry_id"] not in done]
+        if not entries:
+            return []
+
+    results = QuizResult.objects.bulk_create([
+        QuizResult(entry_id=e["entry_id"], **{name: e[name] for name in RESULT_FIELDS if name in e})
+        for e in entries
+    ])
+
+    # auto_now_add stamped the flush time; keep the time of submission
+    for result, entry in zip(results, entries):
+        result.submitted_at = entry_time(entry)
+    QuizResult.objects.bulk_update(results, ['submitted_at'])
+
+    for result in results:
+        apply_result(result)
+        record_result_scores(result, result_quiz_type(result))
+    return results
+
+
+def get_user_summary(user):
+    """Dashboard rows for every quiz type, zeros where the user has no results."""
+    stats = {s.quiz_type: s for s in UserTypeStats.objects.filter(user=user)}
+
+    summary = []
+    for code, name in Quiz.QUIZ_TYPES:
+        row = stats.get(code)
+        summary.append({
+            "code": code,
+            "name": name,
+            "average_score": row.average_score if row else 0,
+            "best_score": row.best_score if row else 0,
+            "total_quizzes": row.attempts if row else 0,
+        })
+    return summary
+
+
+def rebuild_user_stats(user_ids=None):
+    """
+    Recompute UserTypeStats from QuizResult history. Returns the number of
+    rows written. Limited to ``user_ids`` when given.
+    """
+    results = QuizResult.objects.filter(user__isnull=False)
+    stats = UserTypeStats.objects.all()
+    if user_ids:
+        results = results.filter(user_id__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+
+    totals = (
+        results
+        .annotate(effective_type=Coalesce(NullIf('quiz_type', Value('')), 'quiz__quiz_type'))
+        .filter(effective_type__isnull=False)
+        .values('user_id', 'effective_type')
+        .annotate(
+            attempts=Count('id'),
+            score_sum=Sum('score'),
+            best_score=Max('score'),
+            total_time_spent=Sum('time_spent'),
+            last_attempt_at=Max('submitted_at'),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rows = [
+            UserTypeStats(
+                user_id=t['user_id'],
+                quiz_type=t['effective_type'],
+                attempts=t['attempts'],
+                score_sum=t['score_sum'] or 0,
+                best_score=t['best_score'] or 0,
+                total_time_spent=max(0, t['total_time_spent'] or 0),
+                last_attempt_at=t['last_attempt_at'],
+            )
+            for t in totals.iterator()
+        ]
+        stats.delete()
+        UserTypeStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
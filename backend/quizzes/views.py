@@ -1,23 +1,335 @@
+import math
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
-from .models import Quiz, Question, Choice, QuizResult, Passage, DataSet
+from .models import Quiz, QuizResult, BestScore
 from .serializers import (
     QuizSerializer,
     QuizResultSerializer,
     QuestionSerializer,
     PassageSerializer, DataSetSerializer
 )
-
+from .query_plans import plan_quiz_queryset
+from .sampling import get_sampling_index, fetch_questions, fetch_passages, fetch_datasets
+from .answer_keys import get_answer_keys_for, get_question_answer_keys
+from .exam_tokens import issue_exam_token, verify_exam_token, collect_question_ids, ExamTokenError
+from .exam_pools import pooled_exam, mark_wanted
+from .user_stats import record_result, get_user_summary
+from .seen_questions import load_seen, record_seen
+from .leaderboards import quiz_scope, type_scope, histogram, rank_in, LeaderboardEntries
+from .catalog import conditional_catalog, summary_payload
+from .pagination import HistoryPagination
+from .snapshots import conditional_snapshot, snapshot_response, grouped_payload, by_type_payload
+from .metrics import StageTimer, debug_sampled, render_metrics
+
+import logging
 import random
 
 
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Shared by the sync views below and their async versions (async_views.py)
+# ----------------------------------------------------------------------
+MAX_QUESTIONS = 20
+
+
+def sample_quiz(quiz, index, limit):
+    """(question_ids, passage_ids, dataset_ids) for one sitting of ``quiz``."""
+    passage_ids, dataset_ids = [], []
+
+    # Handle VERBAL → Reading Comprehension special logic
+    if quiz.quiz_type == 'VER' and index.quiz_passages.get(quiz.id):
+        # ✅ Reading comprehension version: 2 passages × 5 Qs
+        passage_ids, question_ids = index.sample_groups(
+            index.quiz_passages[quiz.id], index.passage_questions, groups=2, per_group=5
+        )
+
+    # Handle NUMERICAL → Data Analysis special logic
+    elif quiz.quiz_type == 'NUM' and index.quiz_datasets.get(quiz.id):
+        # ✅ Data analysis version: 2 datasets × 5 Qs
+        dataset_ids, question_ids = index.sample_groups(
+            index.quiz_datasets[quiz.id], index.dataset_questions, groups=2, per_group=5
+        )
+
+    # ANA, CLE, GEN (and VER / NUM without passages / datasets)
+    # → simple standalone question sampling
+    else:
+        question_ids = index.sample_standalone(quiz.id, limit)
+
+    # ✅ Hard limit (safety cap); the rows are loaded with one id__in query
+    return question_ids[:MAX_QUESTIONS], passage_ids, dataset_ids
+
+
+def log_quiz_sampled(quiz):
+    if debug_sampled(logger):
+        logger.debug("quiz sampled", extra={"fields": {
+            "quiz_id": quiz.id,
+            "quiz_type": quiz.quiz_type,
+            "questions": len(quiz.sampled_questions),
+            "passages": len(quiz.randomized_passages),
+            "datasets": len(quiz.randomized_datasets),
+        }})
+
+
+def parse_answers(answers):
+    """{question_id: choice_id} from the submitted answers, skipping malformed entries."""
+    # normalize keys and values to ints (frontend may send strings)
+    parsed = {}
+    for a in answers:
+        q = a.get("question")
+        c = a.get("choice")
+        if q is None or c is None:
+            continue
+        try:
+            parsed[int(q)] = int(c)
+        except (ValueError, TypeError):
+            # skip malformed entries
+            continue
+    return parsed
+
+
+def grade_quiz(question_ids, answer_key, user_answers):
+    """(correct, details, answered) of a quiz-mode submission (answer key only, no queries)."""
+    correct_answers = 0
+    details = []
+    for qid in question_ids:
+        entry = answer_key[qid]
+        choice_id = user_answers.get(qid)
+        if choice_id:
+            if choice_id in entry["choices"]:
+                is_correct = choice_id == entry["correct"]
+                result = "correct" if is_correct else "wrong"
+                your_answer = entry["choices"][choice_id]
+                if is_correct:
+                    correct_answers += 1
+            else:
+                result = "invalid_choice"
+                your_answer = "Invalid choice"
+        else:
+            result = "unanswered"
+            your_answer = "No answer selected"
+
+        details.append({
+            "id": qid,
+            "question": entry["text"],
+            "your_answer": your_answer,
+            "result": result,
+            "explanation": entry["explanation"],
+        })
+
+    answered_count = sum(1 for qid in question_ids if qid in user_answers)
+    return correct_answers, details, answered_count
+
+
+def incomplete_submission(quiz, question_ids, user_answers, answered_count):
+    """The 400 for a submission that leaves questions unanswered."""
+    total_questions = len(question_ids)
+    if debug_sampled(logger):
+        logger.debug("incomplete submission", extra={"fields": {
+            "quiz_id": quiz.id,
+            "quiz_type": quiz.quiz_type,
+            "displayed": total_questions,
+            "answered": answered_count,
+            "missing": [qid for qid in question_ids if qid not in user_answers],
+        }})
+
+    return Response(
+        {"error": f"Please answer all questions before submitting. ({answered_count}/{total_questions})"},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def log_quiz_graded(debug_info, answered_count, score, correct, total):
+    if debug_sampled(logger):
+        logger.debug("quiz graded", extra={"fields": {
+            **debug_info,
+            "answered": answered_count,
+            "score": score,
+            "correct": correct,
+            "total": total,
+        }})
+
+
+def score_of(correct, total):
+    return round((correct / total) * 100, 2) if total > 0 else 0
+
+
+def quiz_debug_info(quiz, session_question_ids, question_ids, user_answers):
+    # Counts come from the sampling index
+    index = get_sampling_index()
+    return {
+        "quiz_id": quiz.id,
+        "quiz_type": quiz.quiz_type,
+        "session_question_ids": session_question_ids,
+        "checked_question_ids": question_ids,
+        "answered_question_ids": list(user_answers.keys()),
+        "standalone_count": len(index.standalone.get(quiz.id, ())),
+        "passage_count": len(index.quiz_passages.get(quiz.id, ())),
+        "dataset_count": len(index.quiz_datasets.get(quiz.id, ())),
+    }
+
+
+def sample_random_quiz(quiz_type, index, seen=None):
+    """
+    One random exam of ``quiz_type``: standalone question IDs spread over
+    the type's quizzes plus, for VER / NUM, one passage / dataset and its
+    first five questions. Questions in ``seen`` (the user's seen set, see
+    ``seen_questions.py``) are only used when there are not enough others.
+    Returns a dict of IDs (and ``per_quiz``).
+    """
+    quiz_ids = index.type_quizzes.get(quiz_type)
+    total_quizzes = len(quiz_ids)
+    sample = {"standalone_ids": [], "group_question_ids": [], "passage_id": None, "dataset_id": None}
+    standalone_ids = sample["standalone_ids"]
+
+    # ============================================================
+    # VERBAL (PASSAGE MODE)
+    # ============================================================
+    if quiz_type == "VER":
+        # Pick one random passage (first 5 questions of it)
+        passage_id = index.pick_group(index.type_passages.get(quiz_type), index.passage_questions, 5, seen)
+        if passage_id:
+            sample["passage_id"] = passage_id
+            sample["group_question_ids"] = list(index.passage_questions.get(passage_id, ())[:5])
+
+        # Standalone questions, never the passage-linked ones
+        per_quiz = max(1, 25 // total_quizzes)
+        for quiz_id in quiz_ids:
+            standalone_ids.extend(index.sample_quiz_questions(quiz_id, per_quiz, exclude="passage", seen=seen))
+
+        # Shuffle standalone and combine with passage questions
+        standalone_ids[:] = standalone_ids[:15]
+        random.shuffle(standalone_ids)
+
+    # ============================================================
+    # NUMERICAL (DATASET MODE)
+    # ============================================================
+    elif quiz_type == "NUM":
+        # Pick one random dataset (first 5 questions of it)
+        dataset_id = index.pick_group(index.type_datasets.get(quiz_type), index.dataset_questions, 5, seen)
+        if dataset_id:
+            sample["dataset_id"] = dataset_id
+            sample["group_question_ids"] = list(index.dataset_questions.get(dataset_id, ())[:5])
+
+        # Standalone questions, never the dataset-linked ones
+        per_quiz = max(1, 15 // total_quizzes)
+        for quiz_id in quiz_ids:
+            standalone_ids.extend(index.sample_quiz_questions(quiz_id, per_quiz, exclude="dataset", seen=seen))
+
+        standalone_ids[:] = standalone_ids[:15]
+        random.shuffle(standalone_ids)
+
+    # ============================================================
+    # OTHER TYPES - SIMPLE RANDOM
+    # ============================================================
+    else:
+        per_quiz = max(1, 20 // total_quizzes)
+        for quiz_id in quiz_ids:
+            standalone_ids.extend(index.sample_quiz_questions(quiz_id, per_quiz, seen=seen))
+        standalone_ids[:] = standalone_ids[:20]
+
+    sample["per_quiz"] = per_quiz
+    return sample
+
+
+def random_quiz_payload(request, quiz_type, sample, questions, passage, dataset):
+    """Serialized random exam (without the exam token)."""
+    context = {"request": request}
+    passage_data = PassageSerializer(passage, context=context).data if passage else None
+    dataset_data = DataSetSerializer(dataset, context=context).data if dataset else None
+
+    # ============================================================
+    # SERIALIZE QUESTIONS
+    # ============================================================
+    if passage_data or dataset_data:
+        # Only serialize standalone questions at top level
+        standalone_set = set(sample["standalone_ids"])
+        top_level = [q for q in questions if q.id in standalone_set]
+    else:
+        top_level = questions
+    serialized_questions = QuestionSerializer(top_level, many=True, context=context).data
+
+    return {
+        "mode": "random_by_type",
+        "quiz_type": quiz_type,
+        "delivered": len(questions),
+        "has_passage": bool(passage_data),
+        "has_dataset": bool(dataset_data),
+        "passage": passage_data,
+        "datasets": [dataset_data] if dataset_data else [],
+        "questions": serialized_questions
+    }
+
+
+def log_random_sampled(payload, per_quiz):
+    if debug_sampled(logger):
+        logger.debug("random quiz sampled", extra={"fields": {
+            "quiz_type": payload["quiz_type"],
+            "per_quiz": per_quiz,
+            "questions": payload["delivered"],
+            "has_passage": payload["has_passage"],
+            "has_dataset": payload["has_dataset"],
+        }})
+
+
+def grade_random(question_ids, answer_key, answer_map):
+    """(correct, details) of a random-mode submission."""
+    correct = 0
+    details = []
+    for qid in question_ids:
+        entry = answer_key.get(qid)
+        if not entry or entry["correct"] is None:
+            continue
+
+        selected_choice_id = answer_map.get(qid)
+        is_correct = selected_choice_id == entry["correct"]
+        if is_correct:
+            correct += 1
+
+        your_answer = None
+        if selected_choice_id:
+            your_answer = entry["choices"].get(selected_choice_id, "N/A")
+        else:
+            your_answer = "No answer"
+
+        details.append({
+            "id": qid,
+            "question": entry["text"],
+            "your_answer": your_answer,
+            "correct_answer": entry["choices"][entry["correct"]],
+            "result": "Correct" if is_correct else "Wrong",
+            "explanation": entry["explanation"] or "No explanation provided.",
+        })
+    return correct, details
+
+
+def random_quiz_for(quiz_type):
+    """The pseudo "Random Quiz" that random-mode results of a type link to."""
+    # Create or reuse a "Random Quiz" entry for this type
+    quiz_obj, _ = Quiz.objects.get_or_create(
+        title="Random Quiz",
+        quiz_type=quiz_type,
+        defaults={"description": "Auto-generated random quiz set.",
+                  "is_random": True,},
+    )
+    return quiz_obj
 
+
+@conditional_catalog
 class QuizListAPIView(generics.ListAPIView):
     queryset = Quiz.objects.filter(is_random=False)
     serializer_class = QuizSerializer
+    # The catalog is the same for everyone: no token lookup before a 304
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
     def get_queryset(self):
         queryset = Quiz.objects.all()
@@ -32,7 +344,7 @@ class QuizListAPIView(generics.ListAPIView):
         if time_only == 'true':
             queryset = queryset.exclude(time_limit=0)
 
-        return queryset
+        return plan_quiz_queryset(queryset)
 
 
 class QuizDetailAPIView(generics.RetrieveAPIView):
@@ -55,87 +367,36 @@ class QuizDetailAPIView(generics.RetrieveAPIView):
             return self._cached_quiz
 
         quiz = super().get_object()
-        quiz_type = quiz.quiz_type
-
-        # Initialize dynamic attributes
-        quiz.sampled_questions = []
-        quiz.randomized_passages = []
-        quiz.randomized_datasets = []
-
-        # Handle ANA, CLE, GEN → simple standalone question sampling
-        if quiz_type in ['ANA', 'CLE', 'GEN']:
-            questions = list(
-                quiz.questions.filter(passage__isnull=True, dataset__isnull=True)
-            )
-            random.shuffle(questions)
-            quiz.sampled_questions = questions[: self.QUESTION_LIMITS[quiz_type]]
-
-        # Handle VERBAL → Reading Comprehension special logic
-        elif quiz_type == 'VER':
-            passages = list(quiz.passages.all())
+        question_ids, passage_ids, dataset_ids = sample_quiz(
+            quiz, get_sampling_index(), self.QUESTION_LIMITS.get(quiz.quiz_type, 20)
+        )
+        quiz.randomized_passages = fetch_passages(passage_ids)
+        quiz.randomized_datasets = fetch_datasets(dataset_ids)
+        quiz.sampled_questions = fetch_questions(question_ids)
+        log_quiz_sampled(quiz)
 
-            # ✅ Reading comprehension version
-            if passages:
-                random.shuffle(passages)
-                selected_passages = passages[:2]  # pick 2 passages only
-                quiz.randomized_passages = selected_passages
-
-                passage_questions = []
-                for p in selected_passages:
-                    qset = list(p.questions.all())
-                    random.shuffle(qset)
-                    passage_questions.extend(qset[:5])  # 5 Qs per passage
+        self._cached_quiz = quiz
+        return quiz
 
-                quiz.sampled_questions = passage_questions
+    def retrieve(self, request, *args, **kwargs):
+        stages = StageTimer("quiz_detail")
+        # A pre-generated variant when the quiz's pool is ready (exam_pools.py)
+        pooled = pooled_exam("quiz", kwargs["pk"], request)
+        if pooled is not None:
+            stages.lap("pool")
+            return Response(pooled)
 
-            else:
-                # fallback to standalone verbal questions
-                standalone = list(
-                    quiz.questions.filter(passage__isnull=True, dataset__isnull=True)
-                )
-                random.shuffle(standalone)
-                quiz.sampled_questions = standalone[: self.QUESTION_LIMITS[quiz_type]]
-
-        # Handle NUMERICAL → Data Analysis special logic
-        elif quiz_type == 'NUM':
-            datasets = list(quiz.datasets.all())
-
-            # ✅ Data analysis version
-            if datasets:
-                random.shuffle(datasets)
-                selected_datasets = datasets[:2]
-                quiz.randomized_datasets = selected_datasets
-
-                dataset_questions = []
-                for d in selected_datasets:
-                    qset = list(d.questions.all())
-                    random.shuffle(qset)
-                    dataset_questions.extend(qset[:5])  # 5 Qs per dataset
-
-                quiz.sampled_questions = dataset_questions
+        quiz = self.get_object()
+        stages.lap("sample")
 
-            else:
-                # fallback to standalone analytical questions
-                standalone = list(
-                    quiz.questions.filter(passage__isnull=True, dataset__isnull=True)
-                )
-                random.shuffle(standalone)
-                quiz.sampled_questions = standalone[: self.QUESTION_LIMITS[quiz_type]]
-
-        # ✅ Hard limit (safety cap)
-        MAX_QUESTIONS = 20
-        quiz.sampled_questions = quiz.sampled_questions[:MAX_QUESTIONS]
-
-        print("📘 QUIZ MODE 1 DEBUG ------------------------------")
-        print(f"Quiz: {quiz.title}")
-        print(f"Type: {quiz.get_quiz_type_display()}")
-        print(f"Total questions delivered: {len(quiz.sampled_questions)}")
-        print(f"Passages included: {len(quiz.randomized_passages)}")
-        print(f"Datasets included: {len(quiz.randomized_datasets)}")
-        print("--------------------------------------------------")
+        data = self.get_serializer(quiz).data
+        stages.lap("serialize")
 
-        self._cached_quiz = quiz
-        return quiz
+        # Sign exactly what was delivered; submission grades this set only
+        data["exam_token"] = issue_exam_token(collect_question_ids(data), quiz=quiz)
+        stages.lap("sign")
+        mark_wanted("quiz", quiz.id)
+        return Response(data)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -148,30 +409,33 @@ class QuizDetailAPIView(generics.RetrieveAPIView):
         return context
 
 
+@conditional_snapshot
 class QuizGroupedAPIView(APIView):
     """Return quizzes grouped by quiz_type with readable labels."""
 
+    authentication_classes = []
     permission_classes = [AllowAny]
 
     def get(self, request):
-        grouped = []
+        # Same bytes for everyone: served from the pre-rendered snapshot
+        if request.accepted_renderer.format == "json":
+            return snapshot_response(request, "grouped")
+        return Response(grouped_payload())
 
-        for code, label in Quiz.QUIZ_TYPES:
-            quizzes = Quiz.objects.filter(quiz_type=code)
-            serialized = QuizSerializer(quizzes, many=True).data
 
-            grouped.append({
-                "code": code,
-                "label": label,
-                "quizzes": serialized,
-                "count": quizzes.count()
-            })
 
-        return Response({
-            "groups": grouped,
-            "total": Quiz.objects.count()
-        })
+@conditional_catalog
+class QuizSummaryAPIView(APIView):
+    """
+    Light catalog for the home and quiz-type pages: per-quiz counts and
+    per-type totals, no questions. Example: GET /api/quizzes/summary/
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
+    def get(self, request):
+        return Response(summary_payload())
 
 
 class QuizSubmissionAPIView(APIView):
@@ -182,8 +446,10 @@ class QuizSubmissionAPIView(APIView):
         Handles quiz submission and scoring. Supports all quiz types:
         - Regular quizzes (20 questions)
         - Reading comprehension / data analysis (10 questions = 2 passages × 5)
-        - Uses `visible_questions` sent from frontend to ensure 1:1 match.
+        - Grades exactly the questions recorded in the signed `exam_token`
+          handed out by the detail endpoint.
         """
+        stages = StageTimer("quiz_submit")
 
         # 🧱 Step 1 — Validate Quiz
         try:
@@ -192,188 +458,54 @@ class QuizSubmissionAPIView(APIView):
             return Response({"error": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # 🧠 Step 2 — Parse Submitted Answers
-        answers = request.data.get("answers", [])
-        # normalize keys and values to ints (frontend may send strings)
-        user_answers = {}
-        for a in answers:
-            q = a.get("question")
-            c = a.get("choice")
-            if q is None or c is None:
-                continue
-            try:
-                user_answers[int(q)] = int(c)
-            except (ValueError, TypeError):
-                # skip malformed entries
-                continue
-
-        # # 🧩 Step 3 — Identify which questions were shown to the user
-        # visible_question_ids = request.data.get("visible_questions", [])
-        # if visible_question_ids:
-        #     # ✅ Use IDs provided by frontend (most accurate)
-        #     # all_questions = list(Question.objects.filter(id__in=visible_question_ids))
-        #     # Fetch exactly the same order as the frontend and remove duplicates
-        #     question_map = {}
-        #     for qid in visible_question_ids:
-        #         try:
-        #             q = Question.objects.get(id=qid)
-        #             question_map[qid] = q
-        #         except Question.DoesNotExist:
-        #             continue
-
-        #     all_questions = list(question_map.values())
-
-        # else:
-        #     # ⚠️ Fallback to DB sampling (less accurate)
-        #     standalone_qs = quiz.questions.filter(passage__isnull=True, dataset__isnull=True).values_list("id", flat=True)
-        #     passage_qs = Question.objects.filter(passage__quiz=quiz).values_list("id", flat=True)
-        #     dataset_qs = Question.objects.filter(dataset__quiz=quiz).values_list("id", flat=True)
-        #     combined_ids = list(standalone_qs) + list(passage_qs) + list(dataset_qs)
-        #     # remove duplicates while preserving order
-        #     unique_ids = list(dict.fromkeys(combined_ids))
-        #     all_questions = list(Question.objects.filter(id__in=unique_ids)[:20])
-
-        # visible_question_ids = request.data.get("visible_questions", [])
-        # all_questions = []
-
-        # if visible_question_ids:
-        #     # Preserve order and remove duplicates
-        #     seen_ids = set()
-        #     questions_qs = Question.objects.filter(id__in=visible_question_ids).prefetch_related('choices')
-        #     question_map = {q.id: q for q in questions_qs}
-
-        #     for qid in visible_question_ids:
-        #         if qid in seen_ids:
-        #             continue
-        #         if qid in question_map:
-        #             all_questions.append(question_map[qid])
-        #             seen_ids.add(qid)
-        # else:
-        #     # Fallback for standalone / non-visible questions
-        #     standalone_qs = quiz.questions.filter(passage__isnull=True, dataset__isnull=True).values_list("id", flat=True)
-        #     passage_qs = Question.objects.filter(passage__quiz=quiz).values_list("id", flat=True)
-        #     dataset_qs = Question.objects.filter(dataset__quiz=quiz).values_list("id", flat=True)
-        #     combined_ids = list(standalone_qs) + list(passage_qs) + list(dataset_qs)
-        #     unique_ids = list(dict.fromkeys(combined_ids))
-        #     all_questions = list(Question.objects.filter(id__in=unique_ids)[:20])
-
-        # 🧩 Step 3 — Identify which questions were shown to the user
-        visible_question_ids = request.data.get("visible_questions", [])
-        if visible_question_ids:
-            # ✅ Use IDs provided by frontend (most accurate)
-            # Convert to int and remove duplicates while preserving order
-            unique_visible_ids = list(dict.fromkeys(map(int, visible_question_ids)))
-            all_questions = list(Question.objects.filter(id__in=unique_visible_ids))
-        else:
-            # ⚠️ Fallback to DB sampling (less accurate)
-            standalone_qs = quiz.questions.filter(passage__isnull=True, dataset__isnull=True).values_list("id", flat=True)
-            passage_qs = Question.objects.filter(passage__quiz=quiz).values_list("id", flat=True)
-            dataset_qs = Question.objects.filter(dataset__quiz=quiz).values_list("id", flat=True)
-
-            # Combine all question IDs and remove duplicates
-            combined_ids = list(standalone_qs) + list(passage_qs) + list(dataset_qs)
-            unique_ids = list(dict.fromkeys(combined_ids))
-            
-            # Apply hard limit for safety (20 questions max)
-            all_questions = list(Question.objects.filter(id__in=unique_ids)[:20])
-
-
-        # 🔹 DEBUGGING PRINTS 🔹
-        print("\n🛠️ DEBUG: Quiz Questions Before Evaluation ----------------")
-        print(f"Quiz ID: {quiz.id} - Type: {quiz.quiz_type}")
-        print(f"Number of visible_question_ids: {len(visible_question_ids)}")
-        print(f"visible_question_ids: {visible_question_ids}")
-        # print(f"Number of standalone questions: {len(standalone_qs)}")
-        # print(f"Number of passage questions: {len(passage_qs)}")
-        # print(f"Number of dataset questions: {len(dataset_qs)}")
-        # print(f"Combined IDs (before dedup): {combined_ids}")
-        # print(f"Unique IDs (after dedup): {unique_ids}")
-        print(f"Final all_questions count: {len(all_questions)}")
-        print(f"Question IDs in all_questions: {[q.id for q in all_questions]}")
-        print("------------------------------------------------------------\n")
-
-
-        total_questions = len(all_questions)
-        correct_answers = 0
-        details = []
-
-        # 🧮 Step 4 — Evaluate Answers
-        for question in all_questions:
-            qid = int(question.id)
-            choice_id = user_answers.get(qid)
-            if choice_id:
-                try:
-                    choice = Choice.objects.get(pk=choice_id, question=question)
-                    is_correct = choice.is_correct
-                    result = "correct" if is_correct else "wrong"
-                    your_answer = choice.text
-                    if is_correct:
-                        correct_answers += 1
-                except Choice.DoesNotExist:
-                    result = "invalid_choice"
-                    your_answer = "Invalid choice"
-            else:
-                result = "unanswered"
-                your_answer = "No answer selected"
+        user_answers = parse_answers(request.data.get("answers", []))
+        stages.lap("parse")
+
+        # 🧩 Step 3 — Questions shown to the user come from the signed exam token
+        try:
+            session = verify_exam_token(request.data.get("exam_token"), quiz=quiz)
+        except ExamTokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            details.append({
-                "id": question.id,
-                "question": question.text,
-                "your_answer": your_answer,
-                "result": result,
-                "explanation": question.explanation,
-            })
+        session_question_ids = session["questions"]
+        answer_key = get_answer_keys_for(quiz.id, session_question_ids)
+        question_ids = [qid for qid in session_question_ids if qid in answer_key]
+        stages.lap("resolve")
 
-        answered_count = len(user_answers)
+        # 🧮 Step 4 — Evaluate Answers (answer key only, no per-question queries)
+        total_questions = len(question_ids)
+        correct_answers, details, answered_count = grade_quiz(question_ids, answer_key, user_answers)
+        stages.lap("grade")
 
         # 🚨 Step 5 — Validate Completion
         if answered_count < total_questions:
-            print("\n⚠️ QUIZ VALIDATION WARNING ------------------------------")
-            print(f"Quiz: {quiz.title} ({quiz.quiz_type})")
-            print(f"Displayed questions: {total_questions}")
-            print(f"User answered: {answered_count}")
-            print(f"Missing IDs: {[q.id for q in all_questions if str(q.id) not in user_answers]}")
-            print("-----------------------------------------------------------\n")
-
-            return Response(
-                {"error": f"Please answer all questions before submitting. ({answered_count}/{total_questions})"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return incomplete_submission(quiz, question_ids, user_answers, answered_count)
 
         # 🧾 Step 6 — Compute Score
-        score = round((correct_answers / total_questions) * 100, 2)
+        score = score_of(correct_answers, total_questions)
 
         # 🗂️ Step 7 — Save Result (if authenticated)
         if request.user.is_authenticated:
             time_spent = request.data.get("time_spent", 0)
 
-            QuizResult.objects.create(
+            record_result(
                 quiz=quiz,
                 user=request.user,
+                quiz_type=quiz.quiz_type,
                 score=score,
                 correct=correct_answers,
                 total=total_questions,
                 time_spent=time_spent,
             )
+            record_seen(request.user, quiz.quiz_type, question_ids)
+        stages.lap("persist")
 
         # 🧩 Step 8 — Debug + Response
-        debug_info = {
-            "quiz_id": quiz.id,
-            "quiz_type": quiz.quiz_type,
-            "visible_question_ids": visible_question_ids,
-            "checked_question_ids": [q.id for q in all_questions],
-            "answered_question_ids": list(user_answers.keys()),
-            "standalone_count": quiz.questions.filter(passage__isnull=True, dataset__isnull=True).count(),
-            "passage_count": quiz.passages.count(),
-            "dataset_count": getattr(quiz, "datasets", []).count() if hasattr(quiz, "datasets") else 0,
-        }
-
-        print("\n📘 QUIZ SUBMISSION LOG ------------------------------")
-        print(f"Quiz: {quiz.title} ({quiz.quiz_type})")
-        print(f"User answered {answered_count}/{total_questions}")
-        print(f"Score: {score}% | Correct: {correct_answers}/{total_questions}")
-        print("------------------------------------------------------\n")
+        debug_info = quiz_debug_info(quiz, session_question_ids, question_ids, user_answers)
 
-        return Response({
+        log_quiz_graded(debug_info, answered_count, score, correct_answers, total_questions)
+
+        response = Response({
             "quiz": quiz.title,
             "quiz_type": quiz.quiz_type,
             "score": score,
@@ -382,145 +514,74 @@ class QuizSubmissionAPIView(APIView):
             "details": details,
             "debug": debug_info,
         }, status=status.HTTP_200_OK)
+        stages.lap("serialize")
+        return response
 
 
 class UserResultsAPIView(generics.ListAPIView):
     serializer_class = QuizResultSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HistoryPagination
 
     def get_queryset(self):
-        return QuizResult.objects.filter(user=self.request.user).order_by('-submitted_at')
+        # Ordered (and cut) by HistoryPagination on the (user, submitted_at, id) index
+        return QuizResult.objects.filter(user=self.request.user).select_related('quiz')
     
 
+@conditional_snapshot
 class QuizByTypeView(APIView):
-    def get(self, request):
-        quizzes = Quiz.objects.all()
-        grouped = {}
-
-        for quiz in quizzes:
-            qtype = quiz.quiz_type
-            if qtype not in grouped:
-                grouped[qtype] = []
-            grouped[qtype].append(QuizSerializer(quiz).data)
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
-        return Response(grouped)
+    def get(self, request):
+        if request.accepted_renderer.format == "json":
+            return snapshot_response(request, "by_type")
+        return Response(by_type_payload())
     
 
 class RandomizedByTypeAPIView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
+        stages = StageTimer("random_quiz")
         quiz_type = request.query_params.get("type")
         if not quiz_type:
             return Response({"error": "Missing ?type= parameter."}, status=400)
 
-        quizzes = Quiz.objects.filter(quiz_type=quiz_type)
-        if not quizzes.exists():
+        # Users with history get the pooled variant they have seen least of,
+        # or a live exam that avoids their questions
+        seen = load_seen(request.user, quiz_type) if request.user.is_authenticated else None
+        pooled = pooled_exam("type", quiz_type, request, seen=seen)
+        if pooled is not None:
+            stages.lap("pool")
+            return Response(pooled)
+
+        index = get_sampling_index()
+        if not index.type_quizzes.get(quiz_type):
             return Response({"error": f"No quizzes found for type '{quiz_type}'."}, status=404)
 
-        total_quizzes = quizzes.count()
-        final_questions = []
-        standalone_questions = []
-
-        passage_data = None
-        dataset_data = None
-
-        # ============================================================
-        # VERBAL (PASSAGE MODE)
-        # ============================================================
-        if quiz_type == "VER":
-            # Pick one random passage
-            passage_source = Passage.objects.filter(quiz__in=quizzes).order_by("?").first()
-            passage_question_ids = set()
-
-            if passage_source:
-                passage_qs = list(passage_source.questions.all()[:5])
-                passage_question_ids = {q.id for q in passage_qs}
-                passage_data = PassageSerializer(passage_source, context={"request": request}).data
-            else:
-                passage_qs = []
-
-            # Fetch standalone questions excluding passage questions
-            per_quiz = max(1, 25 // total_quizzes)
-            print("PER QUIZ VERBAL:", per_quiz)
-            for quiz in quizzes:
-                qs = (
-                    Question.objects.filter(quiz=quiz, passage__isnull=True)
-                    .exclude(id__in=passage_question_ids)
-                    .order_by("?")[:per_quiz]
-                )
-                standalone_questions.extend(qs)
-
-            # Shuffle standalone and combine with passage questions
-            standalone_only = standalone_questions[:15]
-            random.shuffle(standalone_only)
-            final_questions = standalone_only + passage_qs
-
-        # ============================================================
-        # NUMERICAL (DATASET MODE)
-        # ============================================================
-        elif quiz_type == "NUM":
-            # Pick one random dataset
-            dataset_source = DataSet.objects.filter(quiz__in=quizzes).order_by("?").first()
-            dataset_question_ids = set()
-
-            if dataset_source:
-                dataset_qs = list(dataset_source.questions.all()[:5])
-                dataset_question_ids = {q.id for q in dataset_qs}
-                dataset_data = DataSetSerializer(dataset_source, context={"request": request}).data
-            else:
-                dataset_qs = []
-
-            # Fetch standalone questions excluding dataset questions
-            per_quiz = max(1, 15 // total_quizzes)
-            for quiz in quizzes:
-                qs = (
-                    Question.objects.filter(quiz=quiz, dataset__isnull=True)
-                    .exclude(id__in=dataset_question_ids)
-                    .order_by("?")[:per_quiz]
-                )
-                standalone_questions.extend(qs)
-
-            standalone_only = standalone_questions[:15]
-            random.shuffle(standalone_only)
-            final_questions = standalone_only + dataset_qs
-
-        # ============================================================
-        # OTHER TYPES - SIMPLE RANDOM
-        # ============================================================
-        else:
-            per_quiz = max(1, 20 // total_quizzes)
-            all_qs = []
-            for quiz in quizzes:
-                qs = Question.objects.filter(quiz=quiz).order_by("?")[:per_quiz]
-                all_qs.extend(qs)
-            final_questions = list(all_qs)[:20]
-            standalone_only = final_questions  # all questions are "standalone"
-
-        # ============================================================
-        # SERIALIZE QUESTIONS
-        # ============================================================
-        if passage_data or dataset_data:
-            # Only serialize standalone questions at top level
-            serialized_questions = QuestionSerializer(standalone_only, many=True, context={"request": request}).data
-        else:
-            serialized_questions = QuestionSerializer(final_questions, many=True, context={"request": request}).data
+        sample = sample_random_quiz(quiz_type, index, seen=seen)
+        stages.lap("sample")
 
-        # ============================================================
-        # RETURN RESPONSE
-        # ============================================================
-        return Response({
-            "mode": "random_by_type",
-            "quiz_type": quiz_type,
-            "delivered": len(final_questions),
-            "has_passage": bool(passage_data),
-            "has_dataset": bool(dataset_data),
-            "passage": passage_data,
-            "datasets": [dataset_data] if dataset_data else [],
-            "questions": serialized_questions
-        })
+        # One query per model for every sampled row (choices prefetched)
+        passages = fetch_passages([sample["passage_id"]] if sample["passage_id"] else [])
+        datasets = fetch_datasets([sample["dataset_id"]] if sample["dataset_id"] else [])
+        questions = fetch_questions(sample["standalone_ids"] + sample["group_question_ids"])
+        stages.lap("resolve")
+
+        payload = random_quiz_payload(
+            request, quiz_type, sample, questions,
+            passages[0] if passages else None, datasets[0] if datasets else None,
+        )
+        stages.lap("serialize")
+
+        payload["exam_token"] = issue_exam_token(collect_question_ids(payload), quiz_type=quiz_type)
+        stages.lap("sign")
+
+        log_random_sampled(payload, sample["per_quiz"])
+        mark_wanted("type", quiz_type)
+        return Response(payload)
 
-               
 
 class RandomizedQuizSubmitAPIView(APIView):
     """
@@ -528,84 +589,41 @@ class RandomizedQuizSubmitAPIView(APIView):
     """
 
     def post(self, request):
+        stages = StageTimer("random_submit")
         answers = request.data.get("answers", [])
-        quiz_type = request.data.get("quiz_type")
-        visible_ids = request.data.get("visible_questions", [])
-
-        if not answers or not quiz_type:
+        if not answers:
             return Response({"error": "Missing required data."}, status=status.HTTP_400_BAD_REQUEST)
 
-        total = len(visible_ids)
-        correct = 0
-        details = []
+        # The signed exam token fixes the quiz type and the question set
+        try:
+            session = verify_exam_token(
+                request.data.get("exam_token"), quiz_type=request.data.get("quiz_type")
+            )
+        except ExamTokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        quiz_type = session["quiz_type"]
+        question_ids = session["questions"]
+        total = len(question_ids)
 
         # Build a mapping for submitted answers
-        answer_map = {}
-        for a in answers:
-            q = a.get("question")
-            c = a.get("choice")
-            if q is None or c is None:
-                continue
-            try:
-                answer_map[int(q)] = int(c)
-            except (ValueError, TypeError):
-                continue
-
-        # Get only visible questions
-        questions = Question.objects.filter(id__in=visible_ids).select_related('quiz', 'passage__quiz', 'dataset__quiz').prefetch_related('choices')
-
-        for q in questions:
-            selected_choice_id = answer_map.get(int(q.id))
-            correct_choice = next((c for c in q.choices.all() if c.is_correct), None)
-            if not correct_choice:
-                continue
-
-            is_correct = selected_choice_id == correct_choice.id
-            if is_correct:
-                correct += 1
-
-            your_answer = None
-            if selected_choice_id:
-                your_choice = next((c for c in q.choices.all() if c.id == selected_choice_id), None)
-                your_answer = your_choice.text if your_choice else "N/A"
-            else:
-                your_answer = "No answer"
+        answer_map = parse_answers(answers)
+        stages.lap("parse")
 
-            details.append({
-                "id": q.id,
-                "question": q.text,
-                "your_answer": your_answer,
-                "correct_answer": correct_choice.text,
-                "result": "Correct" if is_correct else "Wrong",
-                "explanation": q.explanation or "No explanation provided.",
-            })
+        # Answer keys for the session's questions (cache, no per-question queries)
+        answer_key = get_question_answer_keys(question_ids)
+        stages.lap("resolve")
 
-        score = round((correct / total) * 100, 2) if total > 0 else 0
+        correct, details = grade_random(question_ids, answer_key, answer_map)
+        score = score_of(correct, total)
+        stages.lap("grade")
 
         # ✅ Create or link a pseudo "Random Quiz" instance
         if request.user.is_authenticated:
-            type_map = {
-                "VER": "Verbal Ability",
-                "ANA": "Analytical Ability",
-                "NUM": "Numerical Ability",
-                "GEN": "General Information",
-                "CLE": "Clerical Ability",
-            }
-            quiz_title = f"Random Quiz"
-
-            # Create or reuse a "Random Quiz" entry for this type
-            quiz_obj, _ = Quiz.objects.get_or_create(
-                title=quiz_title,
-                quiz_type=quiz_type,
-                defaults={"description": "Auto-generated random quiz set.",
-                          "is_random": True,},
-                
-            )
-
             time_spent = request.data.get("time_spent", 0)
 
-            QuizResult.objects.create(
-                quiz=quiz_obj,  # ✅ now linked
+            record_result(
+                quiz=random_quiz_for(quiz_type),  # ✅ now linked
                 user=request.user,
                 quiz_type=quiz_type,
                 score=score,
@@ -613,21 +631,26 @@ class RandomizedQuizSubmitAPIView(APIView):
                 total=total,
                 time_spent=time_spent,
             )
+            record_seen(request.user, quiz_type, question_ids)
+        stages.lap("persist")
 
-        return Response({
+        response = Response({
             "quiz_type": quiz_type,
             "score": score,
             "correct": correct,
             "total": total,
             "details": details
         }, status=status.HTTP_200_OK)
+        stages.lap("serialize")
+        return response
 
 
 
 
 class RandomizedQuizResultAPIView(APIView):
     """
-    Fetch all past randomized quiz results by type for the authenticated user.
+    Fetch past quiz results by type for the authenticated user, newest
+    first, one keyset page at a time (follow ``next``).
     Example: GET /api/quizzes/random/results/?type=VER
     """
 
@@ -638,16 +661,20 @@ class RandomizedQuizResultAPIView(APIView):
         if not quiz_type:
             return Response({"error": "Missing ?type= parameter."}, status=400)
 
+        # quiz_type is stored on every result, so this stays on the
+        # (user, quiz_type, submitted_at, id) index
         results = QuizResult.objects.filter(
             user=request.user,
-            quiz__quiz_type=quiz_type
-        ).order_by('-submitted_at')
+            quiz_type=quiz_type,
+            quiz__isnull=False,
+        ).select_related('quiz')
 
-        serialized = QuizResultSerializer(results, many=True).data
+        paginator = HistoryPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        serialized = QuizResultSerializer(page, many=True).data
         return Response({
             "quiz_type": quiz_type,
-            "count": len(serialized),
-            "results": serialized
+            **paginator.get_paginated_data(serialized),
         })
 
 
@@ -655,27 +682,102 @@ class UserSummaryAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        summary = []
-        quiz_types = dict(Quiz.QUIZ_TYPES)
-
-        for code, name in quiz_types.items():
-            results = QuizResult.objects.filter(user=user, quiz_type=code)
-            if results.exists():
-                avg_score = round(sum(r.score for r in results) / len(results), 2)
-                best_score = max(r.score for r in results)
-                total_quizzes = results.count()
-            else:
-                avg_score = 0
-                best_score = 0
-                total_quizzes = 0
-
-            summary.append({
-                "code": code,
-                "name": name,
-                "average_score": avg_score,
-                "best_score": best_score,
-                "total_quizzes": total_quizzes,
-            })
-
-        return Response(summary)
\ No newline at end of file
+        # One indexed read of the running totals kept by record_result()
+        return Response(get_user_summary(request.user))
+
+
+def leaderboard_scope(params):
+    """
+    Resolve ``?quiz=<id>`` or ``?type=<code>`` to a leaderboard scope.
+    Returns (scope, error_response).
+    """
+    quiz_id = params.get("quiz")
+    quiz_type = params.get("type")
+
+    if quiz_id:
+        if not quiz_id.isdigit():
+            return None, Response({"error": "Invalid ?quiz= parameter."}, status=400)
+        return quiz_scope(int(quiz_id)), None
+    if quiz_type:
+        if quiz_type not in dict(Quiz.QUIZ_TYPES):
+            return None, Response({"error": f"Unknown quiz type '{quiz_type}'."}, status=404)
+        return type_scope(quiz_type), None
+    return None, Response({"error": "Missing ?quiz= or ?type= parameter."}, status=400)
+
+
+class ScoreRankAPIView(APIView):
+    """
+    Where a score ranks among every user's best score for a quiz or type.
+    Uses ?score= when given, otherwise the authenticated user's best.
+    Example: GET /api/quizzes/rank/?type=VER
+             GET /api/quizzes/rank/?quiz=3&score=85
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        scope, error = leaderboard_scope(request.query_params)
+        if error:
+            return error
+
+        score = request.query_params.get("score")
+        if score is not None:
+            try:
+                score = float(score)
+            except ValueError:
+                score = None
+            # Scores are percentages; "nan"/"inf" parse but cannot be bucketed
+            if score is None or not math.isfinite(score) or not 0 <= score <= 100:
+                return Response({"error": "?score= must be a number from 0 to 100."}, status=400)
+        elif request.user.is_authenticated:
+            best = BestScore.objects.filter(user=request.user, scope=scope).first()
+            if best is None:
+                return Response({"error": "No results yet for this leaderboard."}, status=404)
+            score = best.score
+        else:
+            return Response({"error": "Log in or pass ?score= to look up a rank."}, status=400)
+
+        return Response({"scope": scope, "score": score, **rank_in(histogram(scope), score)})
+
+
+class LeaderboardAPIView(generics.ListAPIView):
+    """
+    Paginated best scores for a quiz or quiz type, highest first.
+    Example: GET /api/quizzes/leaderboard/?type=VER&page=2
+    """
+
+    permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        scope, error = leaderboard_scope(request.query_params)
+        if error:
+            return error
+
+        page = self.paginate_queryset(LeaderboardEntries(scope))
+        offset = (self.paginator.page.number - 1) * self.paginator.page.paginator.per_page
+
+        rows, previous = [], None
+        for position, entry in enumerate(page, start=offset + 1):
+            # Equal scores share a rank (within the page)
+            rank = previous["rank"] if previous and previous["score"] == entry.score else position
+            previous = {
+                "rank": rank,
+                "username": entry.user.username,
+                "score": entry.score,
+                "achieved_at": entry.achieved_at,
+            }
+            rows.append(previous)
+
+        return self.get_paginated_response(rows)
+
+
+@require_GET
+def metrics(request):
+    """
+    Stage latency histograms of this process in Prometheus text format.
+    Open unless ``METRICS_TOKEN`` is set; then scrape with a bearer token.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Result
-from quizzes.models import Quiz, Question, Choice
+from quizzes.models import Quiz
 
 class ResultSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,18 +28,16 @@ class SubmitQuizSerializer(serializers.Serializer):
         quiz = validated_data['quiz']
         answers = validated_data['answers']
 
-        total_questions = quiz.questions.count()
+        questions = list(quiz.questions.prefetch_related('choices'))
+        total_questions = len(questions)
         correct = 0
 
-        for question in quiz.questions.all():
+        for question in questions:
             selected_choice_id = answers.get(str(question.id))
             if selected_choice_id:
-                try:
-                    choice = question.choices.get(id=selected_choice_id)
-                    if choice.is_correct:
-                        correct += 1
-                except Choice.DoesNotExist:
-                    pass
+                choice = next((c for c in question.choices.all() if c.id == selected_choice_id), None)
+                if choice and choice.is_correct:
+                    correct += 1
 
         score = (correct / total_questions) * 100 if total_questions > 0 else 0
 
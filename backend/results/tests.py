@@ -1,3 +1,33 @@
-from django.test import TestCase
+from django.test import override_settings
 
-# Create your tests here.
+from quizzes.models import Quiz, Choice
+from quizzes.testing import BankTestCase
+from results.models import Result
+
+
+class ResultRouteTests(BankTestCase):
+
+    @override_settings(ROOT_URLCONF="results.urls")
+    def test_list_and_create(self):
+        # /api/results/ itself is served by api.urls; exercise results.urls directly
+        quiz = Quiz.objects.first()
+        self.call(
+            "POST / [results.urls]", "/",
+            {"quiz": quiz.id, "score": 80, "total_questions": 10}, status=201,
+        )
+        response = self.call("GET / [results.urls]", "/")
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_submit(self):
+        self.authenticate()
+        quiz = Quiz.objects.get(title="Geography")
+        answers = {
+            str(c.question_id): c.id
+            for c in Choice.objects.filter(question__quiz=quiz, is_correct=True)
+        }
+        response = self.call("POST /api/results/submit/", data={"quiz_id": quiz.id, "answers": answers}, status=201)
+        self.assertEqual(response.json()["score"], 100.0)
+        self.assertEqual(Result.objects.get().user, self.user)
+
+    def test_submit_unknown_quiz(self):
+        self.call("POST /api/results/submit/", data={"quiz_id": 0, "answers": {}}, status=400)
@@ -8,3 +8,8 @@ class UsersConfig(AppConfig):
     def ready(self):
         # Import signals so they are registered
         import users.signals  # noqa: F401
+
+        # Export the JWT user cache counters at /metrics
+        from quizzes.metrics import REGISTRY
+        from users.authentication import UserCacheMetrics
+        REGISTRY.append(UserCacheMetrics())
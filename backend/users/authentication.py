@@ -0,0 +1,149 @@
+# users/authentication.py
+"""
+JWT authentication with a per-process user cache.
+
+``JWTAuthentication`` loads the ``User`` row on every authenticated
+request. ``CachedJWTAuthentication`` keeps resolved users in a bounded
+LRU with a TTL (``AUTH_USER_CACHE_SIZE`` / ``AUTH_USER_CACHE_TTL``, the
+latter no longer than an access token lives), keyed by the user ID and
+the user's version: a counter in the Django cache (see
+``quizzes/cache_versions.py``) that ``users/signals.py`` bumps whenever
+the User or its Profile is saved or deleted. A bump also drops the local
+entry at once; other processes miss on their next lookup, through the
+shared version, when the cache backend is shared.
+
+A hit does no SQL: one cache read for the version and a shallow copy of
+the cached user, so views can set attributes on ``request.user`` without
+touching the shared instance. ``user_cache_stats()`` reports hits,
+misses and the hit ratio; they are also exported at ``/metrics``.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from backend.routers import note_user
+from quizzes.cache_versions import get_version, bump_version
+
+
+def _version_name(user_id):
+    return f"user:{user_id}"
+
+
+class UserCache:
+    """Bounded LRU of users with a TTL, safe across threads."""
+
+    def __init__(self, max_size=10000, ttl=300, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # user_id -> (version, expires_at, user)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or entry[1] <= self.clock():
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return entry[2]
+
+    def put(self, user_id, version, user):
+        with self._lock:
+            self._entries[user_id] = (version, self.clock() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def discard(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, "AUTH_USER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "AUTH_USER_CACHE_TTL", 300),
+)
+
+
+def invalidate_user(user_id):
+    """Forget ``user_id`` here, and (through its version) in every process."""
+    bump_version(_version_name(user_id))
+    user_cache.discard(user_id)
+
+
+def user_cache_stats():
+    """Hits, misses, evictions, invalidations, size and hit ratio of this process."""
+    return user_cache.snapshot()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` whose user lookup goes through ``user_cache``."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        note_user(user_id)  # read-your-writes: a user who just wrote reads from the primary
+        version = get_version(_version_name(user_id))
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)  # the DB lookup and every check
+            user_cache.put(user_id, version, user)
+            return copy.copy(user)
+
+        # The per-token checks still run on a hit (the cached user may be
+        # shared by several tokens)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return copy.copy(user)
+
+
+class UserCacheMetrics:
+    """``/metrics`` collector for the user cache (see ``quizzes/metrics.py``)."""
+
+    def render(self):
+        stats = user_cache_stats()
+        lines = []
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            lines += [
+                f"# TYPE auth_user_cache_{name}_total counter",
+                f"auth_user_cache_{name}_total {stats[name]}",
+            ]
+        lines += [
+            "# TYPE auth_user_cache_size gauge",
+            f"auth_user_cache_size {stats['size']}",
+            "# TYPE auth_user_cache_hit_ratio gauge",
+            f"auth_user_cache_hit_ratio {stats['hit_ratio']}",
+        ]
+        return "\n".join(lines) + "\n"
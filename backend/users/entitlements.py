@@ -0,0 +1,83 @@
+# users/entitlements.py
+"""
+Premium entitlement carried in the JWT.
+
+Tokens issued at login (password or Google) and on premium activation
+carry two claims:
+
+    "premium":       True when the profile was premium at issue time
+    "premium_until": expiry as a UNIX timestamp (None: open-ended)
+
+``request_premium(request)`` answers "is this user premium now?" from
+those claims and the clock alone, so entitlement checks do not read
+(or write) the Profile. A premium that lapses while a token is live
+stops counting at ``premium_until``; the ``expire_premiums`` command
+clears the flag in the database with one bulk UPDATE.
+
+A token refresh re-reads the profile and sets the claims afresh on the
+new access token and the rotated refresh token
+(``PremiumTokenRefreshView``), so a change made elsewhere (e.g. in the
+admin, or by ``expire_premiums``) reaches the client within one access
+token lifetime; activation hands out new tokens itself.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+PREMIUM_CLAIM = "premium"
+PREMIUM_UNTIL_CLAIM = "premium_until"
+
+
+def profile_is_premium(profile, now=None):
+    """Effective premium state of a profile (None: not premium), see ``Profile.check_premium_status``."""
+    return profile is not None and profile.check_premium_status(now)
+
+
+def get_profile(user):
+    # The signals create a profile with every user; never create one on a read
+    try:
+        return user.profile
+    except ObjectDoesNotExist:
+        return None
+
+
+def add_premium_claims(token, user):
+    profile = get_profile(user)
+    until = profile.premium_until if profile and profile.is_premium else None
+    token[PREMIUM_CLAIM] = profile_is_premium(profile)
+    token[PREMIUM_UNTIL_CLAIM] = int(until.timestamp()) if until else None
+    return token
+
+
+def tokens_for(user):
+    """A refresh token (and, through it, an access token) with premium claims."""
+    return add_premium_claims(RefreshToken.for_user(user), user)
+
+
+def claims_are_premium(claims, now=None):
+    if not claims.get(PREMIUM_CLAIM):
+        return False
+    until = claims.get(PREMIUM_UNTIL_CLAIM)
+    return until is None or until > (now or timezone.now()).timestamp()
+
+
+def premium_until(claims):
+    until = claims.get(PREMIUM_UNTIL_CLAIM)
+    return datetime.fromtimestamp(until, tz=dt_timezone.utc) if until else None
+
+
+def request_premium(request):
+    """
+    (is_premium, premium_until) of the caller from its access token. Tokens
+    issued before the claims existed fall back to reading the profile.
+    """
+    token = getattr(request, "auth", None)
+    if token is not None and PREMIUM_CLAIM in token:
+        return claims_are_premium(token), premium_until(token)
+    profile = get_profile(request.user)
+    if not profile_is_premium(profile):
+        return False, None
+    return True, profile.premium_until
@@ -0,0 +1,245 @@
+# users/google_keys.py
+"""
+Local verification of Google ID tokens with a cached key set.
+
+``id_token.verify_oauth2_token`` downloads Google's signing certificates
+on every call, so each Google login paid an HTTPS round trip (and failed
+when googleapis.com was slow). Google publishes how long the keys stay
+valid in the ``Cache-Control: max-age`` of the certs response; this
+module keeps them that long:
+
+* ``HTTPKeySource`` fetches the certs over one pooled ``requests.Session``
+  and reports the max-age (minus ``Age``);
+* ``CachedKeySet`` serves the cached keys, refreshes them in a background
+  thread once they are within ``REFRESH_MARGIN`` of expiry, fetches
+  inline only when it has nothing usable, and refetches (rate-limited)
+  when a token names a key id it has not seen, i.e. Google rotated early;
+* ``verify_google_id_token`` checks the signature, expiry, audience and
+  issuer locally with ``google.auth.jwt``.
+
+The key source is pluggable: ``GOOGLE_KEY_SOURCE`` names a callable that
+returns one, and ``set_key_source()`` swaps it at runtime (the tests use a
+``StaticKeySource`` with a locally generated key, no network).
+"""
+import logging
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.auth import exceptions as google_exceptions, jwt
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+DEFAULT_MAX_AGE = 3600     # when the response carries no usable max-age
+REFRESH_MARGIN = 300       # refresh in the background this long before expiry
+RETRY_SECONDS = 60         # after a failed fetch, or between unknown-kid refetches
+FETCH_TIMEOUT = 5
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class KeyFetchError(Exception):
+    """The signing keys could not be fetched and none are cached."""
+
+
+class WrongAudienceError(ValueError):
+    """A valid Google token issued to another client ID."""
+
+
+def cache_lifetime(headers, default=DEFAULT_MAX_AGE):
+    """Seconds the response may be cached: max-age minus Age."""
+    match = _MAX_AGE.search(headers.get("Cache-Control", ""))
+    if not match:
+        return default
+    try:
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+# ----------------------------------------------------------------------
+# Key sources: fetch() -> ({key id: PEM certificate}, max_age_seconds)
+# ----------------------------------------------------------------------
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """One pooled session for every fetch of this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+        return _session
+
+
+class HTTPKeySource:
+    """Google's x509 certs endpoint."""
+
+    def __init__(self, url=None, timeout=FETCH_TIMEOUT):
+        self.url = url or getattr(settings, "GOOGLE_CERTS_URL", GOOGLE_CERTS_URL)
+        self.timeout = timeout
+
+    def fetch(self):
+        try:
+            response = http_session().get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json(), cache_lifetime(response.headers)
+        except (requests.RequestException, ValueError) as e:
+            raise KeyFetchError(f"Could not fetch {self.url}: {e}") from e
+
+
+class StaticKeySource:
+    """A fixed key set, e.g. a test key pair."""
+
+    def __init__(self, certs, max_age=DEFAULT_MAX_AGE):
+        self.certs = dict(certs)
+        self.max_age = max_age
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return dict(self.certs), self.max_age
+
+
+# ----------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------
+class CachedKeySet:
+    """Keys of one source, kept for their max-age and refreshed ahead of it."""
+
+    def __init__(self, source, refresh_margin=REFRESH_MARGIN, clock=time.monotonic):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.certs = {}
+        self.expires_at = 0.0
+        self.next_attempt = 0.0   # no fetch before this (after failures / forced refetches)
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        # Caller holds self._lock
+        try:
+            certs, max_age = self.source.fetch()
+        except KeyFetchError:
+            self.next_attempt = self.clock() + RETRY_SECONDS
+            raise
+        now = self.clock()
+        self.certs, self.expires_at = certs, now + max_age
+        self.next_attempt = now
+        return certs
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with self._lock:
+                    self._fetch()
+            except KeyFetchError:
+                logger.warning("Background refresh of Google signing keys failed", exc_info=True)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="google-keys-refresh", daemon=True).start()
+
+    def get(self):
+        """The current {key id: certificate}; fetches inline only when none is usable."""
+        now = self.clock()
+        if self.certs and now < self.expires_at:
+            if now >= self.expires_at - self.refresh_margin and now >= self.next_attempt:
+                self._refresh_in_background()
+            return self.certs
+
+        with self._lock:
+            if self.certs and self.clock() < self.expires_at:
+                return self.certs  # another thread fetched while we waited
+            if self.certs and self.clock() < self.next_attempt:
+                return self.certs  # expired, but the source failed moments ago: keep serving
+            try:
+                return self._fetch()
+            except KeyFetchError:
+                if self.certs:
+                    logger.warning("Serving expired Google signing keys", exc_info=True)
+                    return self.certs
+                raise
+
+    def get_for(self, key_id):
+        """Like ``get()``, refetching once (rate-limited) if ``key_id`` is unknown."""
+        certs = self.get()
+        if key_id is None or key_id in certs:
+            return certs
+        with self._lock:
+            if key_id not in self.certs and self.clock() >= self.next_attempt:
+                try:
+                    self._fetch()
+                except KeyFetchError:
+                    logger.warning("Refetch of Google signing keys failed", exc_info=True)
+                self.next_attempt = self.clock() + RETRY_SECONDS
+            return self.certs
+
+
+_keyset = None
+_keyset_lock = threading.Lock()
+
+
+def get_keyset():
+    global _keyset
+    with _keyset_lock:
+        if _keyset is None:
+            factory = import_string(getattr(settings, "GOOGLE_KEY_SOURCE", "users.google_keys.HTTPKeySource"))
+            _keyset = CachedKeySet(factory())
+        return _keyset
+
+
+def set_key_source(source):
+    """
+    Replace the key source and drop the cached keys; ``None`` goes back to
+    ``GOOGLE_KEY_SOURCE``. Returns the new key set (or None).
+    """
+    global _keyset
+    with _keyset_lock:
+        _keyset = CachedKeySet(source) if source is not None else None
+        return _keyset
+
+
+# ----------------------------------------------------------------------
+# Verification
+# ----------------------------------------------------------------------
+def verify_google_id_token(token, audience, clock_skew_in_seconds=10):
+    """
+    Decoded claims of a Google ID token. Raises ``ValueError`` for a bad
+    token (``WrongAudienceError`` when it was issued to another client) and
+    ``KeyFetchError`` when no signing keys can be had.
+    """
+    try:
+        key_id = jwt.decode_header(token).get("kid")
+    except (google_exceptions.GoogleAuthError, ValueError, TypeError) as e:
+        raise ValueError(f"Malformed token: {e}") from e
+
+    certs = get_keyset().get_for(key_id)
+    try:
+        claims = jwt.decode(token, certs=certs, clock_skew_in_seconds=clock_skew_in_seconds)
+    except google_exceptions.GoogleAuthError as e:
+        raise ValueError(str(e)) from e
+
+    if claims.get("aud") != audience:
+        raise WrongAudienceError(f"Wrong audience: {claims.get('aud')!r}")
+
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {claims.get('iss')!r}")
+    return claims
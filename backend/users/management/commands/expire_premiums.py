@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.transactions import retry_on_lock
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Clears ``is_premium`` on every profile whose ``premium_until`` has passed,
+    in one UPDATE on the (is_premium, premium_until) index. Reads never
+    write the profile any more; schedule this (cron, every few minutes) to
+    keep the stored flag in line with the tokens' ``premium_until`` claim.
+
+    Run:
+        python manage.py expire_premiums
+        python manage.py expire_premiums --dry-run
+    """
+
+    help = "Expire lapsed premium subscriptions in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only count the lapsed profiles.")
+
+    def handle(self, *args, **options):
+        lapsed = Profile.objects.filter(is_premium=True, premium_until__lt=timezone.now())
+
+        if options["dry_run"]:
+            self.stdout.write(f"🔎 {lapsed.count()} premium subscriptions have lapsed.")
+            return
+
+        start = time.perf_counter()
+        expired = retry_on_lock(lapsed.update)(is_premium=False)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Expired {expired} premium subscriptions in {elapsed:.1f} ms"))
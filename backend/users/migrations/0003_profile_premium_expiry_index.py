@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_auth_provider_profile_google_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_premium', 'premium_until'], name='profile_premium_expiry'),
+        ),
+    ]
@@ -5,6 +5,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 
+from backend.transactions import retry_on_lock
+
 class Profile(models.Model):
     AUTH_CHOICES = [
         ("local", "Local"),
@@ -19,6 +21,12 @@ class Profile(models.Model):
     auth_provider = models.CharField(max_length=20, choices=AUTH_CHOICES, default="local")
     google_id = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # expire_premiums: WHERE is_premium AND premium_until < now
+            models.Index(fields=["is_premium", "premium_until"], name="profile_premium_expiry"),
+        ]
+
     def activate_premium(self, days=30):
         now = timezone.now()
         if self.premium_until and self.premium_until > now:
@@ -26,12 +34,13 @@ class Profile(models.Model):
         else:
             self.premium_until = now + timedelta(days=days)
         self.is_premium = True
-        self.save()
+        # Immediate transaction, retried while SQLite is locked
+        retry_on_lock(self.save)()
 
-    def check_premium_status(self):
-        if self.premium_until and self.premium_until < timezone.now():
-            self.is_premium = False
-            self.save()
+    def check_premium_status(self, now=None):
+        # Read-only: lapsed premiums are cleared in bulk by `expire_premiums`
+        if self.premium_until and self.premium_until <= (now or timezone.now()):
+            return False
         return self.is_premium
 
     def __str__(self):
@@ -3,7 +3,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth.password_validation import validate_password
-from .models import Profile
+from .entitlements import get_profile
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -58,6 +58,9 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'is_premium']
 
     def get_is_premium(self, obj):
-        profile, _ = Profile.objects.get_or_create(user=obj)
-        return profile.check_premium_status()
+        # Views that have the caller's token pass its claims: no profile read
+        if "is_premium" in self.context:
+            return self.context["is_premium"]
+        profile = get_profile(obj)
+        return bool(profile and profile.check_premium_status())
     
\ No newline at end of file
@@ -1,8 +1,9 @@
 # users/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import Profile
+from .authentication import invalidate_user
 
 @receiver(post_save, sender=User)
 def create_or_update_profile(sender, instance, created, **kwargs):
@@ -16,3 +17,17 @@ def create_or_update_profile(sender, instance, created, **kwargs):
         except Exception:
             # In rare races profile may not exist; using get_or_create above ensures it exists
             pass
+
+
+# Cached JWT users (users/authentication.py): any change to the user or its
+# profile makes the cached copy stale
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
@@ -1,3 +1,360 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils import timezone
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt as google_jwt
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from quizzes.testing import BankTestCase, TEST_PASSWORD
+from users.google_keys import (
+    CachedKeySet, HTTPKeySource, KeyFetchError, StaticKeySource, cache_lifetime, http_session, set_key_source,
+)
+from users.authentication import CachedJWTAuthentication, UserCache, user_cache_stats
+from users.entitlements import claims_are_premium, tokens_for
+from users.models import Profile
+
+
+def make_signing_key(key_id="test-key"):
+    """A local RSA key pair: (google.auth signer, {key id: public PEM})."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id=key_id), {key_id: public_pem.decode()}
+
+
+SIGNER, CERTS = make_signing_key()
+
+
+def google_id_token(email="learner@gmail.com", sub="google-sub-1", signer=SIGNER, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com", "aud": settings.GOOGLE_CLIENT_ID,
+        "email": email, "sub": sub, "iat": now, "exp": now + 3600, **claims,
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+class AuthRouteTests(BankTestCase):
+
+    def test_register(self):
+        self.call(
+            "POST /api/users/register/",
+            data={"username": "newreviewer", "password": "N3w!Reviewer", "email": "n@example.com"},
+            status=201,
+        )
+        self.assertTrue(Profile.objects.filter(user__username="newreviewer").exists())
+
+    def test_register_rejects_weak_password(self):
+        self.call("POST /api/users/register/", data={"username": "weakling", "password": "password1"}, status=400)
+
+    def test_login(self):
+        response = self.call("POST /api/users/login/", data={"username": "reviewer", "password": TEST_PASSWORD})
+        self.assertIn("access", response.json())
+        self.assertFalse(response.json()["user"]["is_premium"])
+
+    def test_token_refresh(self):
+        refresh = RefreshToken.for_user(self.user)
+        response = self.call("POST /api/users/token/refresh/", data={"refresh": str(refresh)})
+        self.assertIn("access", response.json())
+
+    def test_dj_rest_auth_login(self):
+        self.call("POST /api/users/dj-rest-auth/login/", data={"username": "reviewer", "password": TEST_PASSWORD})
+
+    def test_dj_rest_auth_registration(self):
+        self.call(
+            "POST /api/users/dj-rest-auth/registration/",
+            data={"username": "restuser", "email": "r@example.com",
+                  "password1": "R3st!Reviewer", "password2": "R3st!Reviewer"},
+            status=201,
+        )
+
+
+class ProfileRouteTests(BankTestCase):
+
+    def test_profile(self):
+        self.authenticate()
+        response = self.call("GET /api/users/profile/")
+        self.assertEqual(response.json()["user"]["username"], "reviewer")
+
+    def test_profile_requires_auth(self):
+        self.call("GET /api/users/profile/", status=401)
+
+    def test_premium_status_and_activate(self):
+        self.authenticate()
+        self.assertFalse(self.call("GET /api/users/premium/status/").json()["is_premium"])
+        self.assertTrue(self.call("POST /api/users/premium/activate/").json()["is_premium"])
+        activated = self.call("POST /api/users/premium/activate/").json()
+        self.assertTrue(activated["is_premium"])
+
+        # The tokens handed out on activation carry the new entitlement
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {activated['access']}")
+        self.assertTrue(self.call("GET /api/users/premium/status/").json()["is_premium"])
+        self.assertTrue(self.call("GET /api/users/profile/").json()["user"]["is_premium"])
+
+
+class PremiumClaimTests(BankTestCase):
+
+    def make_premium(self, until):
+        Profile.objects.filter(user=self.user).update(is_premium=True, premium_until=until)
+        self.user.refresh_from_db()
+        self.user.profile.refresh_from_db()
+
+    def test_login_token_carries_claims(self):
+        self.make_premium(timezone.now() + timedelta(days=3))
+        response = self.call("POST /api/users/login/", data={"username": "reviewer", "password": TEST_PASSWORD})
+        access = AccessToken(response.json()["access"])
+        self.assertTrue(access["premium"])
+        self.assertEqual(access["premium_until"], int(self.user.profile.premium_until.timestamp()))
+        self.assertTrue(response.json()["user"]["is_premium"])
+
+    def test_claims_expire_with_the_clock(self):
+        until = timezone.now() + timedelta(days=3)
+        self.make_premium(until)
+        access = tokens_for(self.user).access_token
+        self.assertTrue(claims_are_premium(access))
+        self.assertFalse(claims_are_premium(access, now=until + timedelta(seconds=1)))
+
+    def test_refresh_reapplies_claims(self):
+        self.make_premium(timezone.now() + timedelta(days=3))
+        refresh = tokens_for(self.user)
+        self.assertTrue(claims_are_premium(refresh))
+
+        # Revoked elsewhere: the next refresh, and the one after it, drop the claim
+        Profile.objects.filter(user=self.user).update(is_premium=False, premium_until=None)
+        response = self.call("POST /api/users/token/refresh/", data={"refresh": str(refresh)})
+        self.assertFalse(claims_are_premium(AccessToken(response.json()["access"])))
+        rotated = RefreshToken(response.json()["refresh"])
+        self.assertFalse(claims_are_premium(rotated))
+
+        # Extended elsewhere: picked up without a new login
+        until = timezone.now() + timedelta(days=30)
+        self.make_premium(until)
+        response = self.call("POST /api/users/token/refresh/", data={"refresh": str(rotated)})
+        access = AccessToken(response.json()["access"])
+        self.assertTrue(claims_are_premium(access))
+        self.assertEqual(access["premium_until"], int(until.timestamp()))
+
+    def test_reads_do_not_write(self):
+        # Lapsed but not yet swept: reads report it, and leave the row alone
+        self.make_premium(timezone.now() - timedelta(minutes=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user).access_token}")
+
+        with self.assertNumQueries(1):  # the token's user, nothing else
+            response = self.call("GET /api/users/premium/status/")
+        self.assertFalse(response.json()["is_premium"])
+        self.assertFalse(self.call("GET /api/users/profile/").json()["user"]["is_premium"])
+        self.assertTrue(Profile.objects.get(user=self.user).is_premium)
+
+    def test_token_without_claims_reads_profile(self):
+        self.make_premium(timezone.now() + timedelta(days=3))
+        self.authenticate()  # plain RefreshToken.for_user, as issued before the claims
+        self.assertTrue(self.call("GET /api/users/premium/status/").json()["is_premium"])
+
+    def test_expire_premiums(self):
+        self.make_premium(timezone.now() - timedelta(days=1))
+        other = User.objects.create_user(username="current", password=TEST_PASSWORD)
+        Profile.objects.filter(user=other).update(is_premium=True, premium_until=timezone.now() + timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            call_command("expire_premiums", stdout=StringIO())
+        self.assertFalse(Profile.objects.get(user=self.user).is_premium)
+        self.assertTrue(Profile.objects.get(user=other).is_premium)
+
+
+class GoogleLoginRouteTests(BankTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.keys = StaticKeySource(CERTS)
+        set_key_source(self.keys)
+        self.addCleanup(set_key_source, None)
+
+    def test_creates_google_user(self):
+        response = self.call("POST /api/users/auth/google/", data={"credential": google_id_token()})
+        self.assertEqual(response.json()["user"]["auth_provider"], "google")
+        self.assertEqual(User.objects.get(email="learner@gmail.com").profile.google_id, "google-sub-1")
+
+    def test_existing_google_user(self):
+        self.call("POST /api/users/auth/google/", data={"credential": google_id_token()})
+        self.call("POST /api/users/auth/google/", data={"credential": google_id_token()})
+        self.assertEqual(User.objects.filter(email="learner@gmail.com").count(), 1)
+        self.assertEqual(self.keys.fetches, 1)  # keys cached between logins
+
+    def test_rejects_local_account_email(self):
+        self.call("POST /api/users/auth/google/", data={"credential": google_id_token(email=self.user.email)}, status=400)
+
+    def test_rejects_invalid_token(self):
+        other_signer, _ = make_signing_key()
+        with self.assertLogs("users.views_google", "ERROR"):
+            self.call("POST /api/users/auth/google/", data={"credential": "stub-token"}, status=401)
+            self.call("POST /api/users/auth/google/", data={"credential": google_id_token(signer=other_signer)}, status=401)
+            self.call("POST /api/users/auth/google/", data={"credential": google_id_token(iss="evil.example.com")}, status=401)
+            self.call("POST /api/users/auth/google/", data={"credential": google_id_token(exp=int(time.time()) - 60)}, status=401)
+
+    def test_rejects_other_client_id(self):
+        response = self.call(
+            "POST /api/users/auth/google/", data={"credential": google_id_token(aud="someone-else")}, status=400
+        )
+        self.assertEqual(response.json()["error"], "Invalid Google client ID.")
+
+    def test_keys_unavailable(self):
+        set_key_source(mock.Mock(fetch=mock.Mock(side_effect=KeyFetchError("offline"))))
+        with self.assertLogs("users.views_google", "ERROR"):
+            self.call("POST /api/users/auth/google/", data={"credential": google_id_token()}, status=503)
+
+    def test_missing_token(self):
+        self.call("POST /api/users/auth/google/", data={}, status=400)
+
+
+class CachedAuthTests(BankTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.user).access_token}")
+
+    def test_cached_user_needs_no_sql(self):
+        self.call("GET /api/users/premium/status/")  # miss: loads the user
+        with self.assertNumQueries(0):
+            self.call("GET /api/users/premium/status/")
+        stats = user_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_profile_or_user_save_invalidates(self):
+        self.call("GET /api/users/premium/status/")
+        self.user.profile.save()
+        with self.assertNumQueries(1):
+            self.call("GET /api/users/premium/status/")
+
+        self.user.is_active = False
+        self.user.save()
+        self.call("GET /api/users/premium/status/", status=401)
+
+    def test_requests_get_their_own_copy(self):
+        token = tokens_for(self.user).access_token
+        first = CachedJWTAuthentication().get_user(token)
+        first.first_name = "changed in a view"
+        second = CachedJWTAuthentication().get_user(token)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.first_name, "")
+        self.assertEqual(user_cache_stats()["hits"], 1)
+
+    def test_metrics_report_hit_ratio(self):
+        self.call("GET /api/users/premium/status/")
+        self.call("GET /api/users/premium/status/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn("auth_user_cache_hits_total 1", body)
+        self.assertIn("auth_user_cache_hit_ratio 0.5", body)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UserCacheTests(SimpleTestCase):
+
+    def test_lru_eviction(self):
+        users = UserCache(max_size=2, ttl=60)
+        users.put(1, "v", "one")
+        users.put(2, "v", "two")
+        users.get(1, "v")          # 1 is now the most recent
+        users.put(3, "v", "three")  # evicts 2
+        self.assertIsNone(users.get(2, "v"))
+        self.assertEqual(users.get(1, "v"), "one")
+        self.assertEqual(users.snapshot()["evictions"], 1)
+
+    def test_ttl_and_version(self):
+        clock = FakeClock()
+        users = UserCache(ttl=60, clock=clock)
+        users.put(1, "v1", "one")
+        self.assertIsNone(users.get(1, "v2"))  # bumped version
+        self.assertEqual(users.get(1, "v1"), "one")
+        clock.now += 61
+        self.assertIsNone(users.get(1, "v1"))
+
+
+class GoogleKeyCacheTests(SimpleTestCase):
+
+    def keyset(self, max_age=3600):
+        self.source = StaticKeySource(CERTS, max_age=max_age)
+        self.clock = FakeClock()
+        return CachedKeySet(self.source, refresh_margin=300, clock=self.clock)
+
+    def test_cache_lifetime(self):
+        self.assertEqual(cache_lifetime({"Cache-Control": "public, max-age=20103, must-revalidate", "Age": "103"}), 20000)
+        self.assertEqual(cache_lifetime({"Cache-Control": "no-transform"}), 3600)
+        self.assertEqual(cache_lifetime({}), 3600)
+
+    def test_keys_kept_for_max_age(self):
+        keys = self.keyset()
+        keys.get()
+        self.clock.now += 3000
+        keys.get()
+        self.assertEqual(self.source.fetches, 1)
+
+        self.clock.now += 1000  # past max-age
+        keys.get()
+        self.assertEqual(self.source.fetches, 2)
+
+    def test_refreshes_in_background_before_expiry(self):
+        keys = self.keyset()
+        keys.get()
+        self.clock.now += 3400  # inside the refresh margin: served at once, refreshed behind
+        self.assertEqual(keys.get(), CERTS)
+        deadline = time.monotonic() + 5
+        while self.source.fetches < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.source.fetches, 2)
+        self.assertEqual(keys.expires_at, self.clock.now + 3600)
+
+    def test_unknown_key_id_refetches_once(self):
+        keys = self.keyset()
+        keys.get()
+        self.source.certs["rotated"] = "pem"
+        self.assertIn("rotated", keys.get_for("rotated"))
+        self.assertEqual(self.source.fetches, 2)
+
+        # Unknown ids refetch at most once per retry delay
+        keys.get_for("never-published")
+        keys.get_for("never-published")
+        self.assertEqual(self.source.fetches, 2)
+        self.clock.now += 61
+        keys.get_for("never-published")
+        keys.get_for("never-published")
+        self.assertEqual(self.source.fetches, 3)
+
+    def test_serves_expired_keys_when_source_fails(self):
+        keys = self.keyset()
+        keys.get()
+        self.source.fetch = mock.Mock(side_effect=KeyFetchError("offline"))
+        self.clock.now += 4000
+        with self.assertLogs("users.google_keys", "WARNING"):
+            self.assertEqual(keys.get(), CERTS)
+        self.assertEqual(self.source.fetch.call_count, 1)
+        keys.get()  # within the retry delay: no new attempt
+        self.assertEqual(self.source.fetch.call_count, 1)
+
+    def test_http_source_reads_max_age(self):
+        response = mock.Mock(headers={"Cache-Control": "public, max-age=600"})
+        response.json.return_value = CERTS
+        with mock.patch("users.google_keys.requests.Session.get", return_value=response) as get:
+            self.assertEqual(HTTPKeySource("https://certs.example/").fetch(), (CERTS, 600))
+            HTTPKeySource("https://certs.example/").fetch()
+        self.assertEqual(get.call_count, 2)
+        self.assertIs(http_session(), http_session())
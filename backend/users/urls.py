@@ -5,16 +5,16 @@ from .views import (
     CustomTokenObtainPairView,
     UserProfileView,
     ActivatePremiumView,
-    PremiumStatusView
+    PremiumStatusView,
+    PremiumTokenRefreshView,
 )
 from .views_google import GoogleLoginView
-from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     # Authentication
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', PremiumTokenRefreshView.as_view(), name='token_refresh'),
 
     # Profile
     path('profile/', UserProfileView.as_view(), name='user_profile'),
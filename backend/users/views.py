@@ -87,11 +87,14 @@ from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework.views import APIView
 from .serializers import RegisterSerializer, UserSerializer
 from .models import Profile
+from .entitlements import add_premium_claims, request_premium, tokens_for
 from quizzes.models import QuizResult
 from quizzes.serializers import QuizResultSerializer
 from google.oauth2 import id_token
@@ -109,7 +112,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
         token['username'] = user.username
-        return token
+        return add_premium_claims(token, user)
 
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -119,13 +122,51 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class PremiumTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-reads the profile on every refresh, so the premium claims of the new
+    access (and rotated refresh) token follow revocations, expiries and
+    extensions made since the last one instead of being copied forward.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = (
+            User.objects.select_related("profile")
+            .filter(**{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)})
+            .first()
+        )
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        add_premium_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # token_blacklist is not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
+
+class PremiumTokenRefreshView(TokenRefreshView):
+    serializer_class = PremiumTokenRefreshSerializer
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        user_data = UserSerializer(user).data
-        quiz_results = QuizResult.objects.filter(user=user).order_by('-submitted_at')
+        is_premium, _ = request_premium(request)
+        user_data = UserSerializer(user, context={"is_premium": is_premium}).data
+        quiz_results = QuizResult.objects.filter(user=user).select_related('quiz').order_by('-submitted_at')
         quiz_data = QuizResultSerializer(quiz_results, many=True).data
         return Response({
             "user": user_data,
@@ -135,10 +176,11 @@ class UserProfileView(APIView):
 class PremiumStatusView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        profile, _ = Profile.objects.get_or_create(user=request.user)
+        # Answered from the token's claims: no profile read, no write
+        is_premium, premium_until = request_premium(request)
         return Response({
-            "is_premium": profile.check_premium_status(),
-            "premium_until": profile.premium_until
+            "is_premium": is_premium,
+            "premium_until": premium_until
         })
 
 class ActivatePremiumView(APIView):
@@ -146,9 +188,14 @@ class ActivatePremiumView(APIView):
     def post(self, request):
         profile, _ = Profile.objects.get_or_create(user=request.user)
         profile.activate_premium(days=30)
+        # The caller's tokens still say "not premium": hand out new ones
+        request.user.profile = profile
+        refresh = tokens_for(request.user)
         return Response({
             "message": "Premium activated!",
             "is_premium": profile.is_premium,
-            "premium_until": profile.premium_until
+            "premium_until": profile.premium_until,
+            "access": str(refresh.access_token),
+            "refresh": str(refresh),
         })
 
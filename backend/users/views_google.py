@@ -5,10 +5,9 @@ from django.contrib.auth.models import User
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from .models import Profile
+from .google_keys import KeyFetchError, WrongAudienceError, verify_google_id_token
+from .entitlements import tokens_for
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,11 +21,8 @@ class GoogleLoginView(APIView):
             if not token:
                 return Response({"error": "Missing Google ID token."}, status=400)
 
-            # Verify Google token
-            idinfo = id_token.verify_oauth2_token(token, google_requests.Request())
-
-            if idinfo.get("aud") != settings.GOOGLE_CLIENT_ID:
-                return Response({"error": "Invalid Google client ID."}, status=400)
+            # Verify Google token locally against the cached signing keys
+            idinfo = verify_google_id_token(token, audience=settings.GOOGLE_CLIENT_ID)
 
             email = idinfo.get("email")
             google_id = idinfo.get("sub")
@@ -62,7 +58,7 @@ class GoogleLoginView(APIView):
                 profile.save()
 
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for(user)
 
             return Response({
                 "access": str(refresh.access_token),
@@ -75,6 +71,11 @@ class GoogleLoginView(APIView):
                 }
             })
 
+        except KeyFetchError:
+            logger.exception("Google signing keys unavailable")
+            return Response({"error": "Google sign-in is temporarily unavailable."}, status=503)
+        except WrongAudienceError:
+            return Response({"error": "Invalid Google client ID."}, status=400)
         except ValueError as e:
             # Invalid token
             logger.exception("Google login failed")
@@ -546,6 +546,7 @@ interface QuizResponse {
   questions: Question[]; // standalone
   datasets?: DataSet[];
   time_limit?: number;
+  exam_token?: string;
 }
 
 interface ResultDetail {
@@ -751,6 +752,7 @@ export default function RandomQuizPage() {
       })),
       visible_questions: visibleIds,
       quiz_type: quiz.quiz_type,
+      exam_token: quiz.exam_token,
     };
 
     try {
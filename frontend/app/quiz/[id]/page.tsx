@@ -616,6 +616,7 @@ interface Quiz {
   datasets: DataSet[];
   time_limit?: number;
   debug_info?: QuizDebugInfo;
+  exam_token?: string;
 }
 
 interface Step {
@@ -736,6 +737,7 @@ export default function QuizDetailPage() {
         choice: cId,
       })),
       visible_questions: visibleIds,
+      exam_token: quiz.exam_token,
       time_spent: timeSpent,
     };
 